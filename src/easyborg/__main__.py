@@ -10,15 +10,20 @@ def main():
     args = sys.argv[1:]
     if render_newlines(args):
         ui.newline()
+    success = False
     try:
         easyborg_executable = Path(sys.argv[0])
         cli.main(args, obj={"easyborg_executable": easyborg_executable})
+    except SystemExit as e:
+        success = not e.code  # Click exits when done
+        raise
     except Exception as e:
         if easyborg.cli.DEBUG_MODE:
             ui.stacktrace("Error while running easyborg")
         else:
             ui.exception(e)
     finally:
+        ui.disable_events(success=success)
         if render_newlines(args):
             ui.newline()
 
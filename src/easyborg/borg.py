@@ -1,28 +1,69 @@
+import json
 import logging
 import os
-from collections.abc import Iterator, Mapping
+import signal
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from dataclasses import replace
+from datetime import UTC, datetime
+from itertools import chain
 from pathlib import Path
-
-from easyborg.model import ProgressEvent, Repository, RepositoryType, Snapshot
-from easyborg.process import Output, assert_executable_valid, run_async, run_sync
+from typing import Any
+
+from easyborg.exclusions import borg_options
+from easyborg.model import (
+    ExclusionSettings,
+    ProgressEvent,
+    Repository,
+    RepositoryType,
+    Snapshot,
+    StreamSource,
+    WatchdogSettings,
+)
+from easyborg.process import (
+    Output,
+    ProducerError,
+    assert_executable_valid,
+    run_async,
+    run_pipeline,
+    run_sync,
+    running_processes,
+)
 from easyborg.progress_parser import parse_progress
+from easyborg.sharding import shard_repositories
 from easyborg.util import is_blank
 
 logger = logging.getLogger(__name__)
 
+PARTIAL_SUFFIX = ".partial"  # snapshots being transferred are imported under a temporary name
+
 
 # Options and arguments are written in the order recommended by Borg: borg <command> [options] [arguments].
 # (see https://borgbackup.readthedocs.io/en/stable/usage/general.html#positional-arguments-and-options-order-matters)
 
 
 class Borg:
-    def __init__(self, executable: Path):
+    def __init__(
+            self,
+            executable: Path,
+            *,
+            cache_dir: Path | None = None,
+            watchdog: WatchdogSettings | None = None,
+            lock_wait: int | None = None,
+    ):
         """
         Initialize a Borg instance.
+
+        If cache_dir is set, each repository gets its own Borg cache directory below it.
+        If watchdog is set, Borg processes that run too long or stop making progress are stopped (repositories can
+        override the settings).
+        If lock_wait is set, Borg waits that many seconds for a locked repository (repositories can override it).
         """
-        logger.debug("Initializing Borg (executable: '%s')", executable)
+        logger.debug("Initializing Borg (executable: '%s', cache dir: '%s')", executable, cache_dir)
         assert_executable_valid(executable)
         self.executable = executable
+        self.cache_dir = cache_dir
+        self.watchdog = watchdog
+        self.lock_wait = lock_wait
 
     def snapshot_exists(self, snap: Snapshot) -> bool:
         """
@@ -30,18 +71,25 @@ class Borg:
         """
         return snap.name in (s.name for s in self.list_snapshots(snap.repository))
 
-    def list_snapshots(self, repo: Repository) -> list[Snapshot]:
+    def list_snapshots(self, repo: Repository, *, checkpoints: bool = False) -> list[Snapshot]:
         """
-        List all snapshots in the given repository.
+        List all snapshots in the given repository (with the checkpoints of interrupted snapshots if checkpoints=True).
+
+        The snapshots of a sharded repository are those of its shards (each snapshot exists in several shards).
         """
+        if repo.shards:
+            return self._list_sharded_snapshots(repo)
+
         logger.debug("Listing snapshots in repository '%s'", repo.url)
         assert_passphrase(repo.env)
 
-        cmd = [str(self.executable), "list"]
+        cmd = self._command("list", repo)
+        if checkpoints:
+            cmd.append("--consider-checkpoints")
         cmd.extend(["--format", "{archive}{TAB}{comment}\n"])
         cmd.append(repo.url)
 
-        lines = run_sync(cmd, env=repo.env)
+        lines = run_sync(cmd, env=self._env(repo), tags=_tags(repo), watchdog=self._watchdog(repo, streaming=False))
 
         snapshots = []
         for line in lines:
@@ -55,14 +103,23 @@ class Borg:
         Yield all paths contained in a snapshot.
         Paths are always relative (no leading slash).
         """
+        if snap.repository.shards:
+            yield from chain.from_iterable(self.list_contents(part) for part in self._shard_snapshots(snap))
+            return
+
         logger.debug("Listing contents of %s", snap.location())
         assert_passphrase(snap.repository.env)
 
-        cmd = [str(self.executable), "list"]
+        cmd = self._command("list", snap.repository)
         cmd.extend(["--format", "{path}\n"])
         cmd.append(snap.location())
 
-        for line in run_async(cmd, env=snap.repository.env):
+        for line in run_async(
+            cmd,
+            env=self._env(snap.repository),
+            tags=_tags(snap.repository),
+            watchdog=self._watchdog(snap.repository, streaming=True),
+        ):
             if line:
                 yield Path(line)
 
@@ -101,35 +158,121 @@ class Borg:
     def create_snapshot(
             self,
             snap: Snapshot,
-            paths: list[Path],
+            paths: Iterable[Path | str],
             *,
             dry_run: bool = False,
             progress: bool = False,
+            paths_from_stdin: bool = False,
+            files_cache: str | None = None,
+            exclusions: ExclusionSettings | None = None,
+            patterns_file: Path | None = None,
+            stats: dict[str, Any] | None = None,
+            stream: StreamSource | None = None,
     ):
         """
         Create a new snapshot.
+
+        If stream is given, the output of its command is archived as one file next to the paths. Borg reads it
+        directly from the command. If the command fails, the snapshot is deleted again (it would contain
+        truncated data) and ProducerError is raised. Dry runs don't run the command.
+
+        With paths_from_stdin=True, paths must be the complete list of paths to archive (no recursion). It is passed
+        to Borg via stdin instead of the command line.
+
+        Snapshots in sharded repositories are created per shard, see BackupCommand.
+
+        If stats is given, it receives the statistics of the snapshot (original_size, compressed_size,
+        deduplicated_size, nfiles, duration) once Borg has finished (not in dry runs).
         """
         logger.debug("Creating snapshot %s", snap.location())
         assert_passphrase(snap.repository.env)
+        if snap.repository.shards:
+            raise RuntimeError(f"Cannot create snapshot in sharded repository {snap.repository.name} directly")
 
-        for path in paths:
-            if not path.exists():
-                raise RuntimeError(f"Path does not exist: {path}")
+        if stream and paths_from_stdin:
+            raise RuntimeError("Cannot archive a stream with paths from stdin")
+        stream = stream if not dry_run else None
 
-        cmd = [str(self.executable), "create"]
+        input_lines = None
+        if paths_from_stdin:
+            input_lines = map(str, paths)
+            paths = []
+        else:
+            for path in paths:
+                if not Path(path).exists():
+                    raise RuntimeError(f"Path does not exist: {path}")
+
+        cmd = self._command("create", snap.repository)
         if progress:
             cmd.extend(["--progress", "--log-json"])
         if dry_run:
             cmd.append("--dry-run")
         if snap.comment:
             cmd.extend(["--comment", snap.comment])
+        if snap.repository.compression:
+            cmd.extend(["--compression", snap.repository.compression])
+        if snap.repository.chunker_params:
+            cmd.extend(["--chunker-params", snap.repository.chunker_params])
+        if snap.repository.checkpoint_interval is not None:
+            cmd.extend(["--checkpoint-interval", str(snap.repository.checkpoint_interval)])
+        if files_cache:
+            cmd.extend(["--files-cache", files_cache])
+        if exclusions:
+            cmd.extend(borg_options(exclusions))
+        if patterns_file:
+            cmd.extend(["--patterns-from", str(patterns_file)])
+        if snap.repository.limits.upload_ratelimit is not None:
+            cmd.extend(["--upload-ratelimit", str(snap.repository.limits.upload_ratelimit)])
+        if paths_from_stdin:
+            cmd.extend(["--paths-from-stdin", "--paths-delimiter", "\\0"])  # Borg evaluates the escape sequence
+        if stream:
+            cmd.extend(["--stdin-name", stream.name])
+        output: list[str] | None = None
+        if stats is not None and not dry_run:
+            cmd.append("--json")  # statistics go to stdout, log messages and progress to stderr
+            output = []
         cmd.append(snap.location())
         cmd.extend(map(str, paths))
+        stdin_command = None
+        if stream:
+            cmd.append("-")
+            stdin_command = list(stream.command)
 
         if progress:
-            return parse_progress(run_async(cmd, output=Output.STDERR, env=snap.repository.env))
-
-        run_sync(cmd, env=snap.repository.env)
+            events = parse_progress(
+                run_async(
+                    cmd,
+                    input_lines=input_lines,
+                    input_delimiter="\0",
+                    output=Output.STDERR,
+                    env=self._env(snap.repository),
+                    limits=snap.repository.limits,
+                    tags=_tags(snap.repository),
+                    watchdog=self._watchdog(snap.repository, streaming=True),
+                    capture=output,
+                    stdin_command=stdin_command,
+                )
+            )
+            if stream:
+                events = self._delete_on_producer_error(events, snap)
+            return _collect_stats(events, output, stats) if output is not None else events
+
+        try:
+            lines = run_sync(
+                cmd,
+                input_lines=input_lines,
+                input_delimiter="\0",
+                env=self._env(snap.repository),
+                limits=snap.repository.limits,
+                tags=_tags(snap.repository),
+                watchdog=self._watchdog(snap.repository, streaming=False),
+                stdin_command=stdin_command,
+            )
+        except ProducerError:
+            self._delete_if_exists(snap)
+            raise
+        if output is not None:
+            _parse_stats(lines, stats)
         return None
 
     def restore(
@@ -145,17 +288,37 @@ class Borg:
         """
         Restore paths (or the entire snapshot if paths=None) into target_dir.
         Returns progress events if progress=True (slows down performance).
+
+        Snapshots of sharded repositories are restored from each shard that contains one of the paths.
         """
         if paths is None:
             paths = []
 
+        if snap.repository.shards:
+            parts = [
+                (part, _contained(paths, self.list_contents(part)) if paths else [])
+                for part in self._shard_snapshots(snap)
+            ]
+            return _each(
+                [(part, part_paths) for part, part_paths in parts if part_paths or not paths],
+                lambda part: self.restore(
+                    part[0],
+                    target_dir,
+                    paths=part[1],
+                    dry_run=dry_run,
+                    progress=progress,
+                    strip_components=strip_components,
+                ),
+                progress=progress,
+            )
+
         logger.debug("Restoring %s into %s", snap.location(), target_dir)
         assert_passphrase(snap.repository.env)
 
         if not target_dir.is_dir():
             raise RuntimeError(f"Target directory does not exist: {target_dir}")
 
-        cmd = [str(self.executable), "extract"]
+        cmd = self._command("extract", snap.repository)
         if progress:
             cmd.extend(["--progress", "--log-json"])
         if dry_run:
@@ -166,9 +329,26 @@ class Borg:
         cmd.extend([snap.location(), *map(str, paths)])
 
         if progress:
-            return parse_progress(run_async(cmd, cwd=str(target_dir), output=Output.STDERR))
-
-        run_sync(cmd, cwd=str(target_dir), env=snap.repository.env)
+            return parse_progress(
+                run_async(
+                    cmd,
+                    cwd=str(target_dir),
+                    output=Output.STDERR,
+                    env=self._env(snap.repository),
+                    limits=snap.repository.limits,
+                    tags=_tags(snap.repository),
+                    watchdog=self._watchdog(snap.repository, streaming=True),
+                )
+            )
+
+        run_sync(
+            cmd,
+            cwd=str(target_dir),
+            env=self._env(snap.repository),
+            limits=snap.repository.limits,
+            tags=_tags(snap.repository),
+            watchdog=self._watchdog(snap.repository, streaming=False),
+        )
         return None
 
     def prune(
@@ -181,10 +361,17 @@ class Borg:
         """
         Prune old snapshots in the repository according to retention policy.
         """
+        if repo.shards:
+            return _each(
+                shard_repositories(repo),
+                lambda shard: self.prune(shard, dry_run=dry_run, progress=progress),
+                progress=progress,
+            )
+
         logger.debug("Pruning repository '%s'", repo.url)
         assert_passphrase(repo.env)
 
-        cmd = [str(self.executable), "prune"]
+        cmd = self._command("prune", repo)
         if progress:
             cmd.extend(["--progress", "--log-json"])
         if dry_run:
@@ -193,9 +380,24 @@ class Borg:
         cmd.append(repo.url)
 
         if progress:
-            return parse_progress(run_async(cmd, output=Output.STDERR, env=repo.env))
-
-        run_sync(cmd, env=repo.env)
+            return parse_progress(
+                run_async(
+                    cmd,
+                    output=Output.STDERR,
+                    env=self._env(repo),
+                    limits=repo.limits,
+                    tags=_tags(repo),
+                    watchdog=self._watchdog(repo, streaming=True),
+                )
+            )
+
+        run_sync(
+            cmd,
+            env=self._env(repo),
+            limits=repo.limits,
+            tags=_tags(repo),
+            watchdog=self._watchdog(repo, streaming=False),
+        )
         return None
 
     def compact(
@@ -208,10 +410,17 @@ class Borg:
         """
         Run `borg compact` to reclaim space.
         """
+        if repo.shards:
+            return _each(
+                shard_repositories(repo),
+                lambda shard: self.compact(shard, dry_run=dry_run, progress=progress),
+                progress=progress,
+            )
+
         logger.debug("Compacting repository '%s'", repo.url)
         assert_passphrase(repo.env)
 
-        cmd = [str(self.executable), "compact"]
+        cmd = self._command("compact", repo)
         if progress:
             cmd.extend(["--progress", "--log-json"])
         if dry_run:
@@ -219,9 +428,24 @@ class Borg:
         cmd.append(repo.url)
 
         if progress:
-            return parse_progress(run_async(cmd, output=Output.STDERR, env=repo.env))
-
-        run_sync(cmd, env=repo.env)
+            return parse_progress(
+                run_async(
+                    cmd,
+                    output=Output.STDERR,
+                    env=self._env(repo),
+                    limits=repo.limits,
+                    tags=_tags(repo),
+                    watchdog=self._watchdog(repo, streaming=True),
+                )
+            )
+
+        run_sync(
+            cmd,
+            env=self._env(repo),
+            limits=repo.limits,
+            tags=_tags(repo),
+            watchdog=self._watchdog(repo, streaming=False),
+        )
         return None
 
     def delete(
@@ -234,10 +458,17 @@ class Borg:
         """
         Delete snapshot from repository.
         """
+        if snap.repository.shards:
+            return _each(
+                self._shard_snapshots(snap),
+                lambda part: self.delete(part, dry_run=dry_run, progress=progress),
+                progress=progress,
+            )
+
         logger.debug("Deleting snapshot '%s' from repository '%s' ", snap.name, snap.repository.url)
         assert_passphrase(snap.repository.env)
 
-        cmd = [str(self.executable), "delete"]
+        cmd = self._command("delete", snap.repository)
         if progress:
             cmd.extend(["--progress", "--log-json"])
         if dry_run:
@@ -245,11 +476,376 @@ class Borg:
         cmd.append(snap.location())
 
         if progress:
-            return parse_progress(run_async(cmd, output=Output.STDERR, env=snap.repository.env))
+            return parse_progress(
+                run_async(
+                    cmd,
+                    output=Output.STDERR,
+                    env=self._env(snap.repository),
+                    limits=snap.repository.limits,
+                    tags=_tags(snap.repository),
+                    watchdog=self._watchdog(snap.repository, streaming=True),
+                )
+            )
+
+        run_sync(
+            cmd,
+            env=self._env(snap.repository),
+            limits=snap.repository.limits,
+            tags=_tags(snap.repository),
+            watchdog=self._watchdog(snap.repository, streaming=False),
+        )
+        return None
+
+    def check(
+            self,
+            repo: Repository,
+            *,
+            max_duration: int | None = None,
+            progress: bool = False,
+    ) -> Iterator[ProgressEvent] | None:
+        """
+        Run `borg check --repository-only` to check the consistency of the repository's segments.
+
+        With max_duration (seconds), only part of the repository is checked; the next check continues where this
+        one stopped.
+        """
+        if repo.shards:
+            return _each(
+                shard_repositories(repo),
+                lambda shard: self.check(shard, max_duration=max_duration, progress=progress),
+                progress=progress,
+            )
+
+        logger.debug("Checking repository '%s'", repo.url)
+        assert_passphrase(repo.env)
+
+        cmd = self._command("check", repo)
+        if progress:
+            cmd.extend(["--progress", "--log-json"])
+        cmd.append("--repository-only")
+        if max_duration is not None:
+            cmd.extend(["--max-duration", str(max_duration)])
+        cmd.append(repo.url)
 
-        run_sync(cmd, env=snap.repository.env)
+        if progress:
+            return parse_progress(
+                run_async(
+                    cmd,
+                    output=Output.STDERR,
+                    env=self._env(repo),
+                    limits=repo.limits,
+                    tags=_tags(repo),
+                    watchdog=self._watchdog(repo, streaming=True),
+                )
+            )
+
+        run_sync(
+            cmd,
+            env=self._env(repo),
+            limits=repo.limits,
+            tags=_tags(repo),
+            watchdog=self._watchdog(repo, streaming=False),
+        )
         return None
 
+    def verify(self, snap: Snapshot, *, progress: bool = False) -> Iterator[ProgressEvent] | None:
+        """
+        Verify the data of a snapshot: read, decrypt and authenticate every chunk it references, without writing
+        anything (`borg extract --dry-run`).
+
+        Unlike `borg check --verify-data`, which reads every chunk in the repository, this takes time in proportion
+        to the snapshot.
+        """
+        if snap.repository.shards:
+            return _each(
+                self._shard_snapshots(snap),
+                lambda part: self.verify(part, progress=progress),
+                progress=progress,
+            )
+
+        logger.debug("Verifying data of %s", snap.location())
+        assert_passphrase(snap.repository.env)
+
+        cmd = self._command("extract", snap.repository)
+        if progress:
+            cmd.extend(["--progress", "--log-json"])
+        cmd.extend(["--dry-run", snap.location()])
+
+        if progress:
+            return parse_progress(
+                run_async(
+                    cmd,
+                    output=Output.STDERR,
+                    env=self._env(snap.repository),
+                    limits=snap.repository.limits,
+                    tags=_tags(snap.repository),
+                    watchdog=self._watchdog(snap.repository, streaming=True),
+                )
+            )
+
+        run_sync(
+            cmd,
+            env=self._env(snap.repository),
+            limits=snap.repository.limits,
+            tags=_tags(snap.repository),
+            watchdog=self._watchdog(snap.repository, streaming=False),
+        )
+        return None
+
+    def snapshot_stats(self, snap: Snapshot) -> dict[str, Any]:
+        """
+        Return the statistics of a snapshot (original_size, compressed_size, deduplicated_size, nfiles).
+        """
+        return self._archive_info(snap)["stats"]
+
+    def rename(self, snap: Snapshot, name: str) -> Snapshot:
+        """
+        Rename a snapshot.
+        """
+        logger.debug("Renaming %s to '%s'", snap.location(), name)
+        assert_passphrase(snap.repository.env)
+
+        cmd = [*self._command("rename", snap.repository), snap.location(), name]
+
+        run_sync(
+            cmd,
+            env=self._env(snap.repository),
+            limits=snap.repository.limits,
+            tags=_tags(snap.repository),
+            watchdog=self._watchdog(snap.repository, streaming=False),
+        )
+        return Snapshot(snap.repository, name, snap.comment)
+
+    def transfer(self, snap: Snapshot, target: Repository, *, dry_run: bool = False) -> Snapshot:
+        """
+        Copy a snapshot to another repository, keeping its name, comment and timestamp.
+
+        The snapshot is streamed from borg export-tar straight into borg import-tar, so there are no temporary files
+        and the original data isn't read again. It is imported under a temporary name and only renamed once both
+        sides succeeded, so a failed transfer never looks like a complete snapshot. The watchdog of the target
+        repository watches both processes.
+        """
+        logger.debug("Transferring %s to repository '%s'", snap.location(), target.url)
+        if snap.repository.shards or target.shards:
+            raise RuntimeError("Snapshots of sharded repositories cannot be transferred")
+        assert_passphrase(snap.repository.env)
+        assert_passphrase(target.env)
+
+        if dry_run:
+            return Snapshot(target, snap.name, snap.comment)
+
+        archive = self._archive_info(snap)
+        partial = Snapshot(target, snap.name + PARTIAL_SUFFIX)
+        self._delete_if_exists(partial)  # left behind by an interrupted transfer
+
+        export_cmd = [*self._command("export-tar", snap.repository), "--tar-format=PAX", snap.location(), "-"]
+
+        import_cmd = self._command("import-tar", target)
+        import_cmd.extend(["--progress", "--log-json"])  # progress keeps the watchdog from seeing a stall
+        import_cmd.extend(["--timestamp", _utc_timestamp(archive["start"])])
+        if archive.get("comment"):
+            import_cmd.extend(["--comment", archive["comment"]])
+        if target.compression:
+            import_cmd.extend(["--compression", target.compression])
+        if target.limits.upload_ratelimit is not None:
+            import_cmd.extend(["--upload-ratelimit", str(target.limits.upload_ratelimit)])
+        import_cmd.extend([partial.location(), "-"])
+
+        try:
+            run_pipeline(
+                export_cmd,
+                import_cmd,
+                producer_env=self._env(snap.repository),
+                consumer_env=self._env(target),
+                producer_limits=snap.repository.limits,
+                consumer_limits=target.limits,
+                tags=_tags(snap.repository) | {"target": target.name},
+                watchdog=self._watchdog(target, streaming=True),
+                log_json=True,
+            )
+        except Exception:
+            self._delete_if_exists(partial)
+            raise
+
+        self.rename(partial, snap.name)
+        return Snapshot(target, snap.name, archive.get("comment") or None)
+
+    def sync_cache(self, repo: Repository) -> None:
+        """
+        Bring the local cache of the repository up to date, so the next snapshot doesn't have to.
+        """
+        if repo.shards:
+            _each(shard_repositories(repo), self.sync_cache, progress=False)
+            return
+
+        logger.debug("Synchronizing cache of repository '%s'", repo.url)
+        assert_passphrase(repo.env)
+
+        cmd = [*self._command("info", repo), repo.url]  # opening the cache synchronizes it
+
+        run_sync(
+            cmd,
+            env=self._env(repo),
+            limits=repo.limits,
+            tags=_tags(repo),
+            watchdog=self._watchdog(repo, streaming=False),
+        )
+
+    def break_lock(self, repo: Repository) -> None:
+        """
+        Remove all locks of the repository, e.g. those left behind by a Borg process that was killed.
+        """
+        logger.debug("Breaking locks of repository '%s'", repo.url)
+
+        cmd = [*self._command("break-lock", repo), repo.url]
+
+        run_sync(cmd, env=self._env(repo), tags=_tags(repo))
+
+    def interrupt(self) -> None:
+        """
+        Interrupt the running Borg processes like Ctrl-C. Borg create writes a checkpoint before it exits.
+        """
+        for process in running_processes():
+            if str(self.executable) in map(str, process.args):
+                logger.info("Interrupting %s", process.args)
+                process.send_signal(signal.SIGINT)
+
+    def _list_sharded_snapshots(self, repo: Repository) -> list[Snapshot]:
+        snapshots: dict[str, Snapshot] = {}
+        for shard in shard_repositories(repo):
+            for snap in self.list_snapshots(shard):
+                snapshots.setdefault(snap.name, Snapshot(repo, snap.name, snap.comment))
+        return sorted(snapshots.values(), key=lambda snap: snap.name)
+
+    def _shard_snapshots(self, snap: Snapshot) -> list[Snapshot]:
+        """
+        Return the parts of a snapshot of a sharded repository (shards without paths have no part).
+        """
+        return [
+            Snapshot(shard, snap.name, snap.comment)
+            for shard in shard_repositories(snap.repository)
+            if any(s.name == snap.name for s in self.list_snapshots(shard))
+        ]
+
+    def _archive_info(self, snap: Snapshot) -> dict[str, Any]:
+        logger.debug("Reading information about %s", snap.location())
+        assert_passphrase(snap.repository.env)
+
+        cmd = [*self._command("info", snap.repository), "--json", snap.location()]
+
+        repo = snap.repository
+        output = run_sync(
+            cmd,
+            env=self._env(repo),
+            limits=repo.limits,
+            tags=_tags(repo),
+            watchdog=self._watchdog(repo, streaming=False),
+        )
+        return json.loads("\n".join(output))["archives"][0]
+
+    def _delete_on_producer_error(self, events: Iterator[ProgressEvent], snap: Snapshot) -> Iterator[ProgressEvent]:
+        try:
+            yield from events
+        except ProducerError:
+            self._delete_if_exists(snap)
+            raise
+
+    def _delete_if_exists(self, snap: Snapshot) -> None:
+        try:
+            if self.snapshot_exists(snap):
+                self.delete(snap)
+        except Exception as e:
+            logger.warning("Could not delete incomplete snapshot %s: %s", snap.location(), e)
+
+    def _command(self, name: str, repo: Repository) -> list[str]:
+        """
+        Return the start of the Borg command operating on the repository, with the common options.
+        """
+        cmd = [str(self.executable), name]
+        lock_wait = repo.lock_wait if repo.lock_wait is not None else self.lock_wait
+        if lock_wait is not None:
+            cmd.extend(["--lock-wait", str(lock_wait)])
+        return cmd
+
+    def _env(self, repo: Repository) -> dict[str, str]:
+        """
+        Return the environment for Borg processes operating on the repository.
+        """
+        env = dict(repo.env or {})
+        if self.cache_dir:
+            env.setdefault("BORG_CACHE_DIR", str(self.cache_dir / repo.name))
+        if repo.files_cache_ttl is not None:
+            env.setdefault("BORG_FILES_CACHE_TTL", str(repo.files_cache_ttl))
+        return env
+
+    def _watchdog(self, repo: Repository, *, streaming: bool) -> WatchdogSettings | None:
+        """
+        Return the watchdog settings for a Borg process operating on the repository, or None.
+
+        The stall timeout only applies if the output is streamed (e.g. progress): otherwise Borg is silent until it
+        exits.
+        """
+        watchdog = repo.watchdog or self.watchdog
+        if watchdog and not streaming:
+            watchdog = replace(watchdog, stall_timeout=None)
+        return watchdog if watchdog and watchdog.enabled() else None
+
+
+def _utc_timestamp(local_time: str) -> str:
+    """
+    Convert a time from Borg's JSON output (local time) to the UTC format of --timestamp, in seconds precision.
+    """
+    utc = datetime.fromisoformat(local_time).astimezone(UTC)
+    return utc.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _tags(repo: Repository) -> dict[str, str]:
+    """
+    Return the tags of the resource usage of Borg processes operating on the repository.
+    """
+    return {"repository": repo.name}
+
+
+def _each(
+        items: Iterable[Any],
+        operation: Callable[[Any], Iterator[ProgressEvent] | None],
+        *,
+        progress: bool,
+) -> Iterator[ProgressEvent] | None:
+    """
+    Apply the operation to each item, one after the other (lazily if the operation returns progress events).
+    """
+    if progress:
+        return chain.from_iterable(operation(item) for item in items)
+    for item in items:
+        operation(item)
+    return None
+
+
+def _contained(paths: Iterable[Path], contents: Iterable[Path]) -> list[Path]:
+    """
+    Return the paths that are contents, or parent directories of contents.
+    """
+    present: set[Path] = set()
+    for path in contents:
+        present.add(path)
+        present.update(path.parents)
+    return [path for path in paths if path in present]
+
+
+def _collect_stats(
+        events: Iterator[ProgressEvent],
+        output: list[str],
+        stats: dict[str, Any],
+) -> Iterator[ProgressEvent]:
+    yield from events
+    _parse_stats(output, stats)
+
+
+def _parse_stats(output: list[str], stats: dict[str, Any]) -> None:
+    archive = json.loads("\n".join(output))["archive"]
+    stats.update(archive["stats"], duration=archive["duration"])
+
 
 def assert_passphrase(env: dict[str, str] | None) -> None:
     if not env:
@@ -0,0 +1,165 @@
+import configparser
+import logging
+import os
+import re
+import shutil
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+from easyborg.model import Repository
+from easyborg.scan import scan
+
+logger = logging.getLogger(__name__)
+
+MOUNTS_FILE = Path("/proc/mounts")
+
+NETWORK_FILESYSTEMS = frozenset(
+    {
+        "9p",
+        "afs",
+        "ceph",
+        "cifs",
+        "coda",
+        "davfs",
+        "fuse.davfs2",
+        "fuse.glusterfs",
+        "fuse.rclone",
+        "fuse.s3fs",
+        "fuse.sshfs",
+        "glusterfs",
+        "gpfs",
+        "lustre",
+        "ncpfs",
+        "nfs",
+        "nfs4",
+        "smb3",
+        "smbfs",
+    }
+)
+
+# inode numbers and ctimes aren't stable on many network filesystems, so Borg's default (ctime,size,inode) misses
+NETWORK_FILES_CACHE = "mtime,size"
+
+
+@dataclass(frozen=True, slots=True)
+class CacheInfo:
+    path: Path
+    size: int
+    location: str | None  # repository the cache belongs to, None if unknown
+    repository: str | None  # name of the configured repository, None if stale
+    managed: bool
+
+
+def read_mounts(mounts_file: Path = MOUNTS_FILE) -> list[tuple[Path, str]]:
+    """
+    Return (mount point, filesystem type) for all mounts, or an empty list if unknown (e.g. on macOS).
+    """
+    try:
+        lines = mounts_file.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return []
+    mounts = []
+    for line in lines:
+        fields = line.split()
+        if len(fields) >= 3:
+            # spaces etc. in mount points are octal-escaped
+            mount_point = re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), fields[1])
+            mounts.append((Path(mount_point), fields[2]))
+    return mounts
+
+
+def filesystem_type(path: Path, mounts: list[tuple[Path, str]]) -> str | None:
+    """
+    Return the type of the filesystem the path is on (the mount with the longest matching mount point).
+    """
+    path = path.resolve()
+    matches = [(mount_point, fs_type) for mount_point, fs_type in mounts if path.is_relative_to(mount_point)]
+    if not matches:
+        return None
+    return max(matches, key=lambda match: len(match[0].parts))[1]
+
+
+def network_paths(paths: Iterable[Path], mounts_file: Path = MOUNTS_FILE) -> list[Path]:
+    """
+    Return the paths that are located on network filesystems.
+    """
+    mounts = read_mounts(mounts_file)
+    return [path for path in paths if filesystem_type(path, mounts) in NETWORK_FILESYSTEMS]
+
+
+def files_cache_mode(repo: Repository, backup_paths: Iterable[Path], mounts_file: Path = MOUNTS_FILE) -> str | None:
+    """
+    Return the --files-cache mode for the repository: the configured one, a suitable one for network filesystems,
+    or None (Borg's default).
+    """
+    if repo.files_cache:
+        return repo.files_cache
+    detected = network_paths(backup_paths, mounts_file)
+    if detected:
+        logger.debug("Backup paths on network filesystems: %s", detected)
+        return NETWORK_FILES_CACHE
+    return None
+
+
+def get_borg_cache_dir() -> Path:
+    """
+    Return the directory Borg keeps its caches in when not managed by easyborg.
+    """
+    if os.environ.get("BORG_CACHE_DIR"):
+        return Path(os.environ["BORG_CACHE_DIR"])
+    if os.environ.get("XDG_CACHE_HOME"):
+        return Path(os.environ["XDG_CACHE_HOME"]) / "borg"
+    return Path.home() / ".cache" / "borg"
+
+
+def list_caches(repos: Mapping[str, Repository], managed_dir: Path, borg_dir: Path) -> list[CacheInfo]:
+    """
+    Return all managed caches (one directory per repository) and all caches in Borg's own cache directory.
+    """
+    caches = []
+
+    for path in _subdirectories(managed_dir):
+        # managed caches contain Borg's cache directory (named by repository ID) below the repository name
+        repository = path.name if path.name in repos else None
+        location = repos[path.name].url if repository else _cache_location(next(_subdirectories(path), path))
+        caches.append(CacheInfo(path, directory_size(path), location, repository, True))
+
+    urls = {_normalize(repo.url): repo.name for repo in repos.values()}
+    for path in _subdirectories(borg_dir):
+        if not (path / "config").is_file():
+            continue  # e.g. security directory
+        location = _cache_location(path)
+        repository = urls.get(_normalize(location)) if location else None
+        caches.append(CacheInfo(path, directory_size(path), location, repository, False))
+
+    return caches
+
+
+def remove_cache(cache: CacheInfo) -> None:
+    logger.info("Removing cache %s (%s)", cache.path, cache.location)
+    shutil.rmtree(cache.path)
+
+
+def directory_size(path: Path) -> int:
+    return sum(stat.st_size for directory in scan([path]) for _, stat in directory.files if stat)
+
+
+def _cache_location(path: Path) -> str | None:
+    parser = configparser.ConfigParser(interpolation=None)
+    try:
+        parser.read(path / "config", encoding="utf-8")
+        return parser.get("cache", "previous_location", fallback=None)
+    except (OSError, configparser.Error):
+        return None
+
+
+def _subdirectories(path: Path) -> Iterator[Path]:
+    try:
+        return iter(sorted(p for p in path.iterdir() if p.is_dir()))
+    except OSError:
+        return iter([])
+
+
+def _normalize(url: str) -> str:
+    return url.rstrip("/")
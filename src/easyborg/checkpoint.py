@@ -0,0 +1,65 @@
+import re
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+
+_CHECKPOINT = re.compile(r"^(?P<name>.+)\.checkpoint(\.\d+)?$")
+
+
+def is_checkpoint(name: str) -> bool:
+    return _CHECKPOINT.match(name) is not None
+
+
+def interrupted_snapshot(names: Iterable[str]) -> str | None:
+    """
+    Return the name of the snapshot to continue: the one with the latest checkpoint, if it's newer than the latest
+    complete snapshot (otherwise Borg's prune removes the checkpoint).
+    """
+    names = list(names)
+    complete = [name for name in names if not is_checkpoint(name)]
+    interrupted = [match["name"] for name in names if (match := _CHECKPOINT.match(name))]
+    latest = max(interrupted, default=None)
+    if latest is None or latest in complete or latest < max(complete, default=""):
+        return None
+    return latest
+
+
+class TimeBudget:
+    """
+    Time available to a backup run. Borg is interrupted when it runs out, and writes a checkpoint the next run
+    continues from.
+    """
+
+    def __init__(self, seconds: float | None, *, clock: Callable[[], float] = time.monotonic) -> None:
+        self.clock = clock
+        self.deadline = clock() + seconds if seconds is not None else None
+
+    def remaining(self) -> float | None:
+        return max(0.0, self.deadline - self.clock()) if self.deadline is not None else None
+
+    def exhausted(self) -> bool:
+        return self.remaining() == 0.0
+
+    @contextmanager
+    def enforce(self, interrupt: Callable[[], None]) -> Iterator[threading.Event]:
+        """
+        Call interrupt when the budget runs out within the block. The yielded event tells whether it was called.
+        """
+        expired = threading.Event()
+        remaining = self.remaining()
+        if remaining is None:
+            yield expired
+            return
+
+        def expire() -> None:
+            expired.set()
+            interrupt()
+
+        timer = threading.Timer(remaining, expire)
+        timer.daemon = True
+        timer.start()
+        try:
+            yield expired
+        finally:
+            timer.cancel()
@@ -1,26 +1,58 @@
 import logging
 import os
+import random
+import time
+from datetime import datetime
 from pathlib import Path
 
 import cloup
-from click import Choice, help_option, pass_obj, version_option
+from click import BadParameter, Choice, help_option, pass_obj, version_option
 from cloup import HelpFormatter, HelpTheme, Section, argument, group, option, pass_context
 
 import easyborg
-from easyborg import config, log_utils, ui
+from easyborg import config, log_utils, process, profiling, ui
 from easyborg.borg import Borg
 from easyborg.command.archive import ArchiveCommand
 from easyborg.command.backup import BackupCommand
+from easyborg.command.cache import CacheCommand
+from easyborg.command.check import CheckCommand
+from easyborg.command.copy import DEFAULT_JOBS, CopyCommand
+from easyborg.command.daemon import DaemonCommand
 from easyborg.command.delete import DeleteCommand
 from easyborg.command.doctor import DoctorCommand
+from easyborg.command.estimate import EstimateCommand
 from easyborg.command.extract import ExtractCommand
 from easyborg.command.open import OpenCommand
 from easyborg.command.replace import ReplaceCommand
 from easyborg.command.restore import RestoreCommand
+from easyborg.command.stats import StatsCommand
+from easyborg.command.status import StatusCommand
+from easyborg.command.tune import DEFAULT_SAMPLE_SIZE, TuneCommand
+from easyborg.command.watch import WatchCommand
 from easyborg.cron import Cron
+from easyborg.daemon import get_socket_path
+from easyborg.daemon import request as daemon_request
+from easyborg.events import open_events
+from easyborg.fingerprint import FingerprintStore
 from easyborg.fzf import Fzf
-from easyborg.model import Context
+from easyborg.governor import Governor
+from easyborg.history import RunHistory, get_history_path
+from easyborg.journal import ChangeJournal
+from easyborg.metrics import TextfileExporter
+from easyborg.model import Config, Context
+from easyborg.schedule import (
+    CATCH_UP_CRON_EXPRESSION,
+    MINUTES_PER_DAY,
+    ScheduleState,
+    cron_expression,
+    exclusive_run,
+    host_offset,
+    is_due,
+)
+from easyborg.sharding import ShardAssignments
 from easyborg.theme import StyleId, theme
+from easyborg.tune import REMOTE_SPEED
+from easyborg.verification import VerificationState
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +73,9 @@ CONTEXT_SETTINGS = cloup.Context.settings(
 SECTION_MAIN = Section("Main commands")
 SECTION_UTILITY = Section("Utility commands")
 
+# non-interactive commands that run with --headless without a console, e.g. from cron or systemd
+HEADLESS_COMMANDS = ("backup", "archive", "check", "watch", "daemon")
+
 # TODO SH eliminate this constant and remove protected method access
 # noinspection PyProtectedMember
 EXPERT_MODE: bool = easyborg.context._is_expert_mode()
@@ -85,6 +120,18 @@ DEBUG_MODE: bool = False
     hidden=not EXPERT_MODE,
     help="Set BorgBackup executable (expert)",
 )
+@option(
+    "--events",
+    metavar="ndjson[=PATH|FD]",
+    hidden=not EXPERT_MODE,
+    help="Emit machine-readable events to stdout, a file, a Unix socket or a file descriptor (expert)",
+)
+@option(
+    "--profile-run",
+    is_flag=True,
+    hidden=not EXPERT_MODE,
+    help="Profile easyborg and write a report next to the log file (expert)",
+)
 @pass_context
 def cli(
         ctx: cloup.Context,
@@ -93,6 +140,8 @@ def cli(
         headless: bool,
         borg_executable: Path | None,
         fzf_executable: Path | None,
+        events: str | None,
+        profile_run: bool,
 ) -> None:
     # first, set DEBUG_MODE flag to enable stacktraces
     global DEBUG_MODE
@@ -102,7 +151,8 @@ def cli(
     log_dir = log_utils.get_log_dir(profile)
     log_file = log_utils.get_log_file(log_dir)
 
-    if headless and ctx.invoked_subcommand in ["backup", "archive"]:
+    console = _uses_console(headless, ctx.invoked_subcommand)
+    if not console:
         # TODO SH currently headless only makes sense with non-interactive commands;
         #   find a way to have the option bound to the actual commands
         log_utils.enable_file_logging(log_file, debug)
@@ -111,6 +161,17 @@ def cli(
     else:
         log_utils.disable_logging()
 
+    if events:
+        try:
+            stream = open_events(events, stdout=not console)  # the console writes to stdout
+        except (ValueError, OSError) as e:
+            raise BadParameter(str(e), param_hint="--events") from e
+        ui.enable_events(stream, command=ctx.invoked_subcommand, profile=profile)
+
+    if profile_run:
+        profiling.start(ctx.invoked_subcommand or "easyborg")
+        ctx.call_on_close(lambda: _finish_profiling(log_dir))
+
     ctx.ensure_object(dict)
 
     easyborg_executable = ctx.obj.pop("easyborg_executable", None)  # move info from Click context to Easyborg context
@@ -126,16 +187,24 @@ def cli(
         fzf_executable=fzf_executable,
     )
     ctx.obj["context"] = context
+    process.set_default_tags({"profile": profile})
 
     configuration = config.load(context.config_file)
     os.environ.update(configuration.env)
     ctx.obj["config"] = configuration
 
-    borg = Borg(executable=context.borg_executable)
-    ctx.obj["borg"] = borg
+    with profiling.span("check executables"):
+        ctx.obj["borg"] = _create_borg(context, configuration)
+
+        fzf = Fzf(executable=context.fzf_executable)
+        ctx.obj["fzf"] = fzf
+
 
-    fzf = Fzf(executable=context.fzf_executable)
-    ctx.obj["fzf"] = fzf
+def _uses_console(headless: bool, command: str | None) -> bool:
+    """
+    Return whether the command writes to the console, or only to the log file because it runs headless.
+    """
+    return not (headless and command in HEADLESS_COMMANDS)
 
 
 @cli.command(section=SECTION_MAIN)
@@ -146,16 +215,108 @@ def cli(
     hidden=not EXPERT_MODE,
     help="If snapshot creation fails, log error and continue with next repository (expert)",
 )
+@option(
+    "--now",
+    is_flag=True,
+    hidden=not EXPERT_MODE,
+    help="Ask the running daemon to create the snapshots right away (expert)",
+)
+@option(
+    "--estimate",
+    is_flag=True,
+    help="Estimate size and duration of the backup without creating snapshots",
+)
+@option(
+    "--if-due",
+    is_flag=True,
+    hidden=not EXPERT_MODE,
+    help="Only back up if a scheduled time passed since the last scheduled backup (expert)",
+)
+@option(
+    "--jitter",
+    type=int,
+    default=0,
+    hidden=not EXPERT_MODE,
+    help="Wait a random number of seconds up to this value before starting (expert)",
+)
+@option(
+    "--time-budget",
+    type=float,
+    hidden=not EXPERT_MODE,
+    help="Stop at a checkpoint after this many minutes and continue in the next run (expert)",
+)
 @help_option(help="Show this message")
 @pass_obj
-def backup(obj, dry_run: bool, tenacious: bool):
+def backup(
+        obj,
+        dry_run: bool,
+        tenacious: bool,
+        now: bool,
+        estimate: bool,
+        if_due: bool,
+        jitter: int,
+        time_budget: float | None,
+):
     """
     Create backup snapshot
 
     Create a snapshot of all configured paths in each of the configured backup repositories.
     """
-    command = BackupCommand(config=obj["config"], borg=obj["borg"])
-    command.run(dry_run=dry_run, tenacious=tenacious)
+    if estimate:
+        context: Context = obj["context"]
+        EstimateCommand(config=obj["config"], history=RunHistory(get_history_path(context.state_dir))).run()
+        return
+
+    if now:
+        if dry_run or jitter:
+            raise BadParameter("can't be combined with --dry-run or --jitter", param_hint="--now")
+        context: Context = obj["context"]
+        try:
+            # the daemon always continues with the next repository after a failure, like --tenacious
+            daemon_request(get_socket_path(context.state_dir), "backup", time_budget=time_budget)
+            ui.success("Backup requested from daemon")
+            return
+        except RuntimeError as e:
+            ui.warn(str(e), "backing up in this process")
+
+    command = _create_backup_command(obj, obj["config"])
+
+    if not if_due:
+        time.sleep(random.uniform(0, jitter))
+        command.run(dry_run=dry_run, tenacious=tenacious, time_budget=time_budget)
+        return
+
+    context: Context = obj["context"]
+    settings = obj["config"].schedule
+    state = ScheduleState(context.state_dir / "schedule.json")
+    offset = host_offset(context.profile, settings.interval) if settings.stagger else 0
+
+    with exclusive_run(context.state_dir / "schedule.lock") as acquired:
+        if not acquired:
+            logger.info("Scheduled backup is already running")
+            return
+        current_time = datetime.now().astimezone()
+        if not is_due(state.last_run(), current_time, settings.interval, offset):
+            logger.debug("Scheduled backup is not due")
+            return
+        state.record_run(current_time)
+        time.sleep(random.uniform(0, jitter))
+        command.run(dry_run=dry_run, tenacious=tenacious, time_budget=time_budget)
+
+
+@cli.command(section=SECTION_MAIN)
+@option("--dry-run", is_flag=True, help="Do not modify data")
+@help_option(help="Show this message")
+@pass_obj
+def watch(obj, dry_run: bool):
+    """
+    Watch backup paths and back up changes (Linux)
+
+    Watch all configured paths for changes and create snapshots in the configured backup repositories
+    shortly after changes have occurred. Runs until interrupted.
+    """
+    command = WatchCommand(config=obj["config"], backup=_create_backup_command(obj, obj["config"]))
+    command.run(dry_run=dry_run)
 
 
 @cli.command(section=SECTION_MAIN)
@@ -174,7 +335,14 @@ def archive(obj, path: Path, comment: str | None, dry_run: bool):
 
     Create a snapshot of the specified path in each of the configured archive repositories.
     """
-    command = ArchiveCommand(config=obj["config"], borg=obj["borg"])
+    context: Context = obj["context"]
+    history = RunHistory(get_history_path(context.state_dir))
+    command = ArchiveCommand(
+        config=obj["config"],
+        borg=obj["borg"],
+        history=history,
+        metrics=_create_metrics_exporter(context, obj["config"], history),
+    )
     command.run(path, dry_run=dry_run, comment=comment)
 
 
@@ -220,7 +388,13 @@ def delete(obj, dry_run: bool):
 
     Delete a snapshot of your choice.
     """
-    command = DeleteCommand(config=obj["config"], borg=obj["borg"], fzf=obj["fzf"])
+    context: Context = obj["context"]
+    command = DeleteCommand(
+        config=obj["config"],
+        borg=obj["borg"],
+        fzf=obj["fzf"],
+        history=RunHistory(get_history_path(context.state_dir)),
+    )
     command.run(dry_run=dry_run)
 
 
@@ -256,17 +430,216 @@ def autobackup(obj, action):
     context: Context = obj["context"]
 
     if action == "enable":
+        settings = obj["config"].schedule
+        offset = host_offset(context.profile, settings.interval) if settings.stagger else 0
+
+        arguments = []
+        if settings.jitter:
+            arguments.extend(["--jitter", str(settings.jitter)])
+        if settings.catch_up:
+            arguments.append("--if-due")
+
         Cron(context.profile).enable(
             "backup",
             context.easyborg_executable,
             context.borg_executable,
             context.fzf_executable,
-            schedule="@hourly",
+            schedule=CATCH_UP_CRON_EXPRESSION if settings.catch_up else cron_expression(settings.interval, offset),
+            arguments=arguments,
         )
     else:
         Cron(context.profile).disable()
 
 
+@cli.command(section=SECTION_UTILITY, hidden=not EXPERT_MODE)
+@help_option(help="Show this message")
+@pass_obj
+def daemon(obj):
+    """
+    Run backups from a long-running process (expert)
+
+    Creates backups regularly and keeps configuration and connections warm between them. Start it with a
+    systemd user unit or a cron @reboot entry. The configuration file is reloaded when it changes.
+    """
+    context: Context = obj["context"]
+    command = DaemonCommand(
+        profile=context.profile,
+        config_file=context.config_file,
+        socket_path=get_socket_path(context.state_dir),
+        create_backup=lambda configuration: _create_backup_command(obj, configuration),
+        sync_caches=lambda configuration: _create_cache_command(obj, configuration).sync(),
+        create_check=lambda configuration: _create_check_command(obj, configuration),
+        check_schedule=ScheduleState(context.state_dir / "check-schedule.json"),
+        on_reload=lambda configuration: obj.update(config=configuration, borg=_create_borg(context, configuration)),
+    )
+    command.run()
+
+
+@cli.command(section=SECTION_UTILITY, hidden=not EXPERT_MODE)
+@help_option(help="Show this message")
+@pass_obj
+def status(obj):
+    """
+    Show status of the running daemon (expert)
+    """
+    context: Context = obj["context"]
+    command = StatusCommand(socket_path=get_socket_path(context.state_dir))
+    command.run()
+
+
+@cli.command(section=SECTION_UTILITY, hidden=not EXPERT_MODE)
+@argument("repository", required=False, help="Show only this repository")
+@help_option(help="Show this message")
+@pass_obj
+def stats(obj, repository: str | None):
+    """
+    Show statistics of past runs (expert)
+
+    Show durations, throughput and deduplication of the recorded Borg operations in each repository, and warn about
+    runs that took much longer than usual.
+    """
+    context: Context = obj["context"]
+    command = StatsCommand(config=obj["config"], history=RunHistory(get_history_path(context.state_dir)))
+    command.run(repository)
+
+
+@cli.command(section=SECTION_UTILITY, hidden=not EXPERT_MODE)
+@argument("repository", required=False, help="Check only this repository")
+@option(
+    "--time-budget",
+    type=float,
+    help="Minutes for the whole check, instead of the configured time budget",
+)
+@option(
+    "--tenacious",
+    is_flag=True,
+    help="If a repository check fails, log error and continue with next repository",
+)
+@option(
+    "--if-due",
+    is_flag=True,
+    help="Only check if the configured check hour passed since the last scheduled check",
+)
+@help_option(help="Show this message")
+@pass_obj
+def check(obj, repository: str | None, time_budget: float | None, tenacious: bool, if_due: bool):
+    """
+    Check repository integrity (expert)
+
+    Check part of each repository and verify the data of the snapshots that are due within a time budget. Repeated
+    runs (e.g. nightly) check the whole repository and verify every snapshot within the verification period.
+    """
+    command = _create_check_command(obj, obj["config"])
+
+    if not if_due:
+        command.run(repository, time_budget=time_budget, tenacious=tenacious)
+        return
+
+    context: Context = obj["context"]
+    hour = obj["config"].check.hour
+    if hour is None:
+        raise RuntimeError("No check hour configured ([check] hour)")
+    state = ScheduleState(context.state_dir / "check-schedule.json")
+
+    with exclusive_run(context.state_dir / "check.lock") as acquired:
+        if not acquired:
+            logger.info("Scheduled check is already running")
+            return
+        current_time = datetime.now().astimezone()
+        if not is_due(state.last_run(), current_time, MINUTES_PER_DAY, hour * 60):
+            logger.debug("Scheduled check is not due")
+            return
+        state.record_run(current_time)
+        command.run(repository, time_budget=time_budget, tenacious=tenacious)
+
+
+@cli.command(section=SECTION_UTILITY, hidden=not EXPERT_MODE)
+@option("--clean", is_flag=True, help="Remove caches of repositories that are no longer configured")
+@option("--unmanaged", is_flag=True, help="Also remove stale caches in Borg's own cache directory")
+@option("--sync", is_flag=True, help="Synchronize the caches of all repositories")
+@option("--dry-run", is_flag=True, help="Do not modify data")
+@help_option(help="Show this message")
+@pass_obj
+def cache(obj, clean: bool, unmanaged: bool, sync: bool, dry_run: bool):
+    """
+    Show and maintain Borg caches (expert)
+    """
+    command = _create_cache_command(obj, obj["config"])
+    command.run(clean=clean, unmanaged=unmanaged, sync=sync, dry_run=dry_run)
+
+
+@cli.command(section=SECTION_UTILITY, hidden=not EXPERT_MODE)
+@option(
+    "--sample-size",
+    type=int,
+    default=DEFAULT_SAMPLE_SIZE // 1_000_000,
+    show_default=True,
+    help="Size of the sample of backup files to benchmark with (MB)",
+)
+@option(
+    "--upload-speed",
+    type=float,
+    default=REMOTE_SPEED / 1_000_000,
+    show_default=True,
+    help="Speed of the connection to remote repositories (MB/s)",
+)
+@option(
+    "--chunker",
+    is_flag=True,
+    help="Also benchmark and change chunker parameters (the next snapshots upload all data again)",
+)
+@option("--dry-run", is_flag=True, help="Do not modify the configuration file")
+@help_option(help="Show this message")
+@pass_obj
+def tune(obj, sample_size: int, upload_speed: float, chunker: bool, dry_run: bool):
+    """
+    Find the best compression and chunker settings (expert)
+
+    Benchmark compression (and with --chunker, chunker parameters) on a sample of the backup paths and write the
+    best settings for each backup repository into the configuration file.
+    """
+    context: Context = obj["context"]
+    command = TuneCommand(config=obj["config"], borg=obj["borg"], config_file=context.config_file)
+    command.run(
+        sample_size=sample_size * 1_000_000,
+        remote_speed=upload_speed * 1_000_000,
+        chunker=chunker,
+        dry_run=dry_run,
+    )
+
+
+@cli.command(section=SECTION_UTILITY, hidden=not EXPERT_MODE)
+@argument("source", help="Repository to copy from")
+@argument("targets", nargs=-1, required=True, help="Repositories to copy to")
+@option(
+    "--snapshot",
+    "-s",
+    "names",
+    multiple=True,
+    help="Copy only this snapshot (can be repeated, default: all snapshots missing in the targets)",
+)
+@option(
+    "--jobs",
+    "-j",
+    type=cloup.IntRange(min=1),
+    default=DEFAULT_JOBS,
+    show_default=True,
+    help="Number of target repositories to copy to at the same time",
+)
+@option("--dry-run", is_flag=True, help="Do not modify data")
+@help_option(help="Show this message")
+@pass_obj
+def copy(obj, source: str, targets: tuple[str, ...], names: tuple[str, ...], jobs: int, dry_run: bool):
+    """
+    Copy snapshots to other repositories (expert)
+
+    Stream snapshots from the source repository into the target repositories, keeping their names, comments and
+    timestamps, without reading the original data again.
+    """
+    command = CopyCommand(config=obj["config"], borg=obj["borg"])
+    command.run(source, targets, names=names, jobs=jobs, dry_run=dry_run)
+
+
 @cli.command(section=SECTION_UTILITY)
 @help_option(help="Show this message")
 @pass_obj
@@ -289,3 +662,58 @@ def open(obj):
     """
     command = OpenCommand(fzf=obj["fzf"])
     command.run(context=obj["context"])
+
+
+def _create_borg(context: Context, configuration: Config) -> Borg:
+    return Borg(
+        executable=context.borg_executable,
+        cache_dir=context.cache_dir if configuration.cache.managed else None,
+        watchdog=configuration.watchdog,
+        lock_wait=configuration.locks.wait,
+    )
+
+
+def _create_backup_command(obj, configuration: Config) -> BackupCommand:
+    context: Context = obj["context"]
+    history = RunHistory(get_history_path(context.state_dir))
+    return BackupCommand(
+        config=configuration,
+        borg=obj["borg"],
+        fingerprints=FingerprintStore(context.state_dir / "fingerprints.json"),
+        journal=ChangeJournal(context.state_dir / "journal.json"),
+        governor=(
+            Governor(configuration.governor, lock_wait=configuration.locks.wait)
+            if configuration.governor.enabled()
+            else None
+        ),
+        history=history,
+        shards=ShardAssignments(context.state_dir / "shards.json"),
+        metrics=_create_metrics_exporter(context, configuration, history),
+    )
+
+
+def _create_metrics_exporter(context: Context, configuration: Config, history: RunHistory) -> TextfileExporter | None:
+    textfile = configuration.metrics.textfile
+    return TextfileExporter(textfile, history, profile=context.profile) if textfile else None
+
+
+def _create_check_command(obj, configuration: Config) -> CheckCommand:
+    context: Context = obj["context"]
+    return CheckCommand(
+        config=configuration,
+        borg=obj["borg"],
+        state=VerificationState(context.state_dir / "verification.json"),
+        history=RunHistory(get_history_path(context.state_dir)),
+    )
+
+
+def _create_cache_command(obj, configuration: Config) -> CacheCommand:
+    context: Context = obj["context"]
+    return CacheCommand(config=configuration, borg=obj["borg"], cache_dir=context.cache_dir)
+
+
+def _finish_profiling(log_dir: Path) -> None:
+    paths = profiling.finish(log_dir)
+    if paths:
+        report_path, stats_path = paths
+        ui.info(f"Profile written to {ui.link_path(report_path)} and {ui.link_path(stats_path)}")
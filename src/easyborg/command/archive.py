@@ -1,24 +1,37 @@
 import random
 from pathlib import Path
+from typing import Any
 
 from easyborg import ui
 from easyborg.borg import Borg
+from easyborg.history import RunHistory, recorded
+from easyborg.metrics import TextfileExporter
 from easyborg.model import Config, RepositoryType, Snapshot
 from easyborg.util import create_snapshot_name
 
 
 class ArchiveCommand:
-    def __init__(self, *, config: Config, borg: Borg):
+    def __init__(
+            self,
+            *,
+            config: Config,
+            borg: Borg,
+            history: RunHistory | None = None,
+            metrics: TextfileExporter | None = None,
+    ):
         super().__init__()
         self.config = config
         self.borg = borg
+        self.history = history
+        self.metrics = metrics
 
     def run(self, path: Path, *, dry_run: bool = False, comment: str | None = None) -> None:
         if not path.exists():
             raise RuntimeError(f"Path does not exist: {path}")
 
         index = 0
-        for repo in self.config.repos.values():
+        history = self.history if not dry_run else None
+        for repo in ui.scoped(self.config.repos.values(), repository=lambda repo: repo.name):
             if repo.type is not RepositoryType.ARCHIVE:
                 continue
 
@@ -26,19 +39,30 @@ class ArchiveCommand:
                 ui.newline()
 
             snapshot = Snapshot(repo, create_snapshot_name(), comment=comment)
+            stats: dict[str, Any] = {}
 
-            ui.info(f"Creating snapshot {snapshot.name} in repository {repo.name}")
-            ui.spinner(
-                lambda: self.borg.create_snapshot(snapshot, [path], dry_run=dry_run, progress=True),
-                message="Creating snapshot",
-            )
-
-            ui.info(f"Compacting repository {repo.name}")
-            if random.random() < repo.compact_probability:
-                ui.spinner(
-                    lambda: self.borg.compact(repo, dry_run=dry_run, progress=True),
-                    message="Compacting",
-                )
+            try:
+                ui.info(f"Creating snapshot {snapshot.name} in repository {repo.name}")
+                with recorded(history, repo.name, "create", stats=stats):
+                    ui.spinner(
+                        lambda: self.borg.create_snapshot(
+                            snapshot, [path], dry_run=dry_run, progress=True, stats=stats
+                        ),
+                        message="Creating snapshot",
+                    )
+                if stats:
+                    ui.event("stats", **stats)
+
+                ui.info(f"Compacting repository {repo.name}")
+                if random.random() < repo.compact_probability:
+                    with recorded(history, repo.name, "compact"):
+                        ui.spinner(
+                            lambda: self.borg.compact(repo, dry_run=dry_run, progress=True),
+                            message="Compacting",
+                        )
+            finally:
+                if self.metrics and not dry_run:
+                    self.metrics.export(self.config.repos.values())
 
             ui.success("Archive completed")
             index += 1
@@ -1,64 +1,425 @@
 import random
+import threading
+from collections.abc import Collection, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from datetime import timedelta
+from pathlib import Path
+from typing import Any
 
 from easyborg import ui
 from easyborg.borg import Borg
-from easyborg.model import Config, RepositoryType, Snapshot
-from easyborg.util import create_snapshot_name
+from easyborg.cache import files_cache_mode
+from easyborg.checkpoint import TimeBudget, interrupted_snapshot
+from easyborg.estimate import expect, track
+from easyborg.exclusions import Excluder, ExclusionReport, compile_patterns, patterns_file
+from easyborg.fingerprint import FingerprintStore, compute_fingerprint
+from easyborg.governor import Governor
+from easyborg.history import RunHistory, recorded
+from easyborg.journal import ChangeJournal
+from easyborg.locks import break_stale_lock
+from easyborg.metrics import TextfileExporter
+from easyborg.model import (
+    Config,
+    ExclusionSettings,
+    ProgressEvent,
+    Repository,
+    RepositoryType,
+    Snapshot,
+    StreamSource,
+)
+from easyborg.replication import pending
+from easyborg.sharding import ShardAssignments, shard_repositories
+from easyborg.theme import StyleId, theme
+from easyborg.util import create_snapshot_name, format_size
+
+STYLES = theme().styles
 
 
 class BackupCommand:
-    def __init__(self, *, config: Config, borg: Borg):
+    def __init__(
+            self,
+            *,
+            config: Config,
+            borg: Borg,
+            fingerprints: FingerprintStore | None = None,
+            journal: ChangeJournal | None = None,
+            governor: Governor | None = None,
+            history: RunHistory | None = None,
+            shards: ShardAssignments | None = None,
+            metrics: TextfileExporter | None = None,
+    ):
         super().__init__()
         self.config = config
         self.borg = borg
+        self.fingerprints = fingerprints
+        self.journal = journal
+        self.governor = governor
+        self.history = history
+        self.shards = shards
+        self.metrics = metrics
+        self._patterns: dict[ExclusionSettings, list[str]] = {}
+
+    def run(
+            self,
+            *,
+            dry_run: bool = False,
+            tenacious=False,
+            only: Collection[str] | None = None,
+            time_budget: float | None = None,
+    ) -> list[str]:
+        """
+        Create a snapshot in each backup repository (or only in the repositories with the given names). Returns the
+        names of the repositories that failed (only with tenacious, otherwise the error is raised).
 
-    def run(self, *, dry_run: bool = False, tenacious=False) -> None:
+        The time budget (minutes, the configured one by default) limits the whole run: Borg is interrupted when it's
+        used up and the next run continues the snapshot from its last checkpoint. Interrupted snapshots are
+        continued with a time budget or a checkpoint interval configured.
+        """
         index = 0
+        failed: list[str] = []
+        if time_budget is None:
+            time_budget = self.config.schedule.time_budget
+        budget = TimeBudget(time_budget * 60 if time_budget is not None else None)
 
         backup_paths = self.config.backup_paths
         if not backup_paths:
             ui.warn("No backup paths configured")
-            return
+            return failed
 
-        for repo in self.config.repos.values():
-            if repo.type is not RepositoryType.BACKUP:
-                continue
+        repos = [
+            repo
+            for repo in self.config.repos.values()
+            if repo.type is RepositoryType.BACKUP and (only is None or repo.name in only)
+        ]
+        repos.sort(key=lambda repo: repo.mirror_of is not None)  # mirrors copy the snapshots of this run
 
-            try:
-                if index:
-                    ui.newline()
+        if self.governor:
+            self._defer()
 
-                snapshot = Snapshot(repo, create_snapshot_name())
+        fingerprint = None
+        if self.fingerprints and any(repo.skip_unchanged for repo in repos):
+            fingerprint = self._compute_fingerprint(backup_paths)
 
-                ui.info(f"Creating snapshot {snapshot.name} in repository {repo.name}")
-                ui.spinner(
-                    lambda: self.borg.create_snapshot(
-                        snapshot,
-                        backup_paths,
+        collected_paths: list[str] | None = None
+        history = self.history if not dry_run else None
+
+        with self.governor.supervise() if self.governor else nullcontext():
+            for repo in ui.scoped(repos, repository=lambda repo: repo.name):
+                expired: threading.Event | None = None
+                try:
+                    if index:
+                        ui.newline()
+
+                    if budget.exhausted():
+                        ui.warn(f"Time budget used up, skipping repository {repo.name}")
+                        continue
+
+                    if self.config.locks.break_stale and not dry_run and break_stale_lock(self.borg, repo):
+                        ui.warn(f"Removed stale lock of repository {repo.name}")
+
+                    if repo.mirror_of:
+                        with recorded(history, repo.name, "mirror"):
+                            self._mirror(repo, dry_run=dry_run)
+                        self._prune(repo, dry_run=dry_run)
+                        ui.success("Backup completed")
+                        continue
+
+                    if (
+                            fingerprint
+                            and repo.skip_unchanged
+                            and self.fingerprints.is_unchanged(
+                                repo.name, fingerprint, max_age=timedelta(hours=repo.max_skip_hours)
+                            )
+                    ):
+                        ui.info(f"No changes since last snapshot in repository {repo.name}, skipping")
+                        continue
+
+                    incremental = bool(self.journal and repo.incremental)
+                    if incremental and collected_paths is None:
+                        collected_paths = self._collect_paths(backup_paths)
+
+                    exclusions = self.config.exclusions.merge(repo.exclusions)
+                    patterns = self._compile_patterns(exclusions, backup_paths)
+                    paths = collected_paths if incremental else backup_paths
+                    if exclusions.enabled() and (incremental or dry_run):
+                        excluder = Excluder(exclusions, patterns, backup_paths)
+                        if dry_run:
+                            self._report_exclusions(excluder)
+                        if incremental:
+                            paths = excluder.filter(collected_paths)  # Borg doesn't search given paths for tags
+
+                    # looking costs a Borg list, so only where interruptions are expected
+                    resumable = time_budget is not None or repo.checkpoint_interval is not None
+                    interrupted = None
+                    if resumable and not dry_run and not repo.shards:
+                        interrupted = self._interrupted_snapshot(repo)
+                    snapshot = Snapshot(repo, interrupted or create_snapshot_name())
+                    files_cache = files_cache_mode(repo, backup_paths)
+                    stream = repo.stream or self.config.stream
+
+                    if interrupted:
+                        ui.info(f"Continuing snapshot {snapshot.name} in repository {repo.name}")
+                    else:
+                        ui.info(f"Creating snapshot {snapshot.name} in repository {repo.name}")
+                    stats: dict[str, Any] = {}
+                    expectation = expect(self.history, repo) if self.history else None
+                    with (
+                        recorded(history, repo.name, "create", stats=stats),
+                        budget.enforce(self.borg.interrupt) as expired,
+                        patterns_file(patterns) as patterns_path,
+                    ):
+                        if repo.shards:
+                            self._create_sharded(
+                                snapshot,
+                                backup_paths,
+                                dry_run=dry_run,
+                                files_cache=files_cache,
+                                exclusions=exclusions,
+                                patterns_file=patterns_path,
+                                stats=stats,
+                                stream=stream,
+                            )
+                        else:
+
+                            def create() -> Iterator[ProgressEvent]:
+                                events = self.borg.create_snapshot(
+                                    snapshot,
+                                    paths,
+                                    dry_run=dry_run,
+                                    progress=True,
+                                    paths_from_stdin=incremental,
+                                    files_cache=files_cache,
+                                    exclusions=exclusions,
+                                    patterns_file=patterns_path,
+                                    stats=stats,
+                                    stream=stream,
+                                )
+                                return track(events, expectation, name=snapshot.name) if expectation else events
+
+                            # the bar needs a total, which borg create doesn't report
+                            show = ui.progress if expectation else ui.spinner
+                            show(create, message="Creating snapshot")
+                    if stats:
+                        ui.event("stats", **stats)
+
+                    if fingerprint and not dry_run:
+                        self.fingerprints.update(repo.name, fingerprint)
+
+                    self._prune(repo, dry_run=dry_run)
+                    ui.success("Backup completed")
+                except Exception as e:
+                    if expired and expired.is_set():
+                        ui.warn(f"Time budget used up, snapshot {snapshot.name} continues in the next run")
+                    elif tenacious:
+                        ui.exception(e)  # don't throw, keep going
+                        failed.append(repo.name)
+                    else:
+                        raise e
+                finally:
+                    index += 1
+                    if self.metrics and not dry_run:
+                        self.metrics.export(self.config.repos.values())  # also after failures, so they can alert
+        return failed
+
+    def _interrupted_snapshot(self, repo: Repository) -> str | None:
+        names: list[str] = []
+
+        def find() -> Iterator[ProgressEvent]:
+            nonlocal names
+            names = [snap.name for snap in self.borg.list_snapshots(repo, checkpoints=True)]
+            return iter([])
+
+        ui.spinner(find, message="Looking for interrupted snapshots")
+        return interrupted_snapshot(names)
+
+    def _create_sharded(
+            self,
+            snapshot: Snapshot,
+            backup_paths: list[Path],
+            *,
+            dry_run: bool,
+            stats: dict[str, Any],
+            stream: StreamSource | None,
+            **options: Any,
+    ) -> None:
+        """
+        Create the snapshot in all shards of the repository at the same time (one Borg process per shard). The
+        stream goes to the first part.
+
+        If a shard fails, the parts created in the other shards are deleted again, so a snapshot is either complete
+        or doesn't exist.
+        """
+        repo = snapshot.repository
+        if not self.shards:
+            raise RuntimeError(f"Repository {repo.name} is sharded, but shard assignments are not available")
+
+        assignment: list[list[Path]] = []
+
+        def assign() -> Iterator[ProgressEvent]:
+            nonlocal assignment
+            assignment = self.shards.assign(repo, backup_paths, dry_run=dry_run)
+            return iter([])
+
+        ui.spinner(assign, message="Assigning paths to shards")
+
+        parts = [
+            (Snapshot(shard, snapshot.name, snapshot.comment), paths)
+            for shard, paths in zip(shard_repositories(repo), assignment)
+            if paths
+        ]
+        results: dict[str, dict[str, Any]] = {part.repository.name: {} for part, _ in parts}
+        created: list[Snapshot] = []
+        errors: list[tuple[Snapshot, Exception]] = []
+
+        def create() -> Iterator[ProgressEvent]:
+            with ThreadPoolExecutor(max_workers=len(parts), thread_name_prefix="shard") as executor:
+                futures = {
+                    executor.submit(
+                        self.borg.create_snapshot,
+                        part,
+                        paths,
                         dry_run=dry_run,
-                        progress=True,
-                    ),
-                    message="Creating snapshot",
-                )
+                        stats=results[part.repository.name],
+                        stream=stream if index == 0 else None,
+                        **options,
+                    ): part
+                    for index, (part, paths) in enumerate(parts)
+                }
+                for current, future in enumerate(as_completed(futures), start=1):
+                    part = futures[future]
+                    try:
+                        future.result()
+                        created.append(part)
+                    except Exception as e:
+                        errors.append((part, e))
+                    yield ProgressEvent(total=len(parts), current=current, message=f"Shard {part.repository.name}")
 
-                ui.info(f"Pruning old snapshots in repository {repo.name}")
+        ui.progress(create, message="Creating snapshot")
+
+        if errors:
+            if not dry_run:
+                for part in created:
+                    self.borg.delete(part)
+            part, e = errors[0]
+            raise RuntimeError(f"Could not create snapshot in shard {part.repository.name}: {e}") from e
+
+        if not dry_run:
+            for key in ("original_size", "compressed_size", "deduplicated_size", "nfiles"):
+                stats[key] = sum(result.get(key, 0) for result in results.values())
+            self.shards.update_loads(
+                repo.name,
+                [results.get(shard.name, {}).get("original_size") for shard in shard_repositories(repo)],
+            )
+
+    def _prune(self, repo: Repository, *, dry_run: bool) -> None:
+        history = self.history if not dry_run else None
+
+        ui.info(f"Pruning old snapshots in repository {repo.name}")
+        with recorded(history, repo.name, "prune"):
+            ui.spinner(
+                lambda: self.borg.prune(repo, dry_run=dry_run, progress=True),
+                message="Pruning",
+            )
+
+        if random.random() < repo.compact_probability:
+            ui.info(f"Compacting repository {repo.name}")
+            with recorded(history, repo.name, "compact"):
                 ui.spinner(
-                    lambda: self.borg.prune(repo, dry_run=dry_run, progress=True),
-                    message="Pruning",
+                    lambda: self.borg.compact(repo, dry_run=dry_run, progress=True),
+                    message="Compacting",
                 )
 
-                if random.random() < repo.compact_probability:
-                    ui.info(f"Compacting repository {repo.name}")
-                    ui.spinner(
-                        lambda: self.borg.compact(repo, dry_run=dry_run, progress=True),
-                        message="Compacting",
-                    )
-
-                ui.success("Backup completed")
-            except Exception as e:
-                if tenacious:
-                    ui.exception(e)  # don't throw, keep going
-                else:
-                    raise e
-            finally:
-                index += 1
+    def _mirror(self, repo: Repository, *, dry_run: bool) -> None:
+        """
+        Copy the new snapshots of the primary repository instead of reading the backup paths again.
+        """
+        primary = self.config.repos[repo.mirror_of]
+        snapshots: list[Snapshot] = []
+
+        def compare() -> Iterator[ProgressEvent]:
+            nonlocal snapshots
+            snapshots = pending(self.borg.list_snapshots(primary), self.borg.list_snapshots(repo))
+            return iter([])
+
+        ui.spinner(compare, message="Comparing repositories")
+        if not snapshots:
+            ui.info(f"No new snapshots in repository {primary.name}")
+            return
+
+        for snapshot in snapshots:
+            ui.info(f"Copying snapshot {snapshot.name} from repository {primary.name} to repository {repo.name}")
+
+            def transfer() -> Iterator[ProgressEvent]:
+                self.borg.transfer(snapshot, repo, dry_run=dry_run)
+                return iter([])
+
+            ui.spinner(transfer, message="Copying snapshot")
+
+    def _compile_patterns(self, exclusions: ExclusionSettings, backup_paths: list[Path]) -> list[str]:
+        # reading .gitignore files means walking the backup paths, so do it once per run
+        if exclusions not in self._patterns:
+
+            def build() -> Iterator[ProgressEvent]:
+                self._patterns[exclusions] = compile_patterns(exclusions, backup_paths)
+                return iter([])
+
+            ui.spinner(build, message="Compiling exclusions")
+        return self._patterns[exclusions]
+
+    @staticmethod
+    def _report_exclusions(excluder: Excluder) -> None:
+        report: ExclusionReport | None = None
+
+        def measure() -> Iterator[ProgressEvent]:
+            nonlocal report
+            report = excluder.report()
+            return iter([])
+
+        ui.spinner(measure, message="Measuring exclusions")
+
+        rows = [
+            (rule, str(report.files[rule]), format_size(report.bytes[rule]))
+            for rule in sorted(report.files, key=lambda rule: report.bytes[rule], reverse=True)
+        ]
+        rows.append(("(included)", str(report.included_files), format_size(report.included_bytes)))
+        ui.table(
+            rows,
+            headers=("Exclusion", "Files", "Size"),
+            column_colors=(STYLES[StyleId.PRIMARY], None, None),
+        )
+
+    def _defer(self) -> None:
+        def defer() -> Iterator[ProgressEvent]:
+            self.governor.defer()
+            return iter([])
+
+        ui.spinner(defer, message="Waiting for system to become idle")
+
+    def _collect_paths(self, backup_paths: list[Path]) -> list[str]:
+        paths: list[str] = []
+
+        def collect() -> Iterator[ProgressEvent]:
+            nonlocal paths
+            paths = self.journal.collect(backup_paths)
+            return iter([])
+
+        ui.spinner(collect, message="Collecting paths")
+        return paths
+
+    @staticmethod
+    def _compute_fingerprint(backup_paths: list[Path]) -> str | None:
+        fingerprint: str | None = None
+
+        def compute() -> Iterator[ProgressEvent]:
+            nonlocal fingerprint
+            fingerprint = compute_fingerprint(backup_paths)
+            return iter([])
+
+        try:
+            ui.spinner(compute, message="Checking for changes")
+        except OSError as e:
+            ui.warn("Could not check for changes", str(e))  # fall back to regular snapshots
+            return None
+
+        return fingerprint
@@ -0,0 +1,79 @@
+from collections.abc import Iterator
+from pathlib import Path
+
+from easyborg import ui
+from easyborg.borg import Borg
+from easyborg.cache import get_borg_cache_dir, list_caches, remove_cache
+from easyborg.model import Config, ProgressEvent
+from easyborg.sharding import with_shards
+from easyborg.theme import StyleId, theme
+from easyborg.util import format_size
+
+STYLES = theme().styles
+
+
+class CacheCommand:
+    """
+    Show, clean up and synchronize Borg's local repository caches.
+    """
+
+    def __init__(self, *, config: Config, borg: Borg, cache_dir: Path) -> None:
+        super().__init__()
+        self.config = config
+        self.borg = borg
+        self.cache_dir = cache_dir
+
+    def run(self, *, clean: bool = False, unmanaged: bool = False, sync: bool = False, dry_run: bool = False) -> None:
+        caches = list_caches(with_shards(self.config.repos), self.cache_dir, get_borg_cache_dir())
+
+        ui.header("Caches", first=True)
+        if caches:
+            rows = [
+                (
+                    cache.repository or "(stale)",
+                    cache.location or "-",
+                    format_size(cache.size),
+                    "managed" if cache.managed else "borg",
+                    ui.link_path(cache.path),
+                )
+                for cache in caches
+            ]
+            ui.table(
+                rows,
+                column_colors=(STYLES[StyleId.PRIMARY], None, None, STYLES[StyleId.SECONDARY], None),
+            )
+            ui.display(f"Total: {format_size(sum(cache.size for cache in caches))}", indent=1)
+        else:
+            ui.display("(no caches found)", indent=1)
+
+        if clean:
+            # caches in Borg's own directory may belong to other profiles, so they're only removed on request
+            stale = [cache for cache in caches if cache.repository is None and (cache.managed or unmanaged)]
+            for cache in stale:
+                ui.info(f"Removing stale cache {cache.path} ({format_size(cache.size)})")
+                if not dry_run:
+                    remove_cache(cache)
+            if not stale:
+                ui.info("No stale caches")
+
+        if sync:
+            self.sync(tenacious=False)
+
+    def sync(self, *, tenacious: bool = True) -> None:
+        """
+        Synchronize the caches of all repositories, so the next backup starts right away.
+        """
+        for repo in self.config.repos.values():
+            ui.info(f"Synchronizing cache of repository {repo.name}")
+
+            def sync() -> Iterator[ProgressEvent]:
+                self.borg.sync_cache(repo)
+                return iter([])
+
+            try:
+                ui.spinner(sync, message="Synchronizing cache")
+            except Exception as e:
+                if tenacious:
+                    ui.exception(e)
+                else:
+                    raise e
@@ -0,0 +1,124 @@
+import threading
+from collections.abc import Iterator
+
+from easyborg import ui
+from easyborg.borg import PARTIAL_SUFFIX, Borg
+from easyborg.checkpoint import TimeBudget
+from easyborg.history import RunHistory, recorded
+from easyborg.model import CheckSettings, Config, ProgressEvent, Repository, Snapshot
+from easyborg.verification import VerificationState, overdue, quota, rotation
+
+
+class CheckCommand:
+    """
+    Check the integrity of the repositories within a time budget.
+
+    Each run checks part of each repository's segments (Borg continues where the last check stopped) and verifies
+    the data of the snapshots that are due, so every snapshot is verified once within the verification period.
+    """
+
+    def __init__(
+            self,
+            *,
+            config: Config,
+            borg: Borg,
+            state: VerificationState,
+            history: RunHistory | None = None,
+    ) -> None:
+        super().__init__()
+        self.config = config
+        self.borg = borg
+        self.state = state
+        self.history = history
+
+    def run(self, repository: str | None = None, *, time_budget: float | None = None, tenacious=False) -> None:
+        """
+        Check all repositories (or only the one with the given name) within the time budget (minutes, the
+        configured one by default). The budget is shared evenly; time a repository doesn't use goes to the next one.
+        """
+        if repository is not None and repository not in self.config.repos:
+            raise RuntimeError(f"Unknown repository: {repository}")
+
+        settings = self.config.check
+        budget = TimeBudget((time_budget if time_budget is not None else settings.time_budget) * 60)
+        repos = [repo for repo in self.config.repos.values() if repository in (None, repo.name)]
+
+        for index, repo in enumerate(ui.scoped(repos, repository=lambda repo: repo.name)):
+            try:
+                if index:
+                    ui.newline()
+
+                if budget.exhausted():
+                    ui.warn(f"Time budget used up, skipping repository {repo.name}")
+                    continue
+
+                share = TimeBudget(budget.remaining() / (len(repos) - index))
+                self._check(repo, share, settings)
+                self._verify(repo, share, settings)
+                ui.success("Check completed")
+            except Exception as e:
+                if tenacious:
+                    ui.exception(e)  # don't throw, keep going
+                else:
+                    raise e
+
+    def _check(self, repo: Repository, budget: TimeBudget, settings: CheckSettings) -> None:
+        if not settings.repository_share:
+            return
+
+        max_duration = max(1, int(budget.remaining() * settings.repository_share))
+        ui.info(f"Checking repository {repo.name}")
+        with recorded(self.history, repo.name, "check"):
+            ui.progress(
+                lambda: self.borg.check(repo, max_duration=max_duration, progress=True),
+                message="Checking repository",
+            )
+
+    def _verify(self, repo: Repository, budget: TimeBudget, settings: CheckSettings) -> None:
+        snapshots: list[Snapshot] = []
+
+        def list_snapshots() -> Iterator[ProgressEvent]:
+            nonlocal snapshots
+            snapshots = [snap for snap in self.borg.list_snapshots(repo) if not snap.name.endswith(PARTIAL_SUFFIX)]
+            return iter([])
+
+        ui.spinner(list_snapshots, message="Listing snapshots")
+
+        names = [snap.name for snap in snapshots]
+        by_name = {snap.name: snap for snap in snapshots}
+        due = rotation(names, self.state.verified(repo.name))[: quota(len(names), settings.verify_period)]
+
+        verified = 0
+        for name in due:
+            if budget.exhausted():
+                break
+            snapshot = by_name[name]
+            ui.info(f"Verifying snapshot {name} in repository {repo.name}")
+            expired: threading.Event | None = None
+            try:
+                with (
+                    recorded(self.history, repo.name, "verify"),
+                    budget.enforce(self.borg.interrupt) as expired,
+                ):
+                    ui.progress(
+                        lambda: self.borg.verify(snapshot, progress=True),
+                        message="Verifying snapshot",
+                    )
+            except Exception:
+                if expired and expired.is_set():
+                    break  # verified again in the next run
+                raise
+            self.state.record(repo.name, name, existing=names)
+            verified += 1
+
+        if verified < len(due):
+            ui.warn(
+                f"Time budget used up after verifying {verified} of {len(due)} snapshots in repository {repo.name}",
+                "raise the check time budget or the verification period",
+            )
+        remaining = overdue(names, self.state.verified(repo.name), period=settings.verify_period)
+        if remaining:
+            ui.info(
+                f"{remaining} snapshot(s) in repository {repo.name} not verified in the last "
+                f"{settings.verify_period} days"
+            )
@@ -0,0 +1,109 @@
+import queue
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+from easyborg import ui
+from easyborg.borg import Borg
+from easyborg.model import Config, ProgressEvent, Repository, Snapshot
+from easyborg.replication import missing
+
+DEFAULT_JOBS = 2
+
+
+class CopyCommand:
+    """
+    Copy snapshots to other repositories without reading the original data again.
+    """
+
+    def __init__(self, *, config: Config, borg: Borg) -> None:
+        super().__init__()
+        self.config = config
+        self.borg = borg
+
+    def run(
+            self,
+            source: str,
+            targets: Sequence[str],
+            *,
+            names: Sequence[str] = (),
+            jobs: int = DEFAULT_JOBS,
+            dry_run: bool = False,
+    ) -> None:
+        """
+        Copy the snapshots (all if no names are given) that are missing in the target repositories.
+
+        Up to jobs target repositories are written at the same time. Borg locks a repository while writing to it, so
+        the snapshots of one target are copied one after the other.
+        """
+        source_repo = self._repository(source)
+        target_repos = [self._repository(name) for name in dict.fromkeys(targets)]
+        if source_repo in target_repos:
+            raise RuntimeError(f"Cannot copy repository {source} to itself")
+
+        batches: dict[str, list[Snapshot]] = {}
+
+        def compare() -> Iterator[ProgressEvent]:
+            snapshots = self.borg.list_snapshots(source_repo)
+            if names:
+                unknown = set(names) - {snap.name for snap in snapshots}
+                if unknown:
+                    raise RuntimeError(f"Snapshot not found in repository {source}: {', '.join(sorted(unknown))}")
+                snapshots = [snap for snap in snapshots if snap.name in names]
+            for repo in target_repos:
+                batches[repo.name] = missing(snapshots, self.borg.list_snapshots(repo))
+            return iter([])
+
+        ui.spinner(compare, message="Comparing repositories")
+
+        total = sum(len(batch) for batch in batches.values())
+        if not total:
+            ui.info("All snapshots exist in the target repositories already")
+            return
+        for repo in target_repos:
+            ui.info(f"Copying {len(batches[repo.name])} snapshots from repository {source} to repository {repo.name}")
+
+        failures: list[tuple[Snapshot, Repository, Exception]] = []
+        ui.progress(
+            lambda: self._copy(target_repos, batches, jobs=jobs, dry_run=dry_run, failures=failures),
+            message="Copying snapshots",
+        )
+
+        for snapshot, repo, e in failures:
+            ui.error(f"Could not copy snapshot {snapshot.name} to repository {repo.name}", str(e))
+        if failures:
+            raise RuntimeError(f"{len(failures)} of {total} snapshots could not be copied")
+        ui.success("Copy completed")
+
+    def _copy(
+            self,
+            repos: list[Repository],
+            batches: dict[str, list[Snapshot]],
+            *,
+            jobs: int,
+            dry_run: bool,
+            failures: list[tuple[Snapshot, Repository, Exception]],
+    ) -> Iterator[ProgressEvent]:
+        total = sum(len(batch) for batch in batches.values())
+        done: queue.Queue[tuple[Snapshot, Repository]] = queue.Queue()
+
+        def copy_batch(repo: Repository) -> None:
+            for snapshot in batches[repo.name]:
+                try:
+                    self.borg.transfer(snapshot, repo, dry_run=dry_run)
+                except Exception as e:
+                    failures.append((snapshot, repo, e))  # keep going with the next snapshot
+                done.put((snapshot, repo))
+
+        with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="copy") as executor:
+            for repo in repos:
+                if batches[repo.name]:
+                    executor.submit(copy_batch, repo)
+            for current in range(1, total + 1):
+                snapshot, repo = done.get()
+                yield ProgressEvent(total=total, current=current, message=f"{snapshot.name} to {repo.name}")
+
+    def _repository(self, name: str) -> Repository:
+        repo = self.config.repos.get(name)
+        if repo is None:
+            raise RuntimeError(f"Repository not found: {name}")
+        return repo
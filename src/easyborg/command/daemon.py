@@ -0,0 +1,246 @@
+import logging
+import os
+import random
+import signal
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from easyborg import config, ui
+from easyborg.command.backup import BackupCommand
+from easyborg.command.check import CheckCommand
+from easyborg.daemon import DaemonServer
+from easyborg.model import Config
+from easyborg.schedule import MINUTES_PER_DAY, ScheduleState, host_offset, is_due, next_slot
+
+logger = logging.getLogger(__name__)
+
+RELOAD_INTERVAL = 10.0  # seconds between checks for configuration changes
+SSH_CONTROL_PERSIST = 600  # seconds an idle SSH master connection is kept open
+PRESYNC_LEAD = 300.0  # seconds before a scheduled backup when the caches are synchronized
+
+
+class DaemonCommand:
+    """
+    Long-running backup process.
+
+    Creates backups according to the configured schedule, and checks the repositories after the first backup past
+    the configured check hour. Keeps the configuration (reloaded when the file changes),
+    the validated Borg executable and SSH master connections alive between backups, and serves status and backup
+    requests on a local UNIX socket.
+
+    On reload, the environment variables of the configuration are applied again (removed ones are unset), and
+    on_reload gets the new configuration, e.g. to rebuild the Borg instance with its watchdog and lock settings.
+    """
+
+    def __init__(
+            self,
+            *,
+            profile: str,
+            config_file: Path,
+            socket_path: Path,
+            create_backup: Callable[[Config], BackupCommand],
+            sync_caches: Callable[[Config], None] | None = None,
+            create_check: Callable[[Config], CheckCommand] | None = None,
+            check_schedule: ScheduleState | None = None,
+            on_reload: Callable[[Config], None] | None = None,
+            clock: Callable[[], float] = time.time,
+    ) -> None:
+        super().__init__()
+        self.profile = profile
+        self.config_file = config_file
+        self.socket_path = socket_path
+        self.create_backup = create_backup
+        self.sync_caches = sync_caches
+        self.create_check = create_check
+        self.check_schedule = check_schedule
+        self.on_reload = on_reload
+        self.clock = clock
+
+        self.config: Config | None = None
+        self._config_mtime: int | None = None
+        self._trigger = threading.Event()
+        self._requested_budget: float | None = None  # time budget of the requested backup
+        self._lock = threading.Lock()
+        self._status: dict[str, Any] = {
+            "pid": os.getpid(),
+            "started": _timestamp(clock()),
+            "config_file": str(config_file),
+            "running": False,
+            "last_backup_started": None,
+            "last_backup_finished": None,
+            "last_backup_result": None,
+            "last_backup_failed": [],  # repositories in which the last backup failed
+            "next_backup": None,
+        }
+
+    def run(self) -> None:
+        self._reload_if_changed()
+        _enable_ssh_master_connections()
+
+        server = DaemonServer(self.socket_path, self.handle)
+        server.start()
+
+        # systemd stops services with SIGTERM; exit through the regular cleanup
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+        ui.info(f"Daemon started (pid {os.getpid()})")
+        try:
+            next_backup = self.clock()  # whatever happened while the daemon wasn't running, start with a backup
+            presync = None
+            while True:
+                self._update_status(next_backup=_timestamp(next_backup))
+                wake_up = min(next_backup, presync) if presync is not None else next_backup
+                triggered = self._trigger.wait(timeout=max(0.0, min(wake_up - self.clock(), RELOAD_INTERVAL)))
+                self._reload_if_changed()
+
+                if triggered or self.clock() >= next_backup:
+                    with self._lock:
+                        self._trigger.clear()
+                        time_budget, self._requested_budget = self._requested_budget, None
+                    self._backup(time_budget=time_budget if triggered else None)
+                    if self._check_due():
+                        self._check()
+                    next_backup = self._next_backup()
+                    presync = self._next_presync(next_backup)
+                elif presync is not None and self.clock() >= presync:
+                    presync = None
+                    self._sync_caches()
+        except KeyboardInterrupt:
+            ui.newline()
+        finally:
+            server.stop()
+            ui.info("Daemon stopped")
+
+    def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        """
+        Handle a request received on the socket (called from server threads).
+        """
+        command = request.get("command")
+        if command == "ping":
+            return {}
+        if command == "status":
+            with self._lock:
+                return {"status": dict(self._status)}
+        if command == "backup":
+            with self._lock:
+                self._requested_budget = request.get("time_budget")
+                self._trigger.set()
+            return {"queued": True}
+        raise RuntimeError(f"Unknown command: {command}")
+
+    def _next_backup(self) -> float:
+        """
+        Return the time of the next scheduled backup. Missed schedules (e.g. during sleep) result in one backup.
+        """
+        settings = self.config.schedule
+        offset = host_offset(self.profile, settings.interval) if settings.stagger else 0
+        slot = next_slot(datetime.fromtimestamp(self.clock()).astimezone(), settings.interval, offset)
+        return slot.timestamp() + random.uniform(0, settings.jitter)
+
+    def _next_presync(self, next_backup: float) -> float | None:
+        """
+        Return when to synchronize the caches before the next backup, or None if not enabled or not worth it.
+        """
+        if not self.sync_caches or not self.config.cache.presync:
+            return None
+        presync = next_backup - PRESYNC_LEAD
+        return presync if presync > self.clock() else None
+
+    def _sync_caches(self) -> None:
+        try:
+            self.sync_caches(self.config)
+        except Exception as e:
+            ui.exception(e)  # keep the daemon alive, the backup will synchronize anyway
+
+    def _backup(self, *, time_budget: float | None = None) -> None:
+        self._update_status(running=True, last_backup_started=_timestamp(self.clock()))
+        result = "failed"
+        failed: list[str] = []
+        try:
+            failed = self.create_backup(self.config).run(tenacious=True, time_budget=time_budget)
+            if failed:
+                ui.warn(f"Backup failed in repositories {', '.join(failed)}")
+            result = "failed" if failed else "completed"
+        except Exception as e:
+            ui.exception(e)  # keep the daemon alive
+        finally:
+            self._update_status(
+                running=False,
+                last_backup_finished=_timestamp(self.clock()),
+                last_backup_result=result,
+                last_backup_failed=failed,
+            )
+
+    def _check_due(self) -> bool:
+        hour = self.config.check.hour
+        if not self.create_check or not self.check_schedule or hour is None:
+            return False
+        now = datetime.fromtimestamp(self.clock()).astimezone()
+        return is_due(self.check_schedule.last_run(), now, MINUTES_PER_DAY, hour * 60)
+
+    def _check(self) -> None:
+        self.check_schedule.record_run(datetime.fromtimestamp(self.clock()).astimezone())
+        try:
+            self.create_check(self.config).run(tenacious=True)
+        except Exception as e:
+            ui.exception(e)  # keep the daemon alive
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = self.config_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self.config is not None and mtime == self._config_mtime:
+            return
+
+        try:
+            loaded = config.load(self.config_file)
+        except Exception as e:
+            if self.config is None:
+                raise
+            ui.warn("Could not reload configuration, keeping previous one", str(e))
+            self._config_mtime = mtime
+            return
+
+        previous = self.config
+        if previous is not None:
+            for name in set(previous.env or {}) - set(loaded.env or {}):
+                os.environ.pop(name, None)
+        os.environ.update(loaded.env or {})
+        self.config = loaded
+        self._config_mtime = mtime
+        if previous is not None:
+            _enable_ssh_master_connections()  # in case BORG_RSH was removed
+            if self.on_reload:
+                self.on_reload(loaded)
+            ui.info("Configuration reloaded")
+
+    def _update_status(self, **values: Any) -> None:
+        with self._lock:
+            self._status.update(values)
+
+
+def _enable_ssh_master_connections() -> None:
+    """
+    Let Borg's SSH connections share one master connection per server, so subsequent backups skip the handshake.
+    """
+    if "BORG_RSH" in os.environ:
+        return  # respect the user's configuration
+
+    # socket paths are limited to ~100 characters, so use a short directory
+    control_dir = Path(tempfile.gettempdir()) / f"easyborg-{os.getuid()}"
+    control_dir.mkdir(mode=0o700, exist_ok=True)
+
+    os.environ["BORG_RSH"] = (
+        f"ssh -o ControlMaster=auto -o ControlPath={control_dir}/%C -o ControlPersist={SSH_CONTROL_PERSIST}"
+    )
+
+
+def _timestamp(value: float) -> str:
+    return datetime.fromtimestamp(value).astimezone().isoformat(timespec="seconds")
@@ -1,16 +1,18 @@
 from easyborg import ui
 from easyborg.borg import Borg
 from easyborg.fzf import Fzf
+from easyborg.history import RunHistory, recorded
 from easyborg.interaction import confirm, select_repo, select_snapshot
 from easyborg.model import Config
 
 
 class DeleteCommand:
-    def __init__(self, *, config: Config, borg: Borg, fzf: Fzf) -> None:
+    def __init__(self, *, config: Config, borg: Borg, fzf: Fzf, history: RunHistory | None = None) -> None:
         super().__init__()
         self.config = config
         self.borg = borg
         self.fzf = fzf
+        self.history = history
 
     def run(self, *, dry_run: bool = False) -> None:
         repo = select_repo(self.fzf, self.config)
@@ -29,21 +31,24 @@ class DeleteCommand:
             return
 
         ui.newline()
+        history = self.history if not dry_run else None
 
         ui.info(f"Deleting snapshot {snapshot.name} from repository {repo.name}")
-        ui.spinner(
-            lambda: self.borg.delete(
-                snapshot,
-                dry_run=dry_run,
-                progress=True,
-            ),
-            message="Deleting",
-        )
+        with recorded(history, repo.name, "delete"):
+            ui.spinner(
+                lambda: self.borg.delete(
+                    snapshot,
+                    dry_run=dry_run,
+                    progress=True,
+                ),
+                message="Deleting",
+            )
 
         ui.info(f"Compacting repository {repo.name}")
-        ui.spinner(
-            lambda: self.borg.compact(repo, dry_run=dry_run, progress=True),
-            message="Compacting",
-        )
+        with recorded(history, repo.name, "compact"):
+            ui.spinner(
+                lambda: self.borg.compact(repo, dry_run=dry_run, progress=True),
+                message="Compacting",
+            )
 
         ui.success("Delete completed")
@@ -1,4 +1,4 @@
-from easyborg import ui
+from easyborg import limits, ui
 from easyborg.model import Config, Context
 from easyborg.theme import StyleId, theme
 from easyborg.ui import link_path, render_mapping
@@ -18,6 +18,8 @@ class DoctorCommand:
             ("Configuration file", link_path(context.config_file)),
             ("Log dir", link_path(context.log_dir) if context.log_dir else "not configured"),
             ("Log file", link_path(context.log_file) if context.log_file else "not configured"),
+            ("State dir", link_path(context.state_dir)),
+            ("Cache dir", link_path(context.cache_dir) if self.config.cache.managed else "not managed"),
             ("Python executable", context.python_executable),
             ("Real Python executable", context.real_python_executable),
             ("Real Python dir", link_path(context.real_python_executable.parent)),
@@ -77,3 +79,15 @@ class DoctorCommand:
                 rows,
                 column_colors=(STYLES[StyleId.PRIMARY], None),
             )
+
+        limited = [repo for repo in repos.values() if limits.describe(repo.limits)]
+        if limited:
+            ui.header("Resource Limits")
+            rows = [
+                (repo.name, "\n".join(f"{name}: {value}" for name, value in limits.describe(repo.limits)))
+                for repo in limited
+            ]
+            ui.table(
+                rows,
+                column_colors=(STYLES[StyleId.PRIMARY], None),
+            )
@@ -0,0 +1,95 @@
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+from easyborg import ui
+from easyborg.estimate import Estimate, Totals, count, estimate
+from easyborg.exclusions import Excluder, compile_patterns
+from easyborg.history import Run, RunHistory
+from easyborg.model import Config, ExclusionSettings, ProgressEvent, Repository, RepositoryType
+from easyborg.theme import StyleId, theme
+from easyborg.util import format_duration, format_size
+
+STYLES = theme().styles
+
+
+class EstimateCommand:
+    """
+    Estimate size and duration of the next backup in each repository without running Borg.
+    """
+
+    def __init__(self, *, config: Config, history: RunHistory) -> None:
+        super().__init__()
+        self.config = config
+        self.history = history
+
+    def run(self) -> None:
+        backup_paths = self.config.backup_paths
+        if not backup_paths:
+            ui.warn("No backup paths configured")
+            return
+
+        repos = [repo for repo in self.config.repos.values() if repo.type is RepositoryType.BACKUP]
+        if not repos:
+            ui.warn("No backup repositories configured")
+            return
+
+        # repositories with the same exclusions share one walk
+        groups: dict[ExclusionSettings, list[Repository]] = {}
+        for repo in repos:
+            groups.setdefault(self.config.exclusions.merge(repo.exclusions), []).append(repo)
+
+        totals: dict[str, Totals] = {}
+        for exclusions, group in groups.items():
+            totals.update(self._count(exclusions, group, backup_paths))
+
+        estimates = {repo.name: estimate(repo, totals[repo.name], self.history.throughput(repo.name)) for repo in repos}
+
+        ui.header("Estimate", first=True)
+        ui.table(
+            [self._row(name, e) for name, e in estimates.items()],
+            headers=("Repository", "Files", "Size", "Changed", "To store", "Duration", "Based on"),
+            column_colors=(STYLES[StyleId.PRIMARY], None, None, None, None, None, STYLES[StyleId.SECONDARY]),
+        )
+
+    def _count(
+            self,
+            exclusions: ExclusionSettings,
+            repos: list[Repository],
+            backup_paths: list[Path],
+    ) -> dict[str, Totals]:
+        totals: dict[str, Totals] = {}
+
+        def walk() -> Iterator[ProgressEvent]:
+            excluder = Excluder(exclusions, compile_patterns(exclusions, backup_paths), backup_paths)
+            # files changed since the last snapshot are new to the repository, all files if there's none
+            thresholds = [self._last_backup(repo) for repo in repos]
+            totals.update(zip((repo.name for repo in repos), count(excluder, backup_paths, thresholds)))
+            return iter([])
+
+        started = time.time()
+        ui.spinner(walk, message="Scanning backup paths")
+
+        # the next backup uses the scan as the total of its progress bar if there's no previous snapshot
+        for repo in repos:
+            t = totals[repo.name]
+            self.history.record(
+                Run(repo.name, "scan", started, time.time() - started, True, original_size=t.bytes, nfiles=t.files)
+            )
+        return totals
+
+    def _last_backup(self, repo: Repository) -> float | None:
+        run = self.history.last_success(repo.name)
+        return run.started if run else None
+
+    @staticmethod
+    def _row(name: str, e: Estimate) -> tuple[str, ...]:
+        return (
+            name,
+            str(e.totals.files),
+            format_size(e.totals.bytes),
+            format_size(e.totals.changed_bytes),
+            format_size(e.upload_bytes),
+            format_duration(e.seconds),
+            "history" if e.from_history else "assumptions",
+        )
@@ -3,7 +3,7 @@ from pathlib import Path
 from easyborg import ui
 from easyborg.borg import Borg
 from easyborg.fzf import Fzf
-from easyborg.interaction import select_items, select_repo, select_snapshot
+from easyborg.interaction import await_lock, select_items, select_repo, select_snapshot
 from easyborg.model import Config
 
 
@@ -20,6 +20,11 @@ class ExtractCommand:
             ui.abort()
             return
 
+        repo = await_lock(self.borg, self.fzf, self.config, repo)
+        if not repo:
+            ui.abort()
+            return
+
         snapshot = select_snapshot(self.borg, self.fzf, repo)
         if not snapshot:
             ui.abort()
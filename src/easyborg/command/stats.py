@@ -0,0 +1,60 @@
+from easyborg import ui
+from easyborg.history import RunHistory, Trend
+from easyborg.model import Config
+from easyborg.theme import StyleId, theme
+from easyborg.util import format_duration, format_size
+
+STYLES = theme().styles
+
+
+class StatsCommand:
+    """
+    Show how long the operations in each repository took recently, and whether they are getting slower.
+    """
+
+    def __init__(self, *, config: Config, history: RunHistory) -> None:
+        super().__init__()
+        self.config = config
+        self.history = history
+
+    def run(self, repository: str | None = None) -> None:
+        if repository is not None and repository not in self.config.repos:
+            raise RuntimeError(f"Unknown repository: {repository}")
+
+        trends = [
+            trend
+            for name, operation in self.history.repositories()
+            if repository in (None, name) and operation != "scan"  # scans are estimates, not Borg operations
+            if (trend := self.history.trend(name, operation))
+        ]
+        if not trends:
+            ui.info("No runs recorded yet")
+            return
+
+        ui.header("Statistics", first=True)
+        ui.table(
+            [self._row(trend) for trend in trends],
+            headers=("Repository", "Operation", "Runs", "Failed", "Median", "P90", "Max", "Throughput", "Dedup"),
+            column_colors=(STYLES[StyleId.PRIMARY], STYLES[StyleId.SECONDARY]),
+        )
+
+        for trend in trends:
+            if trend.regression:
+                ui.warn(f"The last {trend.operation} in repository {trend.repository} took much longer than usual")
+
+    @staticmethod
+    def _row(trend: Trend) -> tuple[str, ...]:
+        throughput = "-"
+        if trend.rate is not None:
+            throughput = f"{format_size(trend.rate)}/s"
+            if trend.previous_rate:
+                throughput += f" ({(trend.rate / trend.previous_rate - 1) * 100:+.0f}%)"  # recent vs older runs
+        return (
+            trend.repository,
+            trend.operation,
+            str(trend.runs),
+            str(trend.failures),
+            *(map(format_duration, trend.durations) if trend.durations else ("-", "-", "-")),
+            throughput,
+            f"{trend.deduplication_ratio:.1%}" if trend.deduplication_ratio is not None else "-",
+        )
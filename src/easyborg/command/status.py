@@ -0,0 +1,36 @@
+from pathlib import Path
+
+from easyborg import daemon, ui
+from easyborg.theme import StyleId, theme
+
+STYLES = theme().styles
+
+
+class StatusCommand:
+    def __init__(self, *, socket_path: Path) -> None:
+        super().__init__()
+        self.socket_path = socket_path
+
+    def run(self) -> None:
+        try:
+            status = daemon.request(self.socket_path, "status")["status"]
+        except RuntimeError as e:
+            ui.warn(str(e))
+            return
+
+        rows = [
+            ("Process ID", status["pid"]),
+            ("Started", status["started"]),
+            ("Configuration file", status["config_file"]),
+            ("Backup running", "yes" if status["running"] else "no"),
+            ("Last backup started", status["last_backup_started"] or "never"),
+            ("Last backup finished", status["last_backup_finished"] or "never"),
+            ("Last backup result", status["last_backup_result"] or "-"),
+            ("Failed repositories", ", ".join(status.get("last_backup_failed") or []) or "-"),
+            ("Next backup", status["next_backup"] or "-"),
+        ]
+        ui.header("Daemon", first=True)
+        ui.table(
+            rows,
+            column_colors=(STYLES[StyleId.PRIMARY], None),
+        )
@@ -0,0 +1,196 @@
+import tempfile
+import time
+from collections.abc import Iterator
+from dataclasses import replace
+from pathlib import Path
+
+from easyborg import config, ui
+from easyborg.borg import Borg
+from easyborg.model import Config, ProgressEvent, RepositoryType, Snapshot
+from easyborg.theme import StyleId, theme
+from easyborg.tune import (
+    CHUNKER_CANDIDATES,
+    COMPRESSION_CANDIDATES,
+    DEFAULT_CHUNKER_PARAMS,
+    REMOTE_SPEED,
+    Measurement,
+    best,
+    change_files,
+    sample_files,
+    upload_speed,
+    warm_up,
+)
+from easyborg.util import create_snapshot_name, format_size
+
+STYLES = theme().styles
+
+DEFAULT_SAMPLE_SIZE = 256_000_000  # bytes
+
+# the candidate repositories are unencrypted, Borg doesn't use the passphrase
+CANDIDATE_ENV = {"BORG_PASSPHRASE": "unused", "BORG_UNKNOWN_UNENCRYPTED_REPO_ACCESS_IS_OK": "yes"}
+
+
+class TuneCommand:
+    """
+    Benchmark compression and chunker parameters on a sample of the backup paths and configure the best ones for
+    each repository.
+    """
+
+    def __init__(self, *, config: Config, borg: Borg, config_file: Path) -> None:
+        super().__init__()
+        self.config = config
+        self.borg = borg
+        self.config_file = config_file
+
+    def run(
+            self,
+            *,
+            sample_size: int = DEFAULT_SAMPLE_SIZE,
+            remote_speed: float = REMOTE_SPEED,
+            chunker: bool = False,
+            dry_run: bool = False,
+    ) -> None:
+        """
+        Benchmark the candidates and write the best settings. Chunker parameters are only benchmarked and changed
+        with chunker=True: with new chunker parameters, nothing deduplicates against the existing snapshots.
+        """
+        if not self.config.backup_paths:
+            ui.warn("No backup paths configured")
+            return
+
+        sample = self._sample(sample_size)
+        if not sample:
+            ui.warn("No files found in backup paths")
+            return
+
+        with tempfile.TemporaryDirectory(prefix="easyborg-tune-") as temp_dir:
+            changed = self._change(Path(temp_dir), sample)
+
+            # compression first, then chunker parameters with the fastest compression that still compresses well
+            measurements = [
+                self._measure(Path(temp_dir), sample, changed, compression, DEFAULT_CHUNKER_PARAMS)
+                for compression in COMPRESSION_CANDIDATES
+            ]
+            if chunker:
+                compression = best(measurements, remote_speed).compression
+                measurements.extend(
+                    self._measure(Path(temp_dir), sample, changed, compression, chunker_params)
+                    for chunker_params in CHUNKER_CANDIDATES
+                    if chunker_params != DEFAULT_CHUNKER_PARAMS
+                )
+
+        ui.header("Measurements")
+        rows = [
+            (
+                m.compression,
+                m.chunker_params,
+                f"{format_size(m.throughput())}/s",
+                f"{m.ratio():.2f}",
+                format_size(m.update_size),
+            )
+            for m in measurements
+        ]
+        ui.table(
+            rows,
+            headers=("Compression", "Chunker", "Throughput", "Ratio", "Update"),
+            column_colors=(STYLES[StyleId.PRIMARY], None, None, None, None),
+        )
+
+        repos = [repo for repo in self.config.repos.values() if repo.type is RepositoryType.BACKUP]
+        winners = {repo.name: best(measurements, upload_speed(repo, remote_speed)) for repo in repos}
+
+        chunkers = {
+            name: m.chunker_params if chunker else self.config.repos[name].chunker_params or DEFAULT_CHUNKER_PARAMS
+            for name, m in winners.items()
+        }
+
+        ui.header("Settings")
+        rows = [(name, m.compression, chunkers[name]) for name, m in winners.items()]
+        ui.table(
+            rows,
+            headers=("Repository", "Compression", "Chunker"),
+            column_colors=(STYLES[StyleId.PRIMARY], None, None),
+        )
+
+        if dry_run:
+            return
+
+        for name, m in winners.items():
+            values = {"compression": m.compression}
+            if chunkers[name] != (self.config.repos[name].chunker_params or DEFAULT_CHUNKER_PARAMS):
+                values["chunker_params"] = chunkers[name]
+                ui.warn(
+                    f"Changing the chunker parameters of repository {name}",
+                    "its next snapshot can't deduplicate against the existing ones and uploads all data again",
+                )
+            config.update_repository(self.config_file, name, values)
+        ui.success(f"Settings written to {self.config_file}")
+
+    def _sample(self, sample_size: int) -> list[Path]:
+        sample: list[Path] = []
+
+        def collect() -> Iterator[ProgressEvent]:
+            nonlocal sample
+            sample = sample_files(self.config.backup_paths, max_bytes=sample_size)
+            return iter([])
+
+        ui.spinner(collect, message="Sampling files")
+        ui.info(f"Sampled {len(sample)} files")
+        return sample
+
+    def _change(self, temp_dir: Path, sample: list[Path]) -> list[Path]:
+        changed: list[Path] = []
+
+        def copy() -> Iterator[ProgressEvent]:
+            nonlocal changed
+            directory = temp_dir / "changed"
+            directory.mkdir()
+            changed = change_files(sample, directory)
+            return iter([])
+
+        ui.spinner(copy, message="Creating changed version of the sample")
+        return changed
+
+    def _measure(
+            self,
+            temp_dir: Path,
+            sample: list[Path],
+            changed: list[Path],
+            compression: str,
+            chunker_params: str,
+    ) -> Measurement:
+        ui.info(f"Measuring compression {compression}, chunker {chunker_params}")
+        measurement: Measurement | None = None
+
+        def measure() -> Iterator[ProgressEvent]:
+            nonlocal measurement
+            # a fresh repository per candidate, so earlier candidates can't deduplicate anything
+            parent = Path(tempfile.mkdtemp(dir=temp_dir))
+            repo = self.borg.create_repository(parent, "candidate", RepositoryType.BACKUP, env=CANDIDATE_ENV)
+            repo = replace(repo, compression=compression, chunker_params=chunker_params)
+            snapshot = Snapshot(repo, create_snapshot_name())
+
+            warm_up(sample)
+            start = time.perf_counter()
+            self.borg.create_snapshot(snapshot, sample, paths_from_stdin=True)
+            seconds = time.perf_counter() - start
+
+            stats = self.borg.snapshot_stats(snapshot)
+
+            # the next version of the sample: what the chunker finds again of the changed files
+            update = Snapshot(repo, create_snapshot_name())
+            self.borg.create_snapshot(update, changed, paths_from_stdin=True)
+            update_stats = self.borg.snapshot_stats(update)
+
+            measurement = Measurement(
+                compression=compression,
+                chunker_params=chunker_params,
+                seconds=seconds,
+                original_size=stats["original_size"],
+                deduplicated_size=stats["deduplicated_size"],
+                update_size=update_stats["deduplicated_size"],
+            )
+            return iter([])
+
+        ui.spinner(measure, message="Measuring")
+        return measurement
@@ -0,0 +1,163 @@
+import logging
+import math
+import time
+from collections.abc import Callable
+
+from easyborg import ui
+from easyborg.command.backup import BackupCommand
+from easyborg.inotify import TreeWatcher
+from easyborg.model import Config, Repository, RepositoryType
+
+logger = logging.getLogger(__name__)
+
+IDLE_TIMEOUT = 60.0  # seconds
+RETRY_DELAY = 60.0  # seconds before the first retry of a failed backup, doubled after each further failure
+MAX_RETRY_DELAY = 3600.0  # seconds
+
+
+class ChangeCoalescer:
+    """
+    Coalesce bursts of changes into a single trigger.
+
+    A trigger is due once no change was recorded for `debounce` seconds, or at the latest `max_latency` seconds after
+    the first change of the burst, so a steady stream of changes can't postpone the backup forever.
+    """
+
+    def __init__(self, *, debounce: float, max_latency: float) -> None:
+        self.debounce = debounce
+        self.max_latency = max_latency
+        self._first: float | None = None
+        self._last: float | None = None
+
+    def record(self, now: float) -> None:
+        if self._first is None:
+            self._first = now
+        self._last = now
+
+    def due(self, now: float) -> bool:
+        return self._first is not None and now >= self._deadline()
+
+    def time_until_due(self, now: float) -> float | None:
+        if self._first is None:
+            return None
+        return max(0.0, self._deadline() - now)
+
+    def reset(self) -> None:
+        self._first = None
+        self._last = None
+
+    def _deadline(self) -> float:
+        return min(self._last + self.debounce, self._first + self.max_latency)
+
+
+def retry_delay(failures: int) -> float:
+    """
+    Return the seconds to wait before retrying a backup that failed the given number of times in a row.
+    """
+    if failures <= 0:
+        return 0.0
+    return min(RETRY_DELAY * 2 ** (failures - 1), MAX_RETRY_DELAY)
+
+
+class WatchCommand:
+    def __init__(
+            self,
+            *,
+            config: Config,
+            backup: BackupCommand,
+            clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self.config = config
+        self.backup = backup
+        self.clock = clock
+
+    def run(self, *, dry_run: bool = False) -> None:
+        backup_paths = self.config.backup_paths
+        if not backup_paths:
+            ui.warn("No backup paths configured")
+            return
+
+        repos = [repo for repo in self.config.repos.values() if repo.type is RepositoryType.BACKUP]
+        if not repos:
+            ui.warn("No backup repositories configured")
+            return
+
+        settings = self.config.watch
+        coalescer = ChangeCoalescer(debounce=settings.debounce, max_latency=settings.max_latency)
+
+        pending = {repo.name for repo in repos}  # changes while not watching are unknown, so start with a backup
+        last_runs: dict[str, float] = {}
+        failures: dict[str, int] = {}  # failed backups in a row; failed repositories stay pending and are retried
+
+        try:
+            with TreeWatcher(backup_paths) as watcher:
+                ui.info(f"Watching {len(backup_paths)} backup path(s) for changes")
+                while True:
+                    now = self.clock()
+
+                    ready = [
+                        repo.name
+                        for repo in repos
+                        if repo.name in pending and self._time_until_ready(repo, now, last_runs, failures) <= 0
+                    ]
+                    if ready:
+                        ui.newline()
+                        failed = self.backup.run(dry_run=dry_run, tenacious=True, only=ready)
+                        for name in ready:
+                            last_runs[name] = self.clock()
+                            if name in failed:
+                                failures[name] = failures.get(name, 0) + 1
+                                logger.info("Retrying repository %s in %.0fs", name, retry_delay(failures[name]))
+                            else:
+                                failures.pop(name, None)
+                                pending.discard(name)
+                        continue
+
+                    changes = watcher.read(self._timeout(now, coalescer, repos, pending, last_runs, failures))
+                    if changes:
+                        logger.debug("Detected %d change(s), e.g. '%s'", len(changes), changes[0])
+                        coalescer.record(self.clock())
+
+                    if coalescer.due(self.clock()):
+                        coalescer.reset()
+                        pending.update(repo.name for repo in repos)
+        except KeyboardInterrupt:
+            ui.newline()
+            ui.info("Stopped watching")
+
+    def _timeout(
+            self,
+            now: float,
+            coalescer: ChangeCoalescer,
+            repos: list[Repository],
+            pending: set[str],
+            last_runs: dict[str, float],
+            failures: dict[str, int],
+    ) -> float:
+        timeouts = [IDLE_TIMEOUT]
+
+        until_due = coalescer.time_until_due(now)
+        if until_due is not None:
+            timeouts.append(until_due)
+
+        for repo in repos:
+            if repo.name in pending:
+                timeouts.append(self._time_until_ready(repo, now, last_runs, failures))
+
+        return max(0.0, min(timeouts))
+
+    def _time_until_ready(
+            self,
+            repo: Repository,
+            now: float,
+            last_runs: dict[str, float],
+            failures: dict[str, int],
+    ) -> float:
+        """
+        Return the seconds until the next snapshot in the repository is allowed (rate limiting, or backoff after
+        failures).
+        """
+        minutes = repo.watch_min_interval if repo.watch_min_interval is not None else self.config.watch.min_interval
+        delay = max(minutes * 60, retry_delay(failures.get(repo.name, 0)))
+        return last_runs.get(repo.name, -math.inf) + delay - now
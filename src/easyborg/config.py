@@ -1,12 +1,33 @@
 from __future__ import annotations
 
+import json
+import os
+import re
+import shlex
 import shutil
 import tomllib
+from collections.abc import Mapping
 from importlib import resources
 from pathlib import Path
 from typing import Any
 
-from easyborg.model import Config, Repository, RepositoryType
+from easyborg import limits, profiling
+from easyborg.model import (
+    CacheSettings,
+    CheckSettings,
+    Config,
+    ExclusionSettings,
+    GovernorSettings,
+    LockSettings,
+    MetricsSettings,
+    Repository,
+    RepositoryType,
+    ResourceLimits,
+    ScheduleSettings,
+    StreamSource,
+    WatchdogSettings,
+    WatchSettings,
+)
 
 
 def load(path: Path) -> Config:
@@ -16,18 +37,54 @@ def load(path: Path) -> Config:
 
     if not path.exists():
         path.parent.mkdir(parents=True, exist_ok=True)
-        with resources.as_file(resources.files("easyborg.resources")) as source:
-            shutil.copy(source / "template-easyborg.toml", path)
+        with resources.as_file(resources.files("easyborg.resources") / "template-easyborg.toml") as source:
+            shutil.copy(source, path)
 
     try:
-        with path.open("rb") as f:
+        with profiling.span("read configuration"), path.open("rb") as f:
             cfg = tomllib.load(f)
     except FileNotFoundError:
         raise RuntimeError(f"Configuration file not found at: {path}")
-    return _parse(cfg)
+    with profiling.span("validate configuration"):
+        return _parse(cfg)
+
+
+def update_repository(path: Path, name: str, values: Mapping[str, str | int | float | bool]) -> None:
+    """
+    Set values in the table of a repository in the configuration file, keeping comments and formatting.
+    """
+    lines = path.read_text(encoding="utf-8").splitlines(keepends=True)
+
+    header = re.compile(rf"^\s*\[\s*repositories\.(\"?){re.escape(name)}\1\s*\]")
+    start = next((i for i, line in enumerate(lines) if header.match(line)), None)
+    if start is None:
+        raise RuntimeError(f"Repository not found in configuration file: {name}")
+    end = next((i for i in range(start + 1, len(lines)) if lines[i].lstrip().startswith("[")), len(lines))
+
+    for key, value in values.items():
+        line = f"{key} = {json.dumps(value)}\n"  # JSON scalars are valid TOML
+        existing = re.compile(rf"^\s*{re.escape(key)}\s*=")
+        index = next((i for i in range(start + 1, end) if existing.match(lines[i])), None)
+        if index is not None:
+            lines[index] = line
+            continue
+        # insert after the last assignment of the table, not after comments or blank lines leading to the next one
+        index = max((i for i in range(start + 1, end) if "=" in lines[i].split("#", 1)[0]), default=start) + 1
+        if not lines[index - 1].endswith("\n"):
+            lines[index - 1] += "\n"
+        lines.insert(index, line)
+        end += 1
+
+    text = "".join(lines)
+    _parse(tomllib.loads(text))  # never write a configuration that can't be loaded
+
+    temp_path = path.with_suffix(".tmp")
+    temp_path.write_text(text, encoding="utf-8")
+    os.replace(temp_path, path)
 
 
 def _parse(cfg: dict[str, Any]) -> Config:
+    watchdog = _parse_watchdog(cfg.get("watchdog", {}))
     repos = {
         name: Repository(
             name=name,
@@ -35,12 +92,191 @@ def _parse(cfg: dict[str, Any]) -> Config:
             type=RepositoryType(cfg_repo.get("type", None)),
             compact_probability=cfg_repo.get("compact_probability", 0.10),
             env=cfg_repo.get("environment", {}),
+            skip_unchanged=cfg_repo.get("skip_unchanged", False),
+            max_skip_hours=cfg_repo.get("max_skip_hours", 24.0),
+            watch_min_interval=cfg_repo.get("watch_min_interval", None),
+            incremental=cfg_repo.get("incremental", False),
+            limits=_parse_limits(cfg_repo.get("resources", {})),
+            files_cache=cfg_repo.get("files_cache", None),
+            files_cache_ttl=cfg_repo.get("files_cache_ttl", None),
+            compression=cfg_repo.get("compression", None),
+            chunker_params=cfg_repo.get("chunker_params", None),
+            exclusions=_parse_exclusions(cfg_repo.get("exclusions", {})),
+            mirror_of=cfg_repo.get("mirror_of", None),
+            shards=cfg_repo.get("shards", 0),
+            stream=_parse_stream(cfg_repo.get("stream", None)),
+            checkpoint_interval=cfg_repo.get("checkpoint_interval", None),
+            watchdog=_parse_watchdog(cfg_repo["watchdog"], watchdog) if "watchdog" in cfg_repo else None,
+            lock_wait=cfg_repo.get("lock_wait", None),
         )
         for name, cfg_repo in cfg.get("repositories", {}).items()
     }
+    _validate_mirrors(repos)
+    _validate_shards(repos)
+    stream = _parse_stream(cfg.get("stream", None))
+    for repo in repos.values():
+        if repo.incremental and (repo.stream or stream):
+            raise RuntimeError(f"Repository {repo.name} can't archive a stream in incremental mode")
 
     return Config(
         backup_paths=[Path(p) for p in cfg.get("backup_paths", [])],
         repos=repos,
         env=cfg.get("environment", {}),
+        watch=_parse_watch(cfg.get("watch", {})),
+        schedule=_parse_schedule(cfg.get("schedule", {})),
+        governor=_parse_governor(cfg.get("governor", {})),
+        cache=_parse_cache(cfg.get("cache", {})),
+        exclusions=_parse_exclusions(cfg.get("exclusions", {})),
+        stream=stream,
+        metrics=_parse_metrics(cfg.get("metrics", {})),
+        watchdog=watchdog,
+        locks=_parse_locks(cfg.get("locks", {})),
+        check=_parse_check(cfg.get("check", {})),
+    )
+
+
+def _validate_mirrors(repos: Mapping[str, Repository]) -> None:
+    for repo in repos.values():
+        if repo.mirror_of is None:
+            continue
+        primary = repos.get(repo.mirror_of)
+        if repo.type is not RepositoryType.BACKUP:
+            raise RuntimeError(f"Repository {repo.name} can't be a mirror: only backup repositories can")
+        if primary is None or primary.type is not RepositoryType.BACKUP:
+            raise RuntimeError(f"Repository {repo.name} mirrors {repo.mirror_of}, which is not a backup repository")
+        if primary.mirror_of is not None:
+            raise RuntimeError(f"Repository {repo.name} mirrors {repo.mirror_of}, which is a mirror itself")
+
+
+def _validate_shards(repos: Mapping[str, Repository]) -> None:
+    for repo in repos.values():
+        if not repo.shards:
+            continue
+        if repo.shards < 2:
+            raise RuntimeError(f"Repository {repo.name} needs at least 2 shards")
+        if repo.type is not RepositoryType.BACKUP:
+            raise RuntimeError(f"Repository {repo.name} can't be sharded: only backup repositories can")
+        if repo.incremental or repo.mirror_of or any(other.mirror_of == repo.name for other in repos.values()):
+            raise RuntimeError(f"Sharded repository {repo.name} can't use incremental mode or mirrors")
+
+
+def _parse_watch(cfg: dict[str, Any]) -> WatchSettings:
+    defaults = WatchSettings()
+    return WatchSettings(
+        debounce=cfg.get("debounce", defaults.debounce),
+        max_latency=cfg.get("max_latency", defaults.max_latency),
+        min_interval=cfg.get("min_interval", defaults.min_interval),
+    )
+
+
+def _parse_schedule(cfg: dict[str, Any]) -> ScheduleSettings:
+    defaults = ScheduleSettings()
+    return ScheduleSettings(
+        interval=cfg.get("interval", defaults.interval),
+        stagger=cfg.get("stagger", defaults.stagger),
+        jitter=cfg.get("jitter", defaults.jitter),
+        catch_up=cfg.get("catch_up", defaults.catch_up),
+        time_budget=cfg.get("time_budget", defaults.time_budget),
+    )
+
+
+def _parse_governor(cfg: dict[str, Any]) -> GovernorSettings:
+    defaults = GovernorSettings()
+    mode = cfg.get("mode", defaults.mode)
+    if mode not in ("defer", "throttle", "pause"):
+        raise RuntimeError(f"Unknown governor mode: {mode} (choose from defer, throttle, pause)")
+    return GovernorSettings(
+        mode=mode,
+        max_load=cfg.get("max_load", defaults.max_load),
+        max_cpu_pressure=cfg.get("max_cpu_pressure", defaults.max_cpu_pressure),
+        max_io_pressure=cfg.get("max_io_pressure", defaults.max_io_pressure),
+        min_battery=cfg.get("min_battery", defaults.min_battery),
+        deadline=cfg.get("deadline", defaults.deadline),
+        poll_interval=cfg.get("poll_interval", defaults.poll_interval),
+    )
+
+
+def _parse_cache(cfg: dict[str, Any]) -> CacheSettings:
+    defaults = CacheSettings()
+    return CacheSettings(
+        managed=cfg.get("managed", defaults.managed),
+        presync=cfg.get("presync", defaults.presync),
+    )
+
+
+def _parse_metrics(cfg: dict[str, Any]) -> MetricsSettings:
+    textfile = cfg.get("textfile", None)
+    return MetricsSettings(textfile=Path(textfile).expanduser() if textfile else None)
+
+
+def _parse_watchdog(cfg: dict[str, Any], defaults: WatchdogSettings = WatchdogSettings()) -> WatchdogSettings:
+    watchdog = WatchdogSettings(
+        max_duration=cfg.get("max_duration", defaults.max_duration),
+        stall_timeout=cfg.get("stall_timeout", defaults.stall_timeout),
+        grace=cfg.get("grace", defaults.grace),
+    )
+    for name in ("max_duration", "stall_timeout", "grace"):
+        value = getattr(watchdog, name)
+        if value is not None and value <= 0:
+            raise RuntimeError(f"Watchdog setting {name} must be positive")
+    return watchdog
+
+
+def _parse_locks(cfg: dict[str, Any]) -> LockSettings:
+    defaults = LockSettings()
+    return LockSettings(
+        wait=cfg.get("wait", defaults.wait),
+        break_stale=cfg.get("break_stale", defaults.break_stale),
+    )
+
+
+def _parse_check(cfg: dict[str, Any]) -> CheckSettings:
+    defaults = CheckSettings()
+    check = CheckSettings(
+        time_budget=cfg.get("time_budget", defaults.time_budget),
+        repository_share=cfg.get("repository_share", defaults.repository_share),
+        verify_period=cfg.get("verify_period", defaults.verify_period),
+        hour=cfg.get("hour", defaults.hour),
+    )
+    if check.time_budget <= 0 or check.verify_period <= 0:
+        raise RuntimeError("Check time_budget and verify_period must be positive")
+    if not 0 <= check.repository_share <= 1:
+        raise RuntimeError("Check repository_share must be between 0 and 1")
+    if check.hour is not None and not 0 <= check.hour < 24:
+        raise RuntimeError("Check hour must be between 0 and 23")
+    return check
+
+
+def _parse_exclusions(cfg: dict[str, Any]) -> ExclusionSettings:
+    return ExclusionSettings(
+        patterns=tuple(cfg.get("patterns", [])),
+        exclude_caches=cfg.get("exclude_caches", False),
+        exclude_if_present=tuple(cfg.get("exclude_if_present", [])),
+        one_file_system=cfg.get("one_file_system", False),
+        gitignore=cfg.get("gitignore", False),
+    )
+
+
+def _parse_stream(cfg: dict[str, Any] | None) -> StreamSource | None:
+    if cfg is None:
+        return None
+    command = cfg.get("command")
+    if isinstance(command, str):
+        command = shlex.split(command)
+    if not command or not cfg.get("name"):
+        raise RuntimeError("Stream needs a command and a name")
+    return StreamSource(command=tuple(command), name=cfg["name"])
+
+
+def _parse_limits(cfg: dict[str, Any]) -> ResourceLimits:
+    cpu_affinity = cfg.get("cpu_affinity", None)
+    settings = ResourceLimits(
+        nice=cfg.get("nice", None),
+        ionice_class=cfg.get("ionice_class", None),
+        ionice_level=cfg.get("ionice_level", None),
+        cpu_affinity=tuple(cpu_affinity) if cpu_affinity is not None else None,
+        upload_ratelimit=cfg.get("upload_ratelimit", None),
+        rlimits=cfg.get("rlimits", None),
     )
+    limits.validate(settings)
+    return settings
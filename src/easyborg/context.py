@@ -33,6 +33,8 @@ def create(
         headless=headless,
         config_dir=config_dir,
         config_file=_get_config_file(config_dir),
+        state_dir=_get_state_dir(profile),
+        cache_dir=_get_cache_dir(profile),
         test=_is_test(),
         tty=_is_tty(),
         expert=_is_expert_mode(),
@@ -66,6 +68,18 @@ def _get_config_dir(profile: str) -> Path:
     return Path(platform_dirs.user_config_dir) / "profiles" / profile
 
 
+def _get_state_dir(profile: str) -> Path:
+    # macOS: ~/Library/Application Support/easyborg/state/<profile>
+    # Linux: $XDG_STATE_HOME/easyborg/state/<profile> or ~/.local/state/easyborg/state/<profile>
+    return Path(platform_dirs.user_state_dir) / "state" / profile
+
+
+def _get_cache_dir(profile: str) -> Path:
+    # macOS: ~/Library/Caches/easyborg/borg/<profile>
+    # Linux: $XDG_CACHE_HOME/easyborg/borg/<profile> or ~/.cache/easyborg/borg/<profile>
+    return Path(platform_dirs.user_cache_dir) / "borg" / profile
+
+
 def _is_test() -> bool:
     return "PYTEST_CURRENT_TEST" in os.environ
 
@@ -1,3 +1,4 @@
+from collections.abc import Sequence
 from pathlib import Path
 
 from easyborg import ui
@@ -23,9 +24,11 @@ class Cron:
             fzf_executable: Path,
             *,
             schedule: str = "@hourly",
+            arguments: Sequence[str] = (),
     ):
         """
         Add a cron entry with the given schedule (e.g. '@daily', '0 3 * * *').
+        Additional arguments are passed to the command.
 
         Idempotent: if there's already an entry for this profile, it will be replaced.
         """
@@ -40,6 +43,7 @@ class Cron:
             f"--fzf-executable {fzf_executable} "
             f"{command} "
             f"--tenacious "
+            f"{''.join(f'{argument} ' for argument in arguments)}"
             f"{self.marker}"
         )
 
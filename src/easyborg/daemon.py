@@ -0,0 +1,101 @@
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT = 10.0  # seconds
+
+
+def get_socket_path(state_dir: Path) -> Path:
+    return state_dir / "daemon.sock"
+
+
+class DaemonServer:
+    """
+    Serve requests on a local UNIX socket.
+
+    The protocol is one JSON object per line: the client sends a request like {"command": "status"} and receives
+    a response like {"ok": true, ...} or {"ok": false, "error": "..."}.
+    """
+
+    def __init__(self, socket_path: Path, handler: Callable[[dict[str, Any]], dict[str, Any]]) -> None:
+        self.socket_path = socket_path
+        self.handler = handler
+        self._server: socketserver.ThreadingUnixStreamServer | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if is_running(self.socket_path):
+            raise RuntimeError(f"Daemon is already running (socket: {self.socket_path})")
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self.socket_path.unlink(missing_ok=True)  # left over from a daemon that was killed
+
+        handler = self.handler
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                try:
+                    request = json.loads(self.rfile.readline())
+                    response = {"ok": True, **handler(request)}
+                except Exception as e:
+                    logger.exception("Could not handle daemon request")
+                    response = {"ok": False, "error": str(e)}
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+        old_umask = os.umask(0o077)  # only the current user may connect
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(str(self.socket_path), RequestHandler)
+        finally:
+            os.umask(old_umask)
+        self._server.daemon_threads = True
+
+        self._thread = threading.Thread(target=self._server.serve_forever, name="daemon-server", daemon=True)
+        self._thread.start()
+        logger.info("Listening on %s", self.socket_path)
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.socket_path.unlink(missing_ok=True)
+
+
+def request(socket_path: Path, command: str, **arguments: Any) -> dict[str, Any]:
+    """
+    Send a request to the running daemon and return its response.
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(TIMEOUT)
+            s.connect(str(socket_path))
+            s.sendall(json.dumps({"command": command, **arguments}).encode("utf-8") + b"\n")
+            with s.makefile("rb") as f:
+                line = f.readline()
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise RuntimeError("Daemon is not running") from e
+    except OSError as e:
+        raise RuntimeError(f"Daemon is not responding: {e}") from e
+
+    try:
+        response = json.loads(line)
+    except ValueError as e:
+        raise RuntimeError("Daemon is not responding") from e  # closed the connection without an answer
+    if not response.pop("ok", False):
+        raise RuntimeError(f"Daemon request failed: {response.get('error')}")
+    return response
+
+
+def is_running(socket_path: Path) -> bool:
+    try:
+        request(socket_path, "ping")
+        return True
+    except RuntimeError:
+        return False
@@ -0,0 +1,138 @@
+import logging
+import os
+import time
+from collections.abc import Callable, Iterator, Sequence
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+from easyborg.exclusions import Excluder
+from easyborg.history import RunHistory, Throughput
+from easyborg.model import ProgressEvent, Repository
+from easyborg.tune import upload_speed
+from easyborg.util import format_duration, format_size
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FILE_RATE = 2000.0  # files per second Borg checks when there's no history
+LOG_INTERVAL = 60.0  # seconds between progress log messages
+
+
+@dataclass(frozen=True, slots=True)
+class Totals:
+    files: int = 0
+    bytes: int = 0
+    changed_files: int = 0  # modified after the threshold (all files without threshold)
+    changed_bytes: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class Estimate:
+    totals: Totals
+    upload_bytes: int
+    seconds: float
+    from_history: bool
+
+
+def count(excluder: Excluder, paths: Sequence[Path], thresholds: Sequence[float | None]) -> list[Totals]:
+    """
+    Count the included files and bytes below the paths, and those changed after each threshold (seconds since the
+    epoch, None counts all files as changed), in one walk.
+    """
+    files = size = 0
+    changed_files = [0] * len(thresholds)
+    changed_bytes = [0] * len(thresholds)
+
+    def add(stat: os.stat_result) -> None:
+        nonlocal files, size
+        files += 1
+        size += stat.st_size
+        modified = max(stat.st_mtime, stat.st_ctime)  # Borg's files cache looks at ctime by default
+        for i, threshold in enumerate(thresholds):
+            if threshold is None or modified > threshold:
+                changed_files[i] += 1
+                changed_bytes[i] += stat.st_size
+
+    for path in paths:
+        if not path.is_dir() and excluder.reason(str(path)) is None:
+            try:
+                add(os.stat(path, follow_symlinks=False))
+            except OSError:
+                pass
+
+    for _, stat, reason in excluder.walk():
+        if reason is None and stat is not None:
+            add(stat)
+
+    return [Totals(files, size, changed_files[i], changed_bytes[i]) for i in range(len(thresholds))]
+
+
+def estimate(repo: Repository, totals: Totals, throughput: Throughput | None) -> Estimate:
+    """
+    Estimate how much data a snapshot sends to the repository and how long it takes.
+
+    Changed data is assumed to be new to the repository (deduplication can only make it less), compressed as well as
+    in past snapshots. Without history, the upload speed assumed by easyborg tune is used.
+
+    The rates from history are each measured over the whole duration of past snapshots, so uploading and checking
+    files overlap: the snapshot takes as long as the slower of the two.
+    """
+    ratio = throughput.compression_ratio if throughput else 1.0
+    upload_bytes = int(totals.changed_bytes * ratio)
+
+    rate = throughput.deduplicated_rate if throughput and throughput.deduplicated_rate else upload_speed(repo)
+    file_rate = throughput.file_rate if throughput and throughput.file_rate else DEFAULT_FILE_RATE
+
+    seconds = max(upload_bytes / rate, totals.files / file_rate)
+    return Estimate(totals, upload_bytes, seconds, throughput is not None)
+
+
+@dataclass(frozen=True, slots=True)
+class Expectation:
+    size: int  # bytes Borg is expected to read from the backup paths
+    rate: float | None  # bytes per second, None without history
+
+
+def expect(history: RunHistory, repo: Repository) -> Expectation | None:
+    """
+    Return what the next snapshot is expected to read: the size of the previous snapshot or of the last scan
+    (easyborg backup --estimate), whichever is more recent. Returns None if neither exists.
+    """
+    runs = [run for run in (history.last_success(repo.name), history.last_success(repo.name, "scan")) if run]
+    runs = [run for run in runs if run.original_size]
+    if not runs:
+        return None
+    run = max(runs, key=lambda run: run.started)
+    throughput = history.throughput(repo.name)
+    return Expectation(run.original_size, throughput.original_rate if throughput else None)
+
+
+def track(
+        events: Iterator[ProgressEvent],
+        expectation: Expectation,
+        *,
+        name: str,
+        log_interval: float = LOG_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+) -> Iterator[ProgressEvent]:
+    """
+    Add the expected total and the remaining time to Borg create progress events, and log the progress regularly
+    (so it can be followed in headless mode).
+    """
+    next_log = clock() + log_interval
+    for event in events:
+        if event.current is None:
+            yield event
+            continue
+
+        total = max(expectation.size, event.current)  # new data makes snapshots grow
+        remaining = (total - event.current) / expectation.rate if expectation.rate else None
+        yield replace(event, total=total, remaining=remaining)
+
+        if clock() >= next_log:
+            next_log = clock() + log_interval
+            message = "%s: %d%% (%s of about %s)"
+            arguments = [name, event.current * 100 // total, format_size(event.current), format_size(total)]
+            if remaining is not None:
+                message += ", about %s remaining"
+                arguments.append(format_duration(remaining))
+            logger.info(message, *arguments)
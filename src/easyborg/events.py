@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import socket
+import stat
+import sys
+import threading
+import time
+from collections.abc import Callable
+from typing import IO, Any
+
+from easyborg.model import ProgressEvent
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("ndjson",)
+PROGRESS_INTERVAL = 1.0  # seconds between progress events of a stage
+
+
+class EventStream:
+    """
+    Write machine-readable events as newline-delimited JSON, e.g. for a supervisor following a headless run.
+
+    Progress events are coalesced to at most one per interval and stage. Each event has a "type" and a "time"
+    (seconds since the epoch); fields that are None are left out.
+    """
+
+    def __init__(
+            self,
+            stream: IO[str],
+            *,
+            interval: float = PROGRESS_INTERVAL,
+            clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.stream = stream
+        self.interval = interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._last_progress: dict[str, float] = {}
+
+    def emit(self, type: str, **fields: Any) -> None:
+        event = {"type": type, "time": round(time.time(), 3)}
+        event.update((key, value) for key, value in fields.items() if value is not None)
+        line = json.dumps(event, default=str, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self.stream is None:
+                return
+            try:
+                self.stream.write(line)
+                self.stream.flush()
+            except (OSError, ValueError) as e:
+                logger.warning("Could not write event, no more events are written: %s", e)  # reader went away
+                self.stream = None
+
+    def progress(self, stage: str, event: ProgressEvent, **fields: Any) -> None:
+        now = self.clock()
+        done = event.total is not None and event.current is not None and event.current >= event.total
+        if not done and now - self._last_progress.get(stage, float("-inf")) < self.interval:
+            return
+        self._last_progress[stage] = now
+        self.emit(
+            "progress",
+            stage=stage,
+            current=event.current,
+            total=event.total,
+            remaining=event.remaining,
+            message=event.message,
+            **fields,
+        )
+
+    def end_stage(self, stage: str) -> None:
+        self._last_progress.pop(stage, None)
+
+    def close(self) -> None:
+        with self._lock:
+            if self.stream is not None and self.stream not in (sys.stdout, sys.stderr):
+                self.stream.close()
+            self.stream = None
+
+
+def open_events(spec: str, *, stdout: bool = True) -> EventStream:
+    """
+    Open the event stream for an --events option: "ndjson" (standard output), "ndjson=<fd>" (an inherited file
+    descriptor), or "ndjson=<path>" (a Unix socket to connect to, or a file to append to).
+
+    With stdout=False (the console writes to standard output), standard output is rejected.
+    """
+    format, _, target = spec.partition("=")
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported event format: {format} (supported: {', '.join(FORMATS)})")
+
+    if not target:
+        if not stdout:
+            raise ValueError("Events can only go to standard output with --headless, use a file, socket or fd")
+        return EventStream(sys.stdout)
+    if target.isdigit():
+        return EventStream(os.fdopen(int(target), "w", encoding="utf-8", buffering=1))
+    if _is_socket(target):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(target)
+        return EventStream(connection.makefile("w", encoding="utf-8"))
+    return EventStream(open(target, "a", encoding="utf-8"))
+
+
+def _is_socket(path: str) -> bool:
+    try:
+        return stat.S_ISSOCK(os.stat(path).st_mode)
+    except OSError:
+        return False
@@ -0,0 +1,330 @@
+import fnmatch
+import logging
+import os
+import re
+import tempfile
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from easyborg.model import ExclusionSettings
+from easyborg.scan import scan
+
+logger = logging.getLogger(__name__)
+
+CACHEDIR_TAG = "CACHEDIR.TAG"
+CACHEDIR_SIGNATURE = b"Signature: 8a477f597d28d172789f06886806bc55"
+
+_STYLES = ("fm", "sh", "re", "pp", "pf")
+
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    """
+    One line of a Borg patterns file, matched the same way Borg matches it.
+    """
+
+    line: str
+    command: str  # "+" (include), "-" (exclude) or "!" (exclude, don't recurse)
+    matches: Callable[[str], bool]  # takes relative paths (without leading slash)
+
+    @property
+    def exclude(self) -> bool:
+        return self.command != "+"
+
+    @classmethod
+    def parse(cls, line: str) -> "Rule":
+        command, _, pattern = line.partition(" ")
+        if command not in ("+", "-", "!") or not pattern:
+            raise RuntimeError(f"Invalid pattern: {line}")
+        style, separator, value = pattern.partition(":")
+        if not separator or style not in _STYLES:
+            style, value = "sh", pattern  # default style in patterns files
+        return cls(line, command, _matcher(style, value))
+
+
+@dataclass(frozen=True, slots=True)
+class ExclusionReport:
+    files: Counter  # rule -> number of excluded files
+    bytes: Counter  # rule -> number of excluded bytes
+    included_files: int
+    included_bytes: int
+
+
+def compile_patterns(settings: ExclusionSettings, backup_paths: Iterable[Path]) -> list[str]:
+    """
+    Return the lines of the Borg patterns file for the exclusion settings.
+
+    Patterns without a command are exclusions like Borg's --exclude (no recursion, fnmatch style by default).
+    """
+    lines = [_pattern_line(pattern) for pattern in settings.patterns]
+    if settings.gitignore:
+        lines.extend(gitignore_patterns(backup_paths))
+    return lines
+
+
+def borg_options(settings: ExclusionSettings) -> list[str]:
+    """
+    Return the Borg create options for the exclusion settings, except for the patterns.
+    """
+    options = []
+    if settings.exclude_caches:
+        options.append("--exclude-caches")
+    for name in settings.exclude_if_present:
+        options.extend(["--exclude-if-present", name])
+    if settings.one_file_system:
+        options.append("--one-file-system")
+    return options
+
+
+@contextmanager
+def patterns_file(lines: Sequence[str]) -> Iterator[Path | None]:
+    """
+    Write the patterns to a temporary file for Borg's --patterns-from (yields None if there are no patterns).
+    """
+    if not lines:
+        yield None
+        return
+    with tempfile.NamedTemporaryFile("w", prefix="easyborg-patterns-", suffix=".lst", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
+        f.flush()
+        yield Path(f.name)
+
+
+def gitignore_patterns(backup_paths: Iterable[Path]) -> list[str]:
+    """
+    Translate the .gitignore files below the backup paths into Borg patterns.
+
+    Git applies the last matching rule, Borg the first, so the rules of each file are reversed. Rules of nested
+    .gitignore files come first, since they take precedence in Git.
+    """
+    files = [
+        directory.path / name
+        for directory in scan(backup_paths, stat_files=False)
+        for name, _ in directory.files
+        if name == ".gitignore"
+    ]
+    files.sort(key=lambda path: (-len(path.parts), path))
+    lines = []
+    for path in files:
+        try:
+            text = path.read_text(encoding="utf-8", errors="surrogateescape")
+        except OSError as e:
+            logger.warning("Could not read '%s': %s", path, e)
+            continue
+        rules = [_gitignore_line(path.parent, line) for line in text.splitlines()]
+        lines.extend(rule for rule in reversed(rules) if rule)
+    return lines
+
+
+class Excluder:
+    """
+    Decide which paths Borg excludes, for paths Borg doesn't find itself (incremental collection) and for reports.
+    """
+
+    def __init__(self, settings: ExclusionSettings, lines: Sequence[str], roots: Iterable[Path]) -> None:
+        self.settings = settings
+        self.rules = [Rule.parse(line) for line in lines]
+        self.roots = {os.path.normpath(root) for root in roots}
+        self._directories: dict[str, tuple[str | None, bool, str | None]] = {}
+        self._devices: dict[str, int] = {}
+
+    def reason(self, path: str) -> str | None:
+        """
+        Return why the path is excluded (the pattern line or option), or None if it's included.
+        """
+        path = os.path.normpath(path)
+        if path in self.roots:
+            return self._directory(path)[0]
+        reason, recursive, _ = self._directory(os.path.dirname(path))
+        if recursive:
+            return reason
+        rule = self._match(path)
+        return rule.line if rule and rule.exclude else None
+
+    def filter(self, paths: Iterable[str]) -> list[str]:
+        return [path for path in paths if self.reason(path) is None]
+
+    def walk(self) -> Iterator[tuple[Path, os.stat_result | None, str | None]]:
+        """
+        Walk the backup paths in parallel and yield each file with its stat and why it's excluded (None if included).
+        """
+        for directory in scan([Path(root) for root in self.roots]):
+            reason, recursive, _ = self._directory(str(directory.path))
+            for name, stat in directory.files:
+                path = directory.path / name
+                if recursive:
+                    yield path, stat, reason
+                else:
+                    rule = self._match(str(path))
+                    yield path, stat, rule.line if rule and rule.exclude else None
+
+    def report(self) -> ExclusionReport:
+        """
+        Sum up what each rule excludes.
+        """
+        files: Counter = Counter()
+        sizes: Counter = Counter()
+        included_files = included_bytes = 0
+
+        for _, stat, reason in self.walk():
+            size = stat.st_size if stat else 0
+            if reason:
+                files[reason] += 1
+                sizes[reason] += size
+            else:
+                included_files += 1
+                included_bytes += size
+
+        return ExclusionReport(files, sizes, included_files, included_bytes)
+
+    def _directory(self, directory: str) -> tuple[str | None, bool, str | None]:
+        """
+        Return why the directory is excluded, whether its contents are excluded as well, and its backup root.
+        """
+        cached = self._directories.get(directory)
+        if cached is not None:
+            return cached
+
+        if directory in self.roots:
+            root = directory
+            reason, recursive = None, False
+        else:
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return None, False, None  # not below any backup path
+            reason, recursive, root = self._directory(parent)
+            if root is None:
+                return None, False, None
+
+        if not recursive:
+            rule = self._match(directory)
+            if rule and rule.exclude:
+                reason, recursive = rule.line, rule.command == "!"
+            elif not rule and (marker := self._marker(directory, root)):
+                reason, recursive = marker, True
+            else:
+                reason = None
+
+        result = (reason, recursive, root)
+        self._directories[directory] = result
+        return result
+
+    def _match(self, path: str) -> Rule | None:
+        relative = path.lstrip("/")
+        return next((rule for rule in self.rules if rule.matches(relative)), None)
+
+    def _marker(self, directory: str, root: str) -> str | None:
+        settings = self.settings
+        if settings.exclude_caches and _is_cache_directory(directory):
+            return "exclude_caches"
+        for name in settings.exclude_if_present:
+            if os.path.lexists(os.path.join(directory, name)):
+                return f"exclude_if_present {name}"
+        if settings.one_file_system and directory != root and self._device(directory) != self._device(root):
+            return "one_file_system"
+        return None
+
+    def _device(self, path: str) -> int | None:
+        if path not in self._devices:
+            try:
+                self._devices[path] = os.stat(path, follow_symlinks=False).st_dev
+            except OSError:
+                return None
+        return self._devices[path]
+
+
+def _pattern_line(pattern: str) -> str:
+    if pattern[:2] in ("+ ", "- ", "! "):
+        return pattern
+    style, separator, _ = pattern.partition(":")
+    if separator and style in _STYLES:
+        return f"! {pattern}"
+    return f"! fm:{pattern}"  # same default style as Borg's --exclude
+
+
+def _gitignore_line(directory: Path, line: str) -> str | None:
+    line = line.rstrip()  # trailing spaces are ignored unless escaped; escaping isn't supported here
+    if not line or line.startswith("#"):
+        return None
+    command = "+" if line.startswith("!") else "!"
+    line = line.removeprefix("!").removeprefix("\\")
+    pattern = line.rstrip("/")  # directory-only patterns are applied to files as well
+    if not pattern:
+        return None
+    base = str(directory).lstrip("/")
+    if "/" in pattern:
+        path = f"{base}/{pattern.lstrip('/')}"  # anchored to the directory of the .gitignore file
+    else:
+        path = f"{base}/**/{pattern}"
+    # excluded directories aren't searched (like Git: files can't be re-included from an excluded directory)
+    return f"{command} sh:{path}"
+
+
+def _is_cache_directory(directory: str) -> bool:
+    try:
+        with open(os.path.join(directory, CACHEDIR_TAG), "rb") as f:
+            return f.read(len(CACHEDIR_SIGNATURE)) == CACHEDIR_SIGNATURE
+    except OSError:
+        return False
+
+
+def _matcher(style: str, pattern: str) -> Callable[[str], bool]:
+    if style == "re":
+        regex = re.compile(pattern)
+        return lambda path: regex.search(path) is not None
+
+    pattern = pattern.lstrip("/")  # Borg matches relative paths
+
+    if style == "pf":
+        return lambda path: path == pattern
+    if style == "pp":
+        prefix = os.path.normpath(pattern)
+        return lambda path: path == prefix or path.startswith(prefix + "/")
+
+    # fm and sh patterns match the path itself and everything below it
+    if style == "fm":
+        suffix = "*/" if pattern.endswith("/") else "/*"
+        regex = re.compile(fnmatch.translate(os.path.normpath(pattern) + suffix))
+    else:
+        suffix = "/**/*/" if pattern.endswith("/") else "/**/*"
+        regex = re.compile(_translate_shell_pattern(os.path.normpath(pattern) + suffix))
+    return lambda path: regex.match(path + "/") is not None
+
+
+def _translate_shell_pattern(pattern: str) -> str:
+    """
+    Translate a shell-style pattern to a regular expression like Borg: * and ? don't match /, **/ matches any
+    number of directories.
+    """
+    result, i, n = "", 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            result += r"(?:[^/]*/)*"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            result += r".*"
+            i += 2
+            continue
+        if c == "*":
+            result += r"[^/]*"
+        elif c == "?":
+            result += r"[^/]"
+        elif c == "[":
+            end = pattern.find("]", i + 2 if pattern[i + 1 : i + 2] in ("!", "]") else i + 1)
+            if end == -1:
+                result += re.escape(c)
+            else:
+                content = pattern[i + 1 : end].replace("\\", "\\\\")
+                if content.startswith("!"):
+                    content = "^" + content[1:]
+                result += f"[{content}]"
+                i = end
+        else:
+            result += re.escape(c)
+        i += 1
+    return rf"(?s:{result})\Z"
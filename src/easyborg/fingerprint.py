@@ -0,0 +1,98 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections.abc import Iterable
+from datetime import timedelta
+from pathlib import Path
+
+from easyborg.scan import DEFAULT_WORKERS, scan
+
+logger = logging.getLogger(__name__)
+
+_MODULUS = 2**256
+
+
+def compute_fingerprint(paths: Iterable[Path], *, workers: int = DEFAULT_WORKERS) -> str:
+    """
+    Compute a fingerprint of the trees below the given paths.
+
+    The fingerprint covers the metadata of every directory (mtime, ctime, inode, number of entries) and of every file
+    (mtime, ctime, inode, size). Directory metadata alone would miss files that are modified in place, so file metadata
+    is included; file contents are never read. The per-directory digests are summed, so the result does not depend on
+    the order in which the parallel scan finishes.
+    """
+    paths = list(paths)
+
+    total = _digest("roots", *map(str, paths))
+
+    for path in paths:
+        if path.is_dir():
+            continue
+        try:
+            total += _digest("file", str(path), *_file_values(os.stat(path, follow_symlinks=False)))
+        except FileNotFoundError:
+            total += _digest("missing", str(path))
+
+    for directory in scan(paths, workers=workers):
+        values = [str(directory.path), *_directory_values(directory.stat)]
+        values.extend([str(len(directory.files)), str(len(directory.directories))])
+        for name, stat in sorted(directory.files, key=lambda f: f[0]):
+            values.append(name)
+            values.extend(_file_values(stat))
+        values.extend(sorted(directory.directories))
+        total += _digest("dir", *values)
+
+    return format(total % _MODULUS, "064x")
+
+
+class FingerprintStore:
+    """
+    Remember the fingerprint of the backup paths at the time of the last successful snapshot per repository.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def is_unchanged(self, repo_name: str, fingerprint: str, *, max_age: timedelta) -> bool:
+        """
+        Return True if the fingerprint matches the one recorded for the repository and the recorded snapshot is not
+        older than max_age.
+        """
+        entry = self._load().get(repo_name)
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return False
+        return time.time() - entry.get("timestamp", 0) < max_age.total_seconds()
+
+    def update(self, repo_name: str, fingerprint: str) -> None:
+        """
+        Record the fingerprint of a successful snapshot.
+        """
+        entries = self._load()
+        entries[repo_name] = {"fingerprint": fingerprint, "timestamp": time.time()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(entries, indent=2), encoding="utf-8")
+        os.replace(temp_path, self.path)
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            logger.warning("Ignoring corrupt fingerprint file '%s'", self.path)
+            return {}
+
+
+def _directory_values(stat: os.stat_result) -> list[str]:
+    return [str(stat.st_mtime_ns), str(stat.st_ctime_ns), str(stat.st_ino)]
+
+
+def _file_values(stat: os.stat_result) -> list[str]:
+    return [str(stat.st_mtime_ns), str(stat.st_ctime_ns), str(stat.st_ino), str(stat.st_size)]
+
+
+def _digest(*values: str) -> int:
+    return int.from_bytes(hashlib.sha256("\0".join(values).encode("utf-8", "surrogateescape")).digest(), "big")
@@ -4,6 +4,7 @@ from enum import Enum
 from pathlib import Path
 from typing import TypeVar
 
+from easyborg import profiling
 from easyborg.process import ProcessError, assert_executable_valid, run_async
 from easyborg.theme import StyleId, SymbolId, ThemeType, theme
 
@@ -116,7 +117,8 @@ class Fzf:
             cmd.append("--marker=")
 
         try:
-            return list(run_async(cmd, input_lines=items))
+            with profiling.span("fzf selection"):
+                return list(run_async(cmd, input_lines=profiling.traced(items, "fzf input")))
         except ProcessError as e:
             if e.return_code == 130:
                 return []
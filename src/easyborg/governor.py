@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from easyborg.model import GovernorSettings
+from easyborg.process import pause_processes, resume_processes
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_DUTY_CYCLE = 0.5  # fraction of each poll interval Borg may run while throttled
+LOCK_WAIT_FRACTION = 0.5  # Borg is stopped for at most this fraction of the lock wait at a time
+
+
+class Governor:
+    """
+    Keep backups from competing with interactive work.
+
+    Before a backup starts, the governor waits until load average, CPU and I/O pressure (PSI) and battery are within
+    the configured thresholds. While Borg runs, it can also throttle (stop and continue in turns) or pause (stop until
+    the thresholds are met again) the Borg processes. After the deadline, the backup runs regardless.
+
+    Stopped Borg processes keep their repository locks. With lock_wait (seconds clients wait for a locked repository),
+    Borg is stopped for at most half of it at a time, then it runs for a poll interval before it's paused again.
+    """
+
+    def __init__(
+            self,
+            settings: GovernorSettings,
+            *,
+            lock_wait: float | None = None,
+            proc_root: Path = Path("/proc"),
+            sys_root: Path = Path("/sys"),
+            clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.settings = settings
+        self.max_stop = lock_wait * LOCK_WAIT_FRACTION if lock_wait is not None else None
+        self.proc_root = proc_root
+        self.sys_root = sys_root
+        self.clock = clock
+        self._started: float | None = None
+        self._stopped = threading.Event()
+
+    def check(self) -> str | None:
+        """
+        Return the reason why the backup should wait, or None if it may run.
+        """
+        settings = self.settings
+
+        if settings.max_load is not None:
+            load = self.load_average()
+            if load is not None and load > settings.max_load:
+                return f"load average {load:.2f} > {settings.max_load}"
+
+        for resource, threshold in (("cpu", settings.max_cpu_pressure), ("io", settings.max_io_pressure)):
+            if threshold is None:
+                continue
+            pressure = self.pressure(resource)
+            if pressure is not None and pressure > threshold:
+                return f"{resource.upper()} pressure {pressure:.1f}% > {threshold}%"
+
+        if settings.min_battery is not None:
+            capacity = self.battery_capacity()
+            if capacity is not None and capacity < settings.min_battery:
+                return f"battery {capacity}% < {settings.min_battery}%"
+
+        return None
+
+    def deadline_passed(self) -> bool:
+        return self._started is not None and self.clock() - self._started >= self.settings.deadline * 60
+
+    def defer(self, wait: Callable[[float], object] = time.sleep) -> None:
+        """
+        Wait until the backup may run or the deadline passed. Starts the deadline.
+        """
+        self._started = self.clock()
+        reported = None
+        while not self.deadline_passed():
+            reason = self.check()
+            if reason is None:
+                return
+            if reason != reported:
+                logger.info("Deferring backup: %s", reason)
+                reported = reason
+            wait(self.settings.poll_interval)
+        logger.info("Governor deadline passed, starting backup regardless")
+
+    @contextmanager
+    def supervise(self) -> Iterator[None]:
+        """
+        Throttle or pause running Borg processes while the thresholds are exceeded (unless the mode is defer).
+        """
+        if self.settings.mode == "defer":
+            yield
+            return
+
+        self._stopped.clear()
+        thread = threading.Thread(target=self._supervise, name="governor", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            self._stopped.set()
+            thread.join()
+            resume_processes()  # never leave stopped processes behind
+
+    def load_average(self) -> float | None:
+        try:
+            return float((self.proc_root / "loadavg").read_text().split()[0])
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def pressure(self, resource: str) -> float | None:
+        """
+        Return the percentage of time some tasks stalled on the resource in the last 10 seconds.
+        """
+        try:
+            lines = (self.proc_root / "pressure" / resource).read_text().splitlines()
+        except OSError:
+            return None  # kernel without PSI
+        for line in lines:
+            kind, *values = line.split()
+            if kind == "some":
+                fields = dict(value.split("=", 1) for value in values)
+                return float(fields["avg10"])
+        return None
+
+    def battery_capacity(self) -> int | None:
+        """
+        Return the lowest capacity of all discharging batteries, or None if running on mains power.
+        """
+        capacities = []
+        for supply in sorted((self.sys_root / "class" / "power_supply").glob("*")):
+            try:
+                if _read(supply / "type") != "Battery" or _read(supply / "status") != "Discharging":
+                    continue
+                capacities.append(int(_read(supply / "capacity")))
+            except (OSError, ValueError):
+                continue
+        return min(capacities) if capacities else None
+
+    def _supervise(self) -> None:
+        interval = self.settings.poll_interval
+        max_stop = self.max_stop if self.max_stop is not None else float("inf")
+        stopped = False
+        stopped_at = 0.0
+        while not self._stopped.is_set():
+            reason = None if self.deadline_passed() else self.check()
+            if reason is None:
+                if stopped:
+                    logger.info("Resuming backup")
+                    resume_processes()
+                    stopped = False
+                self._stopped.wait(interval)
+            elif self.settings.mode == "pause":
+                if not stopped:
+                    logger.info("Pausing backup: %s", reason)
+                    pause_processes()
+                    stopped = True
+                    stopped_at = self.clock()
+                elif self.clock() - stopped_at >= max_stop:
+                    # let Borg run for a while, so clients waiting for its repository lock don't give up
+                    logger.info("Resuming paused backup for %.1fs, it holds the repository lock", interval)
+                    resume_processes()
+                    stopped = False
+                    self._stopped.wait(interval)
+                    continue
+                self._stopped.wait(min(interval, max(max_stop - (self.clock() - stopped_at), 0)))
+            else:
+                if not stopped:
+                    logger.info("Throttling backup: %s", reason)
+                resume_processes()
+                if self._stopped.wait(interval * THROTTLE_DUTY_CYCLE):
+                    break
+                pause_processes()
+                stopped = True
+                self._stopped.wait(min(interval * (1 - THROTTLE_DUTY_CYCLE), max_stop))
+
+
+def _read(path: Path) -> str:
+    return path.read_text().strip()
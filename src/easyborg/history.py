@@ -0,0 +1,313 @@
+import logging
+import math
+import sqlite3
+import statistics
+import time
+from collections.abc import Iterator, Mapping
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    repository TEXT NOT NULL,
+    operation TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    success INTEGER NOT NULL,
+    original_size INTEGER,
+    compressed_size INTEGER,
+    deduplicated_size INTEGER,
+    nfiles INTEGER,
+    error TEXT,
+    return_code INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_repository ON runs (repository, operation, started);
+"""
+
+# runs that added less than this are dominated by scanning, so they say little about throughput
+MIN_THROUGHPUT_SIZE = 10_000_000  # bytes
+
+# a run is a regression if it took this much longer than the median of the runs before it
+REGRESSION_FACTOR = 1.5
+MIN_REGRESSION_RUNS = 5  # earlier runs needed to tell a regression from noise
+
+
+def get_history_path(state_dir: Path) -> Path:
+    return state_dir / "history.sqlite"
+
+
+@dataclass(frozen=True, slots=True)
+class Run:
+    repository: str
+    operation: str  # create, prune, compact, ...
+    started: float  # seconds since the epoch
+    duration: float  # seconds
+    success: bool
+    original_size: int | None = None
+    compressed_size: int | None = None
+    deduplicated_size: int | None = None
+    nfiles: int | None = None
+    error: str | None = None
+    return_code: int | None = None  # exit code of the failed Borg process
+
+
+@dataclass(frozen=True, slots=True)
+class Throughput:
+    deduplicated_rate: float | None  # bytes of new data stored per second
+    file_rate: float | None  # files checked per second
+    compression_ratio: float  # compressed / original size
+    runs: int
+    original_rate: float | None = None  # bytes of backup paths processed per second
+
+
+@dataclass(frozen=True, slots=True)
+class Trend:
+    repository: str
+    operation: str
+    runs: int
+    failures: int
+    durations: tuple[float, float, float] | None  # seconds: median, 90th percentile and maximum of successful runs
+    rate: float | None  # median bytes of backup paths processed per second, recent half of the runs
+    previous_rate: float | None  # the same for the older half
+    deduplication_ratio: float | None  # median deduplicated / original size
+    regression: bool  # the last successful run took much longer than those before it
+
+
+class RunHistory:
+    """
+    Record Borg operations in a local SQLite database, e.g. to estimate how long future backups take.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def record(self, run: Run) -> None:
+        try:
+            with self._connect() as connection:
+                connection.execute(
+                    "INSERT INTO runs (repository, operation, started, duration, success, original_size, "
+                    "compressed_size, deduplicated_size, nfiles, error, return_code) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run.repository,
+                        run.operation,
+                        run.started,
+                        run.duration,
+                        run.success,
+                        run.original_size,
+                        run.compressed_size,
+                        run.deduplicated_size,
+                        run.nfiles,
+                        run.error,
+                        run.return_code,
+                    ),
+                )
+        except sqlite3.Error as e:
+            logger.warning("Could not record run in history '%s': %s", self.path, e)  # never fail a backup for this
+
+    def runs(
+            self,
+            repository: str | None = None,
+            operation: str | None = None,
+            *,
+            success: bool | None = None,
+            limit: int = 1000,
+    ) -> list[Run]:
+        """
+        Return the most recent runs, oldest first (only successful or failed ones if success is given).
+        """
+        query = "SELECT repository, operation, started, duration, success, original_size, compressed_size, "
+        query += "deduplicated_size, nfiles, error, return_code FROM runs WHERE 1 = 1"
+        parameters: list[Any] = []
+        if repository is not None:
+            query += " AND repository = ?"
+            parameters.append(repository)
+        if operation is not None:
+            query += " AND operation = ?"
+            parameters.append(operation)
+        if success is not None:
+            query += " AND success = ?"
+            parameters.append(success)
+        query += " ORDER BY started DESC LIMIT ?"
+        parameters.append(limit)
+
+        if not self.path.exists():
+            return []
+        with self._connect() as connection:
+            rows = connection.execute(query, parameters).fetchall()
+        return [Run(*row[:4], bool(row[4]), *row[5:]) for row in reversed(rows)]
+
+    def last_success(self, repository: str, operation: str = "create") -> Run | None:
+        """
+        Return the most recent successful run of the operation in the repository.
+        """
+        runs = self.runs(repository, operation, success=True, limit=1)
+        return runs[-1] if runs else None
+
+    def count(self, repository: str, operation: str, *, success: bool | None = None) -> int:
+        """
+        Return the number of recorded runs of the operation in the repository (only successful or failed ones).
+        """
+        query = "SELECT COUNT(*) FROM runs WHERE repository = ? AND operation = ?"
+        parameters: list[Any] = [repository, operation]
+        if success is not None:
+            query += " AND success = ?"
+            parameters.append(success)
+
+        if not self.path.exists():
+            return 0
+        with self._connect() as connection:
+            return connection.execute(query, parameters).fetchone()[0]
+
+    def throughput(self, repository: str, *, limit: int = 20) -> Throughput | None:
+        """
+        Return the median throughput of the recent successful snapshots, or None without history.
+        """
+        runs = [
+            run
+            for run in self.runs(repository, "create", limit=limit)
+            if run.success and run.duration > 0 and run.original_size is not None
+        ]
+        if not runs:
+            return None
+
+        big = [run for run in runs if run.deduplicated_size and run.deduplicated_size >= MIN_THROUGHPUT_SIZE]
+        ratios = [run.compressed_size / run.original_size for run in runs if run.original_size and run.compressed_size]
+        file_rates = [run.nfiles / run.duration for run in runs if run.nfiles]
+        original_rates = [run.original_size / run.duration for run in runs if run.original_size]
+        return Throughput(
+            deduplicated_rate=statistics.median(run.deduplicated_size / run.duration for run in big) if big else None,
+            file_rate=statistics.median(file_rates) if file_rates else None,
+            compression_ratio=statistics.median(ratios) if ratios else 1.0,
+            runs=len(runs),
+            original_rate=statistics.median(original_rates) if original_rates else None,
+        )
+
+    def repositories(self) -> list[tuple[str, str]]:
+        """
+        Return the recorded repositories and operations.
+        """
+        if not self.path.exists():
+            return []
+        with self._connect() as connection:
+            rows = connection.execute("SELECT DISTINCT repository, operation FROM runs ORDER BY repository, operation")
+            return [tuple(row) for row in rows]
+
+    def trend(self, repository: str, operation: str = "create", *, limit: int = 100) -> Trend | None:
+        """
+        Summarize the recent runs of the operation in the repository, or return None without runs.
+        """
+        runs = self.runs(repository, operation, limit=limit)
+        if not runs:
+            return None
+        successful = [run for run in runs if run.success]
+
+        durations = [run.duration for run in successful]
+        rates = [run.original_size / run.duration for run in successful if run.original_size and run.duration > 0]
+        half = len(rates) // 2
+        ratios = [
+            run.deduplicated_size / run.original_size
+            for run in successful
+            if run.original_size and run.deduplicated_size is not None
+        ]
+
+        earlier = durations[:-1]
+        regression = (
+            len(earlier) >= MIN_REGRESSION_RUNS
+            and durations[-1] > REGRESSION_FACTOR * statistics.median(earlier)
+        )
+
+        return Trend(
+            repository=repository,
+            operation=operation,
+            runs=len(runs),
+            failures=len(runs) - len(successful),
+            durations=(statistics.median(durations), percentile(durations, 90), max(durations)) if durations else None,
+            rate=statistics.median(rates[half:]) if rates else None,
+            previous_rate=statistics.median(rates[:half]) if half else None,
+            deduplication_ratio=statistics.median(ratios) if ratios else None,
+            regression=regression,
+        )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self.path, timeout=10)) as connection:
+            connection.executescript(SCHEMA)
+            with connection:  # commits or rolls back
+                yield connection
+
+
+def percentile(values: list[float], p: float) -> float:
+    """
+    Return the p-th percentile of the values (nearest rank).
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def run_from_stats(
+        repository: str,
+        operation: str,
+        started: float,
+        duration: float,
+        stats: Mapping[str, Any] | None,
+) -> Run:
+    """
+    Create a successful run from the statistics Borg reports.
+    """
+    stats = stats or {}
+    return Run(
+        repository=repository,
+        operation=operation,
+        started=started,
+        duration=stats.get("duration", duration),
+        success=True,
+        original_size=stats.get("original_size"),
+        compressed_size=stats.get("compressed_size"),
+        deduplicated_size=stats.get("deduplicated_size"),
+        nfiles=stats.get("nfiles"),
+    )
+
+
+def run_from_error(repository: str, operation: str, started: float, duration: float, error: BaseException) -> Run:
+    """
+    Create a failed run.
+    """
+    return Run(
+        repository,
+        operation,
+        started,
+        duration,
+        False,
+        error=str(error) or type(error).__name__,
+        return_code=getattr(error, "return_code", None),  # ProcessError
+    )
+
+
+@contextmanager
+def recorded(
+        history: RunHistory | None,
+        repository: str,
+        operation: str,
+        *,
+        stats: Mapping[str, Any] | None = None,
+) -> Iterator[None]:
+    """
+    Record the operation run in the block in the history (if given), with the statistics collected into stats if it
+    succeeds and with the error if it fails.
+    """
+    started = time.time()
+    try:
+        yield
+    except Exception as e:
+        if history:
+            history.record(run_from_error(repository, operation, started, time.time() - started, e))
+        raise
+    if history:
+        history.record(run_from_stats(repository, operation, started, time.time() - started, stats))
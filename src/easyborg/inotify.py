@@ -0,0 +1,195 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+from collections.abc import Iterable
+from pathlib import Path
+
+from easyborg.scan import scan
+
+logger = logging.getLogger(__name__)
+
+# see /usr/include/linux/inotify.h
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+CHANGE_MASK = (
+        IN_MODIFY
+        | IN_ATTRIB
+        | IN_CLOSE_WRITE
+        | IN_MOVED_FROM
+        | IN_MOVED_TO
+        | IN_CREATE
+        | IN_DELETE
+        | IN_DELETE_SELF
+        | IN_MOVE_SELF
+)
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+_BUFFER_SIZE = 64 * 1024
+
+
+class Inotify:
+    """
+    Minimal inotify binding (Linux only) based on ctypes.
+    """
+
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise RuntimeError("Watching for changes requires inotify (Linux)")
+
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._libc = libc
+
+        self.fd = _check(libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC))
+
+    def add_watch(self, path: Path, mask: int) -> int:
+        return _check(self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask))
+
+    def read(self, timeout: float | None) -> list[tuple[int, int, str]]:
+        """
+        Wait up to timeout seconds for events and return them as (wd, mask, name) tuples.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, _BUFFER_SIZE)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(data[offset: offset + length].rstrip(b"\0"))
+                offset += length
+                events.append((wd, mask, name))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class TreeWatcher:
+    """
+    Watch entire directory trees for changes.
+
+    inotify watches single directories only, so every directory below the roots gets its own watch, and directories
+    created later are added as their creation is reported.
+
+    The parent directory of each root is watched as well (for the root only), so changes of file roots are seen even
+    if the file is replaced (e.g. by an atomic save), and a root directory that is recreated is watched again.
+    """
+
+    def __init__(self, roots: Iterable[Path]) -> None:
+        self.roots = list(roots)
+        self.inotify = Inotify()
+        self._paths: dict[int, Path] = {}
+        self._parents: dict[int, tuple[Path, set[str]]] = {}  # parent directory of roots, names of the roots
+        for root in self.roots:
+            self._watch_parent(root)
+            if root.is_dir():
+                self._watch_tree(root)
+        logger.debug("Watching %d directories below %s", len(self._paths), self.roots)
+
+    def read(self, timeout: float | None) -> list[Path]:
+        """
+        Wait up to timeout seconds for changes and return the changed paths.
+
+        If the kernel's event queue overflowed, the roots are returned, since anything below them may have changed.
+        """
+        changed: list[Path] = []
+        for wd, mask, name in self.inotify.read(timeout):
+            if mask & IN_Q_OVERFLOW:
+                logger.warning("Change event queue overflowed")
+                changed.extend(self.roots)
+                continue
+            if mask & IN_IGNORED:
+                self._paths.pop(wd, None)  # watched directory was removed
+                self._parents.pop(wd, None)
+                continue
+
+            if wd in self._paths:
+                parent = self._paths[wd]
+            elif wd in self._parents and name in self._parents[wd][1]:
+                parent = self._parents[wd][0]
+            else:
+                continue  # e.g. a sibling of a root
+            path = parent / name if name else parent
+            changed.append(path)
+
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_tree(path)
+        return changed
+
+    def close(self) -> None:
+        self.inotify.close()
+
+    def __enter__(self) -> "TreeWatcher":
+        return self
+
+    def __exit__(self, *_args) -> None:
+        self.close()
+
+    def _watch_tree(self, root: Path) -> None:
+        for directory in scan([root], stat_files=False):
+            self._watch(directory.path, IN_ONLYDIR)
+
+    def _watch_parent(self, root: Path) -> None:
+        parent = root.parent
+        if parent == root:
+            return  # the root directory of the filesystem
+        wd = self._add_watch(parent, IN_ONLYDIR)
+        if wd is not None:
+            self._parents.setdefault(wd, (parent, set()))[1].add(root.name)
+
+    def _watch(self, path: Path, flags: int = 0) -> None:
+        wd = self._add_watch(path, flags)
+        if wd is not None:
+            self._paths[wd] = path
+
+    def _add_watch(self, path: Path, flags: int) -> int | None:
+        """
+        Watch the path and return the watch descriptor (the same for a path that is already watched), or None if the
+        path doesn't exist.
+        """
+        try:
+            return self.inotify.add_watch(path, CHANGE_MASK | IN_DONT_FOLLOW | flags)
+        except FileNotFoundError:
+            return None  # vanished in the meantime
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise RuntimeError(
+                    "Too many directories to watch - increase fs.inotify.max_user_watches (sysctl)"
+                ) from e
+            raise
+
+
+def _check(result: int) -> int:
+    if result < 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+    return result
@@ -1,7 +1,7 @@
 from collections.abc import Iterator
 from pathlib import Path
 
-from easyborg import ui
+from easyborg import locks, ui
 from easyborg.borg import Borg
 from easyborg.fzf import Fzf, SortOrder
 from easyborg.model import Config, ProgressEvent, Repository, Snapshot
@@ -26,6 +26,51 @@ def select_repo(fzf: Fzf, config: Config) -> Repository | None:
     return repo
 
 
+def await_lock(borg: Borg, fzf: Fzf, config: Config, repo: Repository) -> Repository | None:
+    """
+    Make sure the repository can be read: break a stale lock (if enabled), offer to read from a mirror with the same
+    snapshots instead of a locked repository, or wait for the lock. Returns the repository to read from, None if
+    aborted.
+
+    Only the locks of repositories on this host are known; Borg waits for the others (lock_wait).
+    """
+    if config.locks.break_stale and locks.break_stale_lock(borg, repo):
+        ui.warn(f"Removed stale lock of repository {repo.name}")
+
+    holders = locks.lock_holders(repo)
+    if not holders:
+        return repo
+
+    mirrors = [other for other in _mirrors(config, repo) if not locks.lock_holders(other)]
+    if mirrors:
+        choice = select_string(
+            fzf,
+            f"Repository {repo.name} is locked by {locks.describe(holders)}, read from: ",
+            [*(mirror.name for mirror in mirrors), f"{repo.name} (wait)"],
+        )
+        if choice is None:
+            return None
+        for mirror in mirrors:
+            if choice == mirror.name:
+                return mirror
+
+    lock_wait = repo.lock_wait if repo.lock_wait is not None else config.locks.wait
+    ui.spinner(lambda: locks.wait(repo, timeout=lock_wait), message="Waiting for lock")
+    return repo
+
+
+def _mirrors(config: Config, repo: Repository) -> list[Repository]:
+    """
+    Return the other repositories with copies of the repository's snapshots: its mirrors, or its primary and the
+    primary's other mirrors.
+    """
+    primary = config.repos.get(repo.mirror_of) if repo.mirror_of else repo
+    if primary is None:
+        return []
+    group = [primary, *(other for other in config.repos.values() if other.mirror_of == primary.name)]
+    return [other for other in group if other.name != repo.name]
+
+
 def select_snapshot(borg: Borg, fzf: Fzf, repo: Repository) -> Snapshot | None:
     ui.info("Select snapshot")
 
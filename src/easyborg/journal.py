@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+import time
+from collections.abc import Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from easyborg.scan import DEFAULT_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# a directory modified this close to the scan may change again within the same timestamp tick, so it's not trusted
+RACY_NS = 2_000_000_000
+
+
+class ChangeJournal:
+    """
+    Directory index that lists all paths below the backup paths without re-reading unchanged directories.
+
+    Adding, removing or renaming an entry changes the modification time of its directory, so only directories whose
+    mtime or ctime changed since the last run are listed again. All other directories are taken over from the index
+    of the previous run. Files are never stat'ed here; Borg still stats every listed path, but it doesn't have to walk
+    the tree anymore.
+    """
+
+    def __init__(self, path: Path, *, workers: int = DEFAULT_WORKERS) -> None:
+        self.path = path
+        self.workers = workers
+
+    def collect(self, roots: Iterable[Path]) -> list[str]:
+        """
+        Return all paths below (and including) the roots and update the index.
+
+        The paths are sorted parent-first and depth-first (by path components, "a/b" before "a-b"): Borg restores the
+        mode and mtime of a directory once an item outside of it follows, so its children must come right after it.
+        """
+        previous = self._load()
+        index: dict[str, dict] = {}
+        paths: list[str] = []
+        relisted = 0
+        threshold = time.time_ns() - RACY_NS
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="journal") as executor:
+            pending: set[Future[tuple[str, dict, bool] | None]] = set()
+            for root in roots:
+                if root.is_dir():
+                    pending.add(executor.submit(_visit, str(root), previous.get(str(root)), threshold))
+                elif root.exists() or root.is_symlink():
+                    paths.append(str(root))
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if result is None:
+                        continue
+                    directory, entry, listed = result
+                    index[directory] = entry
+                    relisted += listed
+                    paths.append(directory)
+                    paths.extend(os.path.join(directory, name) for name in entry["files"])
+                    for name in entry["dirs"]:
+                        child = os.path.join(directory, name)
+                        pending.add(executor.submit(_visit, child, previous.get(child), threshold))
+
+        paths.sort(key=lambda path: path.split(os.sep))
+        logger.debug("Collected %d paths, listed %d of %d directories", len(paths), relisted, len(index))
+        self._save(index)
+        return paths
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8", errors="surrogateescape"))
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            logger.warning("Ignoring corrupt change journal '%s'", self.path)
+            return {}
+
+    def _save(self, index: dict[str, dict]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(index), encoding="utf-8", errors="surrogateescape")
+        os.replace(temp_path, self.path)
+
+
+def _visit(directory: str, cached: dict | None, threshold: int) -> tuple[str, dict, bool] | None:
+    """
+    Return the index entry for a directory and whether it had to be listed, or None if it vanished.
+    """
+    try:
+        stat = os.stat(directory, follow_symlinks=False)
+    except OSError as e:
+        logger.debug("Skipping directory '%s': %s", directory, e)
+        return None
+
+    if cached and cached["mtime"] == stat.st_mtime_ns and cached["ctime"] == stat.st_ctime_ns:
+        return directory, cached, False
+
+    files, dirs = [], []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                (dirs if entry.is_dir(follow_symlinks=False) else files).append(entry.name)
+    except OSError as e:
+        logger.debug("Could not list directory '%s': %s", directory, e)  # let Borg report it
+        return directory, {"mtime": None, "ctime": None, "files": [], "dirs": []}, True
+
+    racy = stat.st_mtime_ns >= threshold or stat.st_ctime_ns >= threshold
+    entry = {
+        "mtime": None if racy else stat.st_mtime_ns,
+        "ctime": None if racy else stat.st_ctime_ns,
+        "files": files,
+        "dirs": dirs,
+    }
+    return directory, entry, True
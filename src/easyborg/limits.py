@@ -0,0 +1,130 @@
+import logging
+import os
+import resource
+import shutil
+
+from easyborg.model import ResourceLimits
+
+logger = logging.getLogger(__name__)
+
+IONICE_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+
+RLIMITS = {
+    name.removeprefix("RLIMIT_").lower(): getattr(resource, name)
+    for name in dir(resource)
+    if name.startswith("RLIMIT_")
+}
+
+
+def validate(limits: ResourceLimits) -> None:
+    """
+    Raise RuntimeError if the limits can't be applied on this system.
+    """
+    if limits.ionice_class is not None and limits.ionice_class not in IONICE_CLASSES:
+        raise RuntimeError(
+            f"Unknown I/O scheduling class: {limits.ionice_class} (choose from {', '.join(IONICE_CLASSES)})"
+        )
+    for name in limits.rlimits or {}:
+        if name not in RLIMITS:
+            raise RuntimeError(f"Unknown resource limit: {name} (choose from {', '.join(sorted(RLIMITS))})")
+
+
+def command_prefix(limits: ResourceLimits | None) -> list[str]:
+    """
+    Return the command prefix that applies the limits to the process: prlimit (resource limits), nice, taskset (CPU
+    affinity) and ionice (I/O scheduling class) each run the next command with their limit applied.
+
+    The limits are applied by these commands instead of a preexec_fn, which isn't safe in a program with threads.
+    Limits whose command isn't available are ignored with a warning.
+    """
+    if not limits:
+        return []
+
+    prefix: list[str] = []
+
+    rlimits = [(name, _soft_limit(RLIMITS[name], value)[0]) for name, value in (limits.rlimits or {}).items()]
+    if rlimits and (prlimit := _which("prlimit", "resource limits")):
+        prefix.append(prlimit)
+        prefix.extend(f"--{name}={soft}:" for name, soft in rlimits)  # soft limit only
+
+    nice = _effective_nice(limits.nice)
+    if nice is not None and (nice_command := _which("nice", "nice level")):
+        increment = nice - os.getpriority(os.PRIO_PROCESS, 0)  # nice adds to the current level
+        prefix.extend([nice_command, "-n", str(increment)])
+
+    affinity = _effective_affinity(limits.cpu_affinity)
+    if affinity is not None and (taskset := _which("taskset", "CPU affinity")):
+        prefix.extend([taskset, "-c", ",".join(map(str, sorted(affinity)))])
+
+    if limits.ionice_class is not None and (ionice := _which("ionice", "I/O scheduling class")):
+        prefix.extend([ionice, "-c", str(IONICE_CLASSES[limits.ionice_class])])
+        if limits.ionice_level is not None and limits.ionice_class != "idle":
+            prefix.extend(["-n", str(limits.ionice_level)])
+
+    return prefix
+
+
+def describe(limits: ResourceLimits) -> list[tuple[str, str]]:
+    """
+    Return the effective limits as (name, value) rows.
+    """
+    rows = []
+    if limits.nice is not None:
+        nice = _effective_nice(limits.nice)
+        value = str(nice) if nice is not None else f"{limits.nice} (not permitted)"
+        rows.append(("Nice level", value if shutil.which("nice") else f"{value} (nice not available)"))
+    if limits.ionice_class is not None:
+        value = limits.ionice_class
+        if limits.ionice_level is not None and limits.ionice_class != "idle":
+            value += f", level {limits.ionice_level}"
+        rows.append(("I/O scheduling", value if shutil.which("ionice") else f"{value} (ionice not available)"))
+    if limits.cpu_affinity is not None:
+        affinity = _effective_affinity(limits.cpu_affinity)
+        value = ", ".join(map(str, sorted(affinity))) if affinity is not None else "not supported"
+        rows.append(("CPU affinity", value if shutil.which("taskset") else f"{value} (taskset not available)"))
+    if limits.upload_ratelimit is not None:
+        rows.append(("Upload rate limit", f"{limits.upload_ratelimit} KiB/s"))
+    for name, value in (limits.rlimits or {}).items():
+        soft, _ = _soft_limit(RLIMITS[name], value)
+        value = str(soft) if shutil.which("prlimit") else f"{soft} (prlimit not available)"
+        rows.append((f"Resource limit {name}", value))
+    return rows
+
+
+def _which(command: str, limit: str) -> str | None:
+    path = shutil.which(command)
+    if not path:
+        logger.warning("%s not available, ignoring %s", command, limit)
+    return path
+
+
+def _effective_nice(nice: int | None) -> int | None:
+    if nice is None:
+        return None
+    current = os.getpriority(os.PRIO_PROCESS, 0)
+    if nice < current and os.geteuid() != 0:
+        logger.warning("Not permitted to lower nice level from %d to %d, ignoring", current, nice)
+        return None
+    return nice
+
+
+def _effective_affinity(cpus: tuple[int, ...] | None) -> set[int] | None:
+    if cpus is None:
+        return None
+    if not hasattr(os, "sched_getaffinity"):
+        logger.warning("CPU affinity not supported on this system, ignoring")
+        return None
+    available = os.sched_getaffinity(0)
+    effective = set(cpus) & available
+    if not effective:
+        logger.warning("None of the CPUs %s are available, ignoring CPU affinity", cpus)
+        return None
+    return effective
+
+
+def _soft_limit(limit: int, value: int) -> tuple[int, int]:
+    # only the soft limit is lowered; the hard limit can't be raised again once lowered
+    _, hard = resource.getrlimit(limit)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    return value, hard
@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+
+from easyborg.borg import Borg
+from easyborg.model import ProgressEvent, Repository
+from easyborg.sharding import shard_repositories
+from easyborg.util import format_duration
+
+logger = logging.getLogger(__name__)
+
+ROSTER = "lock.roster"  # Borg's list of the processes holding a lock of the repository
+POLL_INTERVAL = 1.0  # seconds between checks while waiting for a lock
+
+
+@dataclass(frozen=True, slots=True)
+class LockHolder:
+    host: str  # Borg's host id: <fqdn>@<node id>
+    pid: int
+    exclusive: bool
+
+    def __str__(self) -> str:
+        return f"{self.host.partition('@')[0]}/{self.pid}"
+
+    def is_local(self) -> bool:
+        return self.host == host_id()
+
+    def is_stale(self) -> bool:
+        """
+        Return True if the holder ran on this host and its process no longer exists.
+        """
+        return self.is_local() and not _process_exists(self.pid)
+
+
+@cache
+def host_id() -> str:
+    """
+    Return the id Borg uses for this host in its locks.
+    """
+    if os.environ.get("BORG_HOST_ID"):
+        return os.environ["BORG_HOST_ID"]
+    fqdn = socket.getfqdn()
+    if fqdn in ("localhost.localdomain", "localhost"):
+        fqdn = socket.gethostname()
+    return f"{fqdn}@{uuid.getnode()}"
+
+
+def local_path(repo: Repository) -> Path | None:
+    """
+    Return the path of the repository if it's on this host (or a mounted filesystem), None for remote repositories.
+    """
+    url = repo.url
+    if url.startswith("file://"):
+        return Path(url.removeprefix("file://"))
+    if "://" in url or ":" in url.partition("/")[0]:  # ssh://host/path or host:path
+        return None
+    return Path(url).expanduser()
+
+
+def lock_holders(repo: Repository) -> list[LockHolder] | None:
+    """
+    Return the processes holding a lock of the repository (of any shard), or None if that's unknown because the
+    repository is remote.
+    """
+    if repo.shards:
+        holders = [lock_holders(shard) for shard in shard_repositories(repo)]
+        return None if None in holders else [holder for part in holders for holder in part]
+
+    path = local_path(repo)
+    if path is None:
+        return None
+    try:
+        roster = json.loads((path / ROSTER).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        logger.debug("Could not read lock roster of repository '%s': %s", repo.url, e)
+        return []
+    return [
+        LockHolder(host, pid, kind == "exclusive")
+        for kind in ("exclusive", "shared")
+        for host, pid, _thread in roster.get(kind, [])
+    ]
+
+
+def describe(holders: Iterable[LockHolder]) -> str:
+    return ", ".join(sorted({str(holder) for holder in holders}))
+
+
+def break_stale_lock(borg: Borg, repo: Repository) -> bool:
+    """
+    Break the lock of the repository (of each shard) if all its holders ran on this host and no longer exist, e.g.
+    after a crash or a power loss. Returns True if a lock was broken.
+    """
+    broken = False
+    for part in shard_repositories(repo) if repo.shards else [repo]:
+        holders = lock_holders(part)
+        if holders and all(holder.is_stale() for holder in holders):
+            logger.warning("Breaking stale lock of repository '%s' held by %s", part.url, describe(holders))
+            borg.break_lock(part)
+            broken = True
+    return broken
+
+
+def wait(
+        repo: Repository,
+        *,
+        timeout: float | None = None,
+        interval: float = POLL_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+) -> Iterator[ProgressEvent]:
+    """
+    Wait until the repository is no longer locked (or the timeout in seconds elapsed), yielding who holds the lock
+    and for how long easyborg has been waiting.
+    """
+    started = clock()
+    while holders := lock_holders(repo):
+        elapsed = clock() - started
+        if timeout is not None and elapsed >= timeout:
+            return
+        yield ProgressEvent(message=f"Waiting for lock held by {describe(holders)} ({format_duration(elapsed)})")
+        sleep(interval)
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, but belongs to another user
+    return True
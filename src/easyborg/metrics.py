@@ -0,0 +1,99 @@
+import logging
+import os
+from collections.abc import Iterable
+from pathlib import Path
+
+from easyborg.history import Run, RunHistory
+from easyborg.model import Repository
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ("create", "mirror", "prune", "compact")
+
+# name, type, help
+_METRICS = (
+    ("easyborg_last_success_timestamp_seconds", "gauge", "Time the last snapshot was completed"),
+    ("easyborg_last_duration_seconds", "gauge", "Duration of the last successful run of the operation"),
+    ("easyborg_last_original_bytes", "gauge", "Size of the backup paths in the last snapshot"),
+    ("easyborg_last_compressed_bytes", "gauge", "Compressed size of the last snapshot"),
+    ("easyborg_last_deduplicated_bytes", "gauge", "Data the last snapshot added to the repository"),
+    ("easyborg_last_files", "gauge", "Number of files in the last snapshot"),
+    ("easyborg_failures_total", "counter", "Number of failed runs of the operation"),
+)
+
+
+class TextfileExporter:
+    """
+    Write Prometheus metrics of the recorded runs to a file for the node_exporter textfile collector.
+    """
+
+    def __init__(self, path: Path, history: RunHistory, *, profile: str) -> None:
+        self.path = path
+        self.history = history
+        self.profile = profile
+
+    def export(self, repos: Iterable[Repository]) -> None:
+        try:
+            text = render(self.history, repos, profile=self.profile)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(f".{self.path.name}.tmp")  # the collector only reads *.prom files
+            temp_path.write_text(text, encoding="utf-8")
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.warning("Could not write metrics to '%s': %s", self.path, e)  # never fail a backup for this
+
+
+def render(history: RunHistory, repos: Iterable[Repository], *, profile: str) -> str:
+    """
+    Return the metrics of the repositories in the Prometheus text format.
+    """
+    samples: dict[str, list[str]] = {name: [] for name, _, _ in _METRICS}
+
+    for repo in repos:
+        labels = {"profile": profile, "repository": repo.name}
+        last = {operation: history.last_success(repo.name, operation) for operation in OPERATIONS}
+
+        snapshot = _latest(last["create"], last["mirror"])
+        if snapshot:
+            samples["easyborg_last_success_timestamp_seconds"].append(
+                _sample(labels, snapshot.started + snapshot.duration)
+            )
+        for operation, run in last.items():
+            if run:
+                samples["easyborg_last_duration_seconds"].append(
+                    _sample(labels | {"operation": operation}, run.duration)
+                )
+        create = last["create"]
+        if create:
+            for name, value in (
+                    ("easyborg_last_original_bytes", create.original_size),
+                    ("easyborg_last_compressed_bytes", create.compressed_size),
+                    ("easyborg_last_deduplicated_bytes", create.deduplicated_size),
+                    ("easyborg_last_files", create.nfiles),
+            ):
+                if value is not None:
+                    samples[name].append(_sample(labels, value))
+        for operation in OPERATIONS:
+            failures = history.count(repo.name, operation, success=False)
+            samples["easyborg_failures_total"].append(_sample(labels | {"operation": operation}, failures))
+
+    lines = []
+    for name, kind, description in _METRICS:
+        if samples[name]:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{sample}" for sample in samples[name])
+    return "".join(line + "\n" for line in lines)
+
+
+def _latest(*runs: Run | None) -> Run | None:
+    return max((run for run in runs if run), key=lambda run: run.started, default=None)
+
+
+def _sample(labels: dict[str, str], value: float) -> str:
+    text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+    return f"{{{text}}} {value}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -27,6 +27,55 @@ class Snapshot:
             return f"{self.name}"
 
 
+@dataclass(frozen=True, slots=True)
+class ResourceLimits:
+    nice: int | None = None  # CPU scheduling priority of Borg processes (higher is nicer)
+    ionice_class: str | None = None  # I/O scheduling class: realtime, best-effort or idle
+    ionice_level: int | None = None  # I/O priority within the class (0 is highest, 7 lowest)
+    cpu_affinity: tuple[int, ...] | None = None  # CPUs Borg processes may run on
+    upload_ratelimit: int | None = None  # KiB/s sent to the repository
+    rlimits: Mapping[str, int] | None = None  # soft resource limits by name, e.g. {"as": 2147483648}
+
+
+@dataclass(frozen=True, slots=True)
+class ExclusionSettings:
+    patterns: tuple[str, ...] = ()  # Borg patterns, e.g. "sh:home/*/.cache" or "+ pp:home/me/keep"
+    exclude_caches: bool = False  # exclude directories containing a CACHEDIR.TAG
+    exclude_if_present: tuple[str, ...] = ()  # exclude directories containing one of these files
+    one_file_system: bool = False  # don't cross filesystem boundaries
+    gitignore: bool = False  # also exclude what .gitignore files below the backup paths ignore
+
+    def merge(self, other: ExclusionSettings) -> ExclusionSettings:
+        return ExclusionSettings(
+            patterns=self.patterns + other.patterns,
+            exclude_caches=self.exclude_caches or other.exclude_caches,
+            exclude_if_present=self.exclude_if_present + other.exclude_if_present,
+            one_file_system=self.one_file_system or other.one_file_system,
+            gitignore=self.gitignore or other.gitignore,
+        )
+
+    def enabled(self) -> bool:
+        return bool(
+            self.patterns or self.exclude_caches or self.exclude_if_present or self.one_file_system or self.gitignore
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class StreamSource:
+    command: tuple[str, ...]  # its output is archived as one file, e.g. ("pg_dumpall",)
+    name: str  # path of the file in the snapshot, e.g. "postgres/dump.sql"
+
+
+@dataclass(frozen=True, slots=True)
+class WatchdogSettings:
+    max_duration: float | None = None  # minutes a Borg process may run
+    stall_timeout: float | None = None  # minutes a Borg process may run without output (progress)
+    grace: float = 60.0  # seconds between SIGINT, SIGTERM and SIGKILL
+
+    def enabled(self) -> bool:
+        return self.max_duration is not None or self.stall_timeout is not None
+
+
 @dataclass(frozen=True, slots=True)
 class Repository:
     name: str
@@ -34,6 +83,80 @@ class Repository:
     type: RepositoryType
     compact_probability: float = 0.1  # TODO SH find a better place for defaults
     env: Mapping[str, str] | None = None
+    skip_unchanged: bool = False
+    max_skip_hours: float = 24.0
+    watch_min_interval: float | None = None  # minutes, overrides WatchSettings.min_interval
+    incremental: bool = False
+    limits: ResourceLimits = ResourceLimits()
+    files_cache: str | None = None  # Borg's --files-cache mode, detected for network filesystems if not set
+    files_cache_ttl: int | None = None  # BORG_FILES_CACHE_TTL
+    compression: str | None = None  # Borg's --compression, e.g. "zstd,3" (see easyborg tune)
+    chunker_params: str | None = None  # Borg's --chunker-params, e.g. "buzhash,19,23,21,4095"
+    exclusions: ExclusionSettings = ExclusionSettings()  # added to the global exclusions
+    mirror_of: str | None = None  # primary repository whose snapshots are copied here instead of reading the paths
+    shards: int = 0  # number of shard repositories below the url (<url>/shard-<n>) backed up concurrently
+    stream: StreamSource | None = None  # overrides the global stream source
+    checkpoint_interval: int | None = None  # seconds between checkpoints of interrupted snapshots (Borg: 1800)
+    watchdog: WatchdogSettings | None = None  # overrides the global watchdog settings
+    lock_wait: int | None = None  # seconds, overrides LockSettings.wait
+
+
+@dataclass(frozen=True, slots=True)
+class WatchSettings:
+    debounce: float = 30.0  # seconds without changes before a backup is triggered
+    max_latency: float = 300.0  # seconds after the first change when a backup is triggered at the latest
+    min_interval: float = 15.0  # minutes between two snapshots in the same repository
+
+
+@dataclass(frozen=True, slots=True)
+class ScheduleSettings:
+    interval: int = 60  # minutes between two scheduled backups
+    stagger: bool = False  # offset the schedule by a deterministic per-host amount
+    jitter: int = 0  # seconds of random delay before a scheduled backup
+    catch_up: bool = False  # run one backup after missed schedules (e.g. after sleep)
+    time_budget: float | None = None  # minutes per backup run, then Borg stops at a checkpoint until the next run
+
+
+@dataclass(frozen=True, slots=True)
+class GovernorSettings:
+    mode: str = "defer"  # defer (wait before starting), throttle (also slow down running Borg) or pause (also stop it)
+    max_load: float | None = None  # 1-minute load average
+    max_cpu_pressure: float | None = None  # percentage of time tasks waited for CPU in the last 10 seconds (PSI)
+    max_io_pressure: float | None = None  # percentage of time tasks waited for I/O in the last 10 seconds (PSI)
+    min_battery: int | None = None  # percent; below that, backups wait while running on battery
+    deadline: float = 240.0  # minutes after which the backup runs regardless
+    poll_interval: float = 10.0  # seconds between checks
+
+    def enabled(self) -> bool:
+        return any(
+            value is not None
+            for value in (self.max_load, self.max_cpu_pressure, self.max_io_pressure, self.min_battery)
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class CacheSettings:
+    managed: bool = False  # one Borg cache directory per repository, below easyborg's cache directory
+    presync: bool = False  # the daemon synchronizes the caches shortly before a scheduled backup
+
+
+@dataclass(frozen=True, slots=True)
+class MetricsSettings:
+    textfile: Path | None = None  # Prometheus metrics written here after each run (node_exporter textfile collector)
+
+
+@dataclass(frozen=True, slots=True)
+class LockSettings:
+    wait: int | None = None  # seconds Borg waits for a locked repository (Borg: 1)
+    break_stale: bool = False  # break locks whose holder process no longer exists on this host (opt-in)
+
+
+@dataclass(frozen=True, slots=True)
+class CheckSettings:
+    time_budget: float = 60.0  # minutes per check run, shared by all repositories
+    repository_share: float = 0.5  # part of a repository's budget for the partial repository check
+    verify_period: int = 30  # days in which the data of every snapshot is verified once
+    hour: int | None = None  # hour of the day after which the daemon (or check --if-due) runs the check
 
 
 @dataclass(frozen=True, slots=True)
@@ -41,6 +164,16 @@ class Config:
     backup_paths: list[Path]
     repos: Mapping[str, Repository]
     env: Mapping[str, str] | None = None
+    watch: WatchSettings = WatchSettings()
+    schedule: ScheduleSettings = ScheduleSettings()
+    governor: GovernorSettings = GovernorSettings()
+    cache: CacheSettings = CacheSettings()
+    exclusions: ExclusionSettings = ExclusionSettings()
+    stream: StreamSource | None = None  # archived in each backup repository next to the backup paths
+    metrics: MetricsSettings = MetricsSettings()
+    watchdog: WatchdogSettings = WatchdogSettings()
+    locks: LockSettings = LockSettings()
+    check: CheckSettings = CheckSettings()
 
 
 @dataclass(slots=True)
@@ -52,6 +185,8 @@ class Context:
     headless: bool
     config_dir: Path
     config_file: Path
+    state_dir: Path
+    cache_dir: Path
     test: bool
     tty: bool
     expert: bool
@@ -67,3 +202,4 @@ class ProgressEvent:
     total: float | None = None
     current: float | None = None
     message: str | None = None
+    remaining: float | None = None  # seconds, if known better than from the progress so far
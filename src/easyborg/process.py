@@ -1,13 +1,34 @@
+from __future__ import annotations
+
+import json
 import logging
 import os
 import shutil
+import signal
 import subprocess
-from collections.abc import Iterable, Iterator, Mapping
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
+from typing import IO
+
+from easyborg.limits import command_prefix
+from easyborg.model import ResourceLimits, WatchdogSettings
+from easyborg.util import format_size
 
 logger = logging.getLogger(__name__)
 
+_running: set[subprocess.Popen] = set()
+_watchdogs: set[_Watchdog] = set()
+_running_lock = threading.Lock()
+_usage_handlers: list[Callable[[ProcessUsage], None]] = []
+_default_tags: dict[str, str] = {}
+
+WATCHDOG_INTERVAL = 1.0  # seconds between checks of the watchdog
+
 
 class Output(Enum):
     STDOUT = "stdout"
@@ -24,6 +45,61 @@ class ProcessError(RuntimeError):
         super().__init__(msg)
 
 
+class ProducerError(ProcessError):
+    """
+    The process producing the input of another process failed (the other process may have read truncated input).
+    """
+
+
+class WatchdogError(ProcessError):
+    """
+    The watchdog stopped the process, because it ran too long or stopped making progress.
+    """
+
+    def __init__(self, return_code: int, reason: str, stderr: str | None = None):
+        self.reason = reason
+        super().__init__(return_code, f"{reason}{': ' + stderr if stderr else ''}")
+        self.stderr = stderr
+
+
+@dataclass(frozen=True, slots=True)
+class ProcessUsage:
+    """
+    Resources a finished process used, including its waited-for children.
+    """
+
+    command: tuple[str, ...]
+    tags: Mapping[str, str]  # e.g. profile and repository
+    return_code: int
+    wall_time: float  # seconds from start to exit
+    user_time: float  # seconds of CPU time in user mode
+    system_time: float  # seconds of CPU time in the kernel
+    max_rss: int  # bytes, peak resident set size
+    read_bytes: int | None = None  # bytes read from storage (Linux only, like the following)
+    write_bytes: int | None = None  # bytes written to storage
+    read_chars: int | None = None  # bytes read by system calls, including pipes and network
+    write_chars: int | None = None  # bytes written by system calls, including pipes and network
+
+
+def add_usage_handler(handler: Callable[[ProcessUsage], None]) -> None:
+    """
+    Call the handler with the resource usage of each process started by this module when it has exited.
+    """
+    _usage_handlers.append(handler)
+
+
+def remove_usage_handler(handler: Callable[[ProcessUsage], None]) -> None:
+    _usage_handlers.remove(handler)
+
+
+def set_default_tags(tags: Mapping[str, str]) -> None:
+    """
+    Set the tags of all resource usage records, e.g. the profile (tags given to run_async take precedence).
+    """
+    _default_tags.clear()
+    _default_tags.update(tags)
+
+
 def get_full_executable_path(executable_name: str) -> Path:
     try:
         return Path(shutil.which(executable_name))
@@ -47,25 +123,66 @@ def run_sync(
         *,
         cwd: str | None = None,
         input_lines: Iterable[str] | str | None = None,
+        input_delimiter: str = "\n",
         env: Mapping[str, str] | None = None,
+        limits: ResourceLimits | None = None,
+        stdin_command: list[str] | None = None,
+        tags: Mapping[str, str] | None = None,
+        watchdog: WatchdogSettings | None = None,
 ) -> list[str]:
     """
     Run the subprocess and return all output lines as a list.
     Raises ProcessError on failure.
     """
-    return list(run_async(cmd, cwd=cwd, input_lines=input_lines, env=env))
+    return list(
+        run_async(
+            cmd,
+            cwd=cwd,
+            input_lines=input_lines,
+            input_delimiter=input_delimiter,
+            env=env,
+            limits=limits,
+            stdin_command=stdin_command,
+            tags=tags,
+            watchdog=watchdog,
+        )
+    )
 
 
 def run_async(
         cmd: list[str],
         *,
         input_lines: Iterable[str] | None = None,
+        input_delimiter: str = "\n",
         cwd: str | None = None,
         output: Output = Output.STDOUT,
         env: Mapping[str, str] | None = None,
+        limits: ResourceLimits | None = None,
+        capture: list[str] | None = None,
+        stdin_command: list[str] | None = None,
+        tags: Mapping[str, str] | None = None,
+        watchdog: WatchdogSettings | None = None,
 ) -> Iterator[str]:
     """
     Run a subprocess and yield lines from either stdout or stderr.
+
+    If capture is given, the lines of the other stream are collected into it (read in a background thread).
+
+    If stdin_command is given, the output of that command is the input of the process. Both share a pipe, so each
+    waits for the other when it's full or empty. Raises ProducerError if the command fails, even if the process
+    succeeded.
+
+    Input lines are written in a background thread, each followed by the input delimiter, so large inputs can't
+    dead-lock with the process' output.
+
+    Resource limits (nice level, I/O scheduling class, CPU affinity, rlimits) are applied to the process when it is
+    spawned, so they are inherited by all of its children.
+
+    The resources each process used are logged and passed to the usage handlers, tagged with the given tags.
+
+    If watchdog settings are given, the process is stopped when it runs too long or doesn't output anything for too
+    long (on either stream): first with SIGINT (Borg writes a checkpoint), then with SIGTERM and SIGKILL. Raises
+    WatchdogError then.
     """
     logger.debug("Running %s with env %s", cmd, env)
 
@@ -73,30 +190,453 @@ def run_async(
         env = {}
     merged_env = os.environ.copy() | env
 
-    process = subprocess.Popen(
-        cmd,
-        cwd=cwd,
-        stdin=subprocess.PIPE if input_lines is not None else None,
+    assert input_lines is None or stdin_command is None
+
+    started = time.monotonic()
+    producer = None
+    if stdin_command is not None:
+        logger.debug("Running %s for input", stdin_command)
+        producer = subprocess.Popen(stdin_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    try:
+        process = subprocess.Popen(
+            [*command_prefix(limits), *cmd],
+            cwd=cwd,
+            stdin=producer.stdout if producer else subprocess.PIPE if input_lines is not None else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            env=merged_env,
+        )
+    except BaseException:
+        if producer:
+            producer.kill()
+            producer.wait()
+        raise
+
+    processes = [process]
+    errors: list[str] = []
+    if producer:
+        producer.stdout.close()  # only the process holds the read end now
+        processes.append(producer)
+        reader = threading.Thread(target=_capture_bytes, args=(producer.stderr, errors), name="producer-stderr")
+        reader.daemon = True
+        reader.start()
+    with _running_lock:
+        _running.update(processes)
+    guard = _Watchdog([process], watchdog, cmd) if watchdog and watchdog.enabled() else None
+
+    try:
+        yield from _read_output(
+            process, input_lines, input_delimiter, output, capture, _Accounting(cmd, started, tags), guard
+        )
+        if producer and _Accounting(stdin_command, started, tags).wait(producer) != 0:
+            reader.join()
+            raise ProducerError(producer.returncode, "".join(errors).strip())
+    except ProcessError as e:
+        if guard and guard.reason and not isinstance(e, ProducerError):
+            raise WatchdogError(e.return_code, guard.reason, e.stderr) from e
+        raise
+    finally:
+        if guard:
+            guard.stop()
+        if producer and producer.poll() is None:
+            producer.kill()  # the process failed or its output wasn't read to the end
+            producer.wait()
+        with _running_lock:
+            _running.difference_update(processes)
+
+
+def run_pipeline(
+        producer: list[str],
+        consumer: list[str],
+        *,
+        producer_env: Mapping[str, str] | None = None,
+        consumer_env: Mapping[str, str] | None = None,
+        producer_limits: ResourceLimits | None = None,
+        consumer_limits: ResourceLimits | None = None,
+        tags: Mapping[str, str] | None = None,
+        watchdog: WatchdogSettings | None = None,
+        log_json: bool = False,
+) -> None:
+    """
+    Run two subprocesses with the output of the producer as the input of the consumer.
+
+    The consumer reads directly from the producer's stdout (a pipe shared between the processes), so the data never
+    passes through this process. Raises ProcessError if either process fails, for the producer first: a consumer may
+    succeed on input that was cut short.
+
+    If watchdog settings are given, both processes are stopped when the pipeline runs too long or the consumer
+    doesn't output anything on stderr for too long (e.g. Borg progress), see run_async. Raises WatchdogError then.
+    With log_json, the consumer writes Borg JSON log lines (--log-json): only its log messages go into errors.
+    """
+    logger.debug("Running %s | %s", producer, consumer)
+
+    started = time.monotonic()
+    first = subprocess.Popen(
+        [*command_prefix(producer_limits), *producer],
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1,
-        env=merged_env,
+        env=os.environ.copy() | dict(producer_env or {}),
     )
+    try:
+        second = subprocess.Popen(
+            [*command_prefix(consumer_limits), *consumer],
+            stdin=first.stdout,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            env=os.environ.copy() | dict(consumer_env or {}),
+        )
+    except BaseException:
+        first.kill()
+        first.wait()
+        raise
+    first.stdout.close()  # only the consumer holds the read end now, so the producer sees it exit
+
+    with _running_lock:
+        _running.update((first, second))
+    guard = _Watchdog([second, first], watchdog, consumer) if watchdog and watchdog.enabled() else None
+    try:
+        errors: list[str] = []
+        reader = threading.Thread(
+            target=_capture_bytes, args=(first.stderr, errors), name="pipeline-stderr", daemon=True
+        )
+        reader.start()
+        if guard:
+            guard.start()
+        second_errors: list[str] = []
+        for raw_line in second.stderr:
+            if guard:
+                guard.activity()
+            line = os.fsdecode(raw_line).rstrip("\n")
+            message = _log_message(line) if log_json else line
+            if message is not None:
+                second_errors.append(message)
+        second_code = _Accounting(consumer, started, tags).wait(second)
+        killed = second_code != 0 and first.poll() is None
+        if killed:
+            first.kill()  # nobody reads its output anymore
+        first_code = _Accounting(producer, started, tags).wait(first)
+        reader.join()
+    finally:
+        if guard:
+            guard.stop()
+        with _running_lock:
+            _running.difference_update((first, second))
+
+    if guard and guard.reason and (first_code != 0 or second_code != 0):
+        raise WatchdogError(second_code or first_code, guard.reason, "\n".join(second_errors).strip())
+    if first_code != 0 and not killed:
+        raise ProcessError(first_code, "".join(errors).strip())
+    if second_code != 0:
+        raise ProcessError(second_code, "\n".join(second_errors).strip())
+
+
+def running_processes() -> list[subprocess.Popen]:
+    """
+    Return the processes started by run_async that haven't finished yet.
+    """
+    with _running_lock:
+        return list(_running)
+
 
+def pause_processes() -> None:
+    """
+    Stop the running processes (SIGSTOP) until resume_processes is called. Their watchdogs don't count the time
+    they are stopped, neither as running time nor as time without progress.
+    """
+    with _running_lock:
+        processes, watchdogs = list(_running), list(_watchdogs)
+    for watchdog in watchdogs:
+        watchdog.pause()
+    _signal_all(processes, signal.SIGSTOP)
+
+
+def resume_processes() -> None:
+    """
+    Continue the running processes (SIGCONT) after pause_processes.
+    """
+    with _running_lock:
+        processes, watchdogs = list(_running), list(_watchdogs)
+    _signal_all(processes, signal.SIGCONT)
+    for watchdog in watchdogs:
+        watchdog.resume()
+
+
+def _signal_all(processes: Iterable[subprocess.Popen], signum: int) -> None:
+    for process in processes:
+        try:
+            process.send_signal(signum)
+        except ProcessLookupError:
+            pass
+
+
+def _read_output(
+        process: subprocess.Popen,
+        input_lines: Iterable[str] | None,
+        input_delimiter: str,
+        output: Output,
+        capture: list[str] | None,
+        accounting: _Accounting,
+        watchdog: _Watchdog | None = None,
+) -> Iterator[str]:
     if input_lines is not None:
         assert process.stdin is not None
-        for line in input_lines:
-            process.stdin.write(line + "\n")
-        process.stdin.close()
+        writer = threading.Thread(
+            target=_write_input,
+            args=(process, input_lines, input_delimiter),
+            name="process-input",
+            daemon=True,
+        )
+        writer.start()
 
     stream = process.stdout if output == Output.STDOUT else process.stderr
     assert stream is not None
 
+    activity = watchdog.activity if watchdog else None
+    capturer = None
+    if capture is not None:
+        other = process.stderr if output == Output.STDOUT else process.stdout
+        capturer = threading.Thread(
+            target=_capture, args=(other, capture, activity), name="process-capture", daemon=True
+        )
+        capturer.start()
+
+    if watchdog:
+        watchdog.start()
     for line in stream:
+        if activity:
+            activity()
         yield line.rstrip("\n")
 
-    return_code = process.wait()
+    if capturer:
+        capturer.join()
+    return_code = accounting.wait(process)
     if return_code != 0:
-        stderr = process.stderr.read().strip() if process.stderr else None
+        if capture is not None and output == Output.STDOUT:
+            stderr = "\n".join(capture).strip()  # already read by the capture thread
+        else:
+            stderr = process.stderr.read().strip() if process.stderr else None
         raise ProcessError(return_code, stderr)
+
+
+class _Watchdog:
+    """
+    Stop processes that run too long or stop making progress, escalating from SIGINT to SIGTERM to SIGKILL.
+    """
+
+    def __init__(
+            self,
+            processes: Sequence[subprocess.Popen],
+            settings: WatchdogSettings,
+            command: list[str],
+            *,
+            clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.processes = processes
+        self.settings = settings
+        self.description = _describe(tuple(command))
+        self.clock = clock
+        self.started = self.last_activity = clock()
+        self.reason: str | None = None  # why the process was stopped
+        self._paused_at: float | None = None  # while the processes are stopped on purpose (pause_processes)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._watch, name="process-watchdog", daemon=True)
+
+    def start(self) -> None:
+        with _running_lock:
+            _watchdogs.add(self)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        with _running_lock:
+            _watchdogs.discard(self)
+
+    def activity(self) -> None:
+        self.last_activity = self.clock()
+
+    def pause(self) -> None:
+        with self._lock:
+            if self._paused_at is None:
+                self._paused_at = self.clock()
+
+    def resume(self) -> None:
+        """
+        Continue watching, leaving out the time the processes were paused.
+        """
+        with self._lock:
+            if self._paused_at is not None:
+                paused = self.clock() - self._paused_at
+                self.started += paused
+                self.last_activity += paused
+                self._paused_at = None
+
+    def expired(self) -> str | None:
+        """
+        Return why the process has to be stopped, or None.
+        """
+        with self._lock:
+            if self._paused_at is not None:
+                return None
+            now = self.clock()
+            max_duration, stall_timeout = self.settings.max_duration, self.settings.stall_timeout
+            if max_duration is not None and now - self.started > max_duration * 60:
+                return f"Stopped by watchdog after running for more than {max_duration:g} minutes"
+            if stall_timeout is not None and now - self.last_activity > stall_timeout * 60:
+                return f"Stopped by watchdog after no progress for {stall_timeout:g} minutes"
+            return None
+
+    def _watch(self) -> None:
+        timeouts = [t * 60 for t in (self.settings.max_duration, self.settings.stall_timeout) if t is not None]
+        interval = min([WATCHDOG_INTERVAL, *(t / 4 for t in timeouts)])
+        while not self._stopped.wait(interval):
+            self.reason = self.expired()
+            if self.reason:
+                self._escalate()
+                return
+
+    def _escalate(self) -> None:
+        for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGKILL):
+            running = [process for process in self.processes if process.poll() is None]
+            if not running:
+                return
+            logger.warning("%s: %s, sending %s", self.description, self.reason, sig.name)
+            for process in running:
+                process.send_signal(sig)
+            if self._stopped.wait(self.settings.grace):
+                return  # the processes exited and were waited for
+
+
+class _Accounting:
+    """
+    Wait for a process and report the resources it used.
+    """
+
+    def __init__(self, command: list[str], started: float, tags: Mapping[str, str] | None) -> None:
+        self.command = tuple(command)
+        self.started = started
+        self.tags = _default_tags | dict(tags or {})
+
+    def wait(self, process: subprocess.Popen) -> int:
+        """
+        Wait for the process to exit and reap it with wait4 to get its resource usage.
+
+        Only reaps the process if it wasn't waited for yet. If poll() in another thread (e.g. the watchdog) reaps it
+        first, the return code comes from Popen and no usage is reported.
+        """
+        if not hasattr(os, "wait4") or process.returncode is not None:
+            return process.wait()
+        try:
+            if hasattr(os, "waitid"):
+                os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)  # exited, but not reaped yet
+            io = _read_io(process.pid)
+            if process.returncode is not None:
+                return process.returncode
+            _, status, rusage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            return process.wait()  # reaped elsewhere, e.g. by poll() or with SIGCHLD ignored
+        process.returncode = os.waitstatus_to_exitcode(status)  # what Popen.wait would have set
+
+        usage = ProcessUsage(
+            command=self.command,
+            tags=self.tags,
+            return_code=process.returncode,
+            wall_time=time.monotonic() - self.started,
+            user_time=rusage.ru_utime,
+            system_time=rusage.ru_stime,
+            max_rss=rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024),  # Linux reports KiB
+            read_bytes=io.get("read_bytes"),
+            write_bytes=io.get("write_bytes"),
+            read_chars=io.get("rchar"),
+            write_chars=io.get("wchar"),
+        )
+        _report(usage)
+        return process.returncode
+
+
+def _read_io(pid: int) -> dict[str, int]:
+    """
+    Return the I/O counters of the process from /proc (empty if not available, e.g. on macOS).
+    """
+    try:
+        with open(f"/proc/{pid}/io", encoding="ascii") as f:
+            return {key: int(value) for key, _, value in (line.partition(":") for line in f) if value.strip()}
+    except (OSError, ValueError):
+        return {}
+
+
+def _report(usage: ProcessUsage) -> None:
+    logger.info(
+        "%s (%s): exit code %d, %.1fs, CPU %.1fs user, %.1fs system, max RSS %s, read %s, written %s",
+        _describe(usage.command),
+        ", ".join(f"{key}={value}" for key, value in usage.tags.items()),
+        usage.return_code,
+        usage.wall_time,
+        usage.user_time,
+        usage.system_time,
+        format_size(usage.max_rss),
+        format_size(usage.read_chars) if usage.read_chars is not None else "?",
+        format_size(usage.write_chars) if usage.write_chars is not None else "?",
+    )
+    for handler in list(_usage_handlers):
+        try:
+            handler(usage)
+        except Exception:
+            logger.exception("Resource usage handler failed")  # never fail a process for this
+
+
+def _describe(command: tuple[str, ...]) -> str:
+    """
+    Return the executable and its subcommand, e.g. "borg create".
+    """
+    if not command:
+        return "?"
+    subcommand = next((arg for arg in command[1:] if not arg.startswith("-")), None)
+    name = os.path.basename(command[0])
+    return f"{name} {subcommand}" if subcommand and name == "borg" else name
+
+
+def _log_message(line: str) -> str | None:
+    """
+    Return the message of a Borg JSON log line, None for other JSON lines (e.g. progress). Other lines are returned
+    as they are.
+    """
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return line
+    if not isinstance(event, dict):
+        return line
+    return event.get("message") if event.get("type") == "log_message" else None
+
+
+def _capture(stream: IO[str], lines: list[str], activity: Callable[[], None] | None = None) -> None:
+    for line in stream:
+        if activity:
+            activity()
+        lines.append(line.rstrip("\n"))
+
+
+def _capture_bytes(stream: IO[bytes], lines: list[str]) -> None:
+    lines.append(os.fsdecode(stream.read()))
+
+
+def _write_input(process: subprocess.Popen, lines: Iterable[str], delimiter: str) -> None:
+    try:
+        for line in lines:
+            # write bytes, so lines may contain file names that aren't valid UTF-8 (surrogate escapes)
+            process.stdin.buffer.write(os.fsencode(line + delimiter))
+    except BrokenPipeError:
+        logger.debug("Process closed its input early")
+    except Exception:
+        # incomplete input must not look like complete input to the process
+        logger.exception("Could not produce process input, killing process")
+        process.kill()
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
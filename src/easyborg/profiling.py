@@ -0,0 +1,187 @@
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import TypeVar
+
+from easyborg import process
+from easyborg.process import ProcessUsage
+from easyborg.util import format_duration, format_size
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 15
+
+_active: "RunProfiler | None" = None
+
+
+@dataclass(frozen=True, slots=True)
+class Span:
+    name: str
+    start: float  # seconds since the profiler was started
+    duration: float | None  # None for points in time
+    thread: str
+
+
+class RunProfiler:
+    """
+    Profile easyborg itself during one run: Python CPU time by function (cProfile, main thread only), memory
+    allocations (tracemalloc), the phases of the run and the subprocesses it waited for.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.spans: list[Span] = []
+        self.processes: list[ProcessUsage] = []
+        self._profile = cProfile.Profile()
+        self._started = 0.0
+        self._wall_time = 0.0
+        self._memory: tracemalloc.Snapshot | None = None
+        self._peak_memory = 0
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        tracemalloc.start()
+        process.add_usage_handler(self._add_process)
+        self._profile.enable()
+
+    def stop(self) -> None:
+        self._profile.disable()
+        process.remove_usage_handler(self._add_process)
+        self._wall_time = time.perf_counter() - self._started
+        self._memory = tracemalloc.take_snapshot()
+        self._peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def add(self, name: str, start: float, duration: float | None) -> None:
+        with self._lock:
+            self.spans.append(Span(name, start, duration, threading.current_thread().name))
+
+    def write(self, directory: Path) -> tuple[Path, Path]:
+        """
+        Write the report and the cProfile statistics (for pstats, snakeviz etc.) to the directory.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = f"profile-{datetime.now().strftime('%Y-%m-%d-%H%M%S')}-{self.name}"
+        stats_path = directory / f"{stem}.pstats"
+        report_path = directory / f"{stem}.txt"
+        self._profile.dump_stats(stats_path)
+        report_path.write_text(self.report(), encoding="utf-8")
+        return report_path, stats_path
+
+    def report(self) -> str:
+        lines = [f"easyborg {self.name}: {format_duration(self._wall_time)} ({self._wall_time:.3f}s)", ""]
+
+        lines.append("Phases (start, duration):")
+        for span in sorted(self.spans, key=lambda span: span.start):
+            duration = f"{span.duration:9.3f}s" if span.duration is not None else " " * 10
+            thread = f" [{span.thread}]" if span.thread != "MainThread" else ""
+            lines.append(f"  {span.start:9.3f}s {duration}  {span.name}{thread}")
+        lines.append("")
+
+        lines.append("Subprocesses (wall, user CPU, system CPU, max RSS):")
+        for usage in self.processes:
+            lines.append(
+                f"  {usage.wall_time:9.3f}s {usage.user_time:9.3f}s {usage.system_time:9.3f}s "
+                f"{format_size(usage.max_rss):>10}  {' '.join(usage.command[:2])}"
+            )
+        child_time = sum(usage.wall_time for usage in self.processes)
+        lines.append(f"  {child_time:9.3f}s waited for subprocesses in total (may overlap)")
+        lines.append("")
+
+        lines.append(f"Python CPU time by function (main thread, top {TOP_FUNCTIONS} by cumulative time):")
+        buffer = io.StringIO()
+        pstats.Stats(self._profile, stream=buffer).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        lines.extend("  " + line for line in buffer.getvalue().strip().splitlines())
+        lines.append("")
+
+        lines.append(f"Python memory: peak {format_size(self._peak_memory)} (top {TOP_ALLOCATIONS} still allocated):")
+        if self._memory:
+            for statistic in self._memory.statistics("lineno")[:TOP_ALLOCATIONS]:
+                lines.append(f"  {format_size(statistic.size):>10} {statistic.count:>8} blocks  {statistic.traceback}")
+
+        return "".join(line + "\n" for line in lines)
+
+    def _add_process(self, usage: ProcessUsage) -> None:
+        with self._lock:
+            self.processes.append(usage)
+
+
+def start(name: str) -> RunProfiler:
+    """
+    Start profiling the run; spans and marks are recorded from now on.
+    """
+    global _active
+    _active = RunProfiler(name)
+    _active.start()
+    return _active
+
+
+def finish(directory: Path) -> tuple[Path, Path] | None:
+    """
+    Stop profiling and write the report and statistics to the directory. Returns None if profiling wasn't started.
+    """
+    global _active
+    profiler, _active = _active, None
+    if profiler is None:
+        return None
+    profiler.stop()
+    return profiler.write(directory)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Record how long the block takes as a phase of the run (does nothing unless profiling).
+    """
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    start = profiler.elapsed()
+    try:
+        yield
+    finally:
+        profiler.add(name, start, profiler.elapsed() - start)
+
+
+def mark(name: str) -> None:
+    """
+    Record a point in time of the run (does nothing unless profiling).
+    """
+    if _active is not None:
+        _active.add(name, _active.elapsed(), None)
+
+
+def traced(items: Iterable[T], name: str) -> Iterable[T]:
+    """
+    Mark when the first and the last item are taken from the items (returns them unchanged unless profiling).
+    """
+    if _active is None:
+        return items
+    return _traced(items, name)
+
+
+def _traced(items: Iterable[T], name: str) -> Iterator[T]:
+    count = 0
+    for item in items:
+        if not count:
+            mark(f"{name}: first item")
+        count += 1
+        yield item
+    mark(f"{name}: last item ({count} items)")
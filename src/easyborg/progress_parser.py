@@ -8,7 +8,7 @@ CRITICAL_LEVELS = ["WARNING", "ERROR", "CRITICAL"]
 
 def parse_progress(lines: Iterator[str]) -> Generator[ProgressEvent, None, None]:
     """
-    Transform Borg extract JSON progress lines into progress events.
+    Transform Borg JSON progress lines into progress events.
     """
     for line in lines:
         try:
@@ -25,6 +25,8 @@ def parse_progress(lines: Iterator[str]) -> Generator[ProgressEvent, None, None]
 
         total = event.get("total")
         current = event.get("current")
+        if event_type == "archive_progress":
+            current = event.get("original_size")  # borg create has no total, bytes read so far
         message = event.get("message")
 
         if not message:
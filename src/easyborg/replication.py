@@ -0,0 +1,30 @@
+from collections.abc import Iterable
+
+from easyborg.borg import PARTIAL_SUFFIX
+from easyborg.model import Snapshot
+
+
+def pending(source: Iterable[Snapshot], target: Iterable[Snapshot]) -> list[Snapshot]:
+    """
+    Return the source snapshots a mirror still needs: those newer than its latest snapshot.
+
+    Older snapshots missing in the mirror were pruned there (both sides use the same retention rules), so they
+    aren't copied again. Partial snapshots of interrupted transfers don't count.
+    """
+    names = [snap.name for snap in target if not snap.name.endswith(PARTIAL_SUFFIX)]
+    latest = max(names, default="")
+    return sorted(
+        (snap for snap in source if snap.name > latest and not snap.name.endswith(PARTIAL_SUFFIX)),
+        key=lambda snap: snap.name,
+    )
+
+
+def missing(source: Iterable[Snapshot], target: Iterable[Snapshot]) -> list[Snapshot]:
+    """
+    Return the source snapshots that don't exist in the target, oldest first.
+    """
+    names = {snap.name for snap in target}
+    return sorted(
+        (snap for snap in source if snap.name not in names and not snap.name.endswith(PARTIAL_SUFFIX)),
+        key=lambda snap: snap.name,
+    )
@@ -0,0 +1,67 @@
+import logging
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)  # scanning is I/O bound, so use more threads than cores
+
+
+@dataclass(frozen=True, slots=True)
+class ScannedDirectory:
+    path: Path
+    stat: os.stat_result
+    files: list[tuple[str, os.stat_result | None]]  # stat is None if stat_files=False
+    directories: list[str]
+
+
+def scan(
+        roots: Iterable[Path],
+        *,
+        stat_files: bool = True,
+        workers: int = DEFAULT_WORKERS,
+) -> Iterator[ScannedDirectory]:
+    """
+    Walk the directory trees below the given roots in parallel and yield one result per directory.
+
+    Results are yielded in completion order, not in tree order. Symbolic links are never followed (same as Borg).
+    Directories that vanish or can't be read during the scan are skipped.
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan") as executor:
+        pending: set[Future[ScannedDirectory | None]] = {
+            executor.submit(_scan_directory, root, stat_files) for root in roots if root.is_dir()
+        }
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result is None:
+                    continue
+                for name in result.directories:
+                    pending.add(executor.submit(_scan_directory, result.path / name, stat_files))
+                yield result
+
+
+def _scan_directory(path: Path, stat_files: bool) -> ScannedDirectory | None:
+    files: list[tuple[str, os.stat_result | None]] = []
+    directories: list[str] = []
+    try:
+        stat = os.stat(path, follow_symlinks=False)
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.name)
+                elif not stat_files:
+                    files.append((entry.name, None))
+                else:
+                    try:
+                        files.append((entry.name, entry.stat(follow_symlinks=False)))
+                    except FileNotFoundError:
+                        continue  # file vanished during the scan
+    except OSError as e:
+        logger.debug("Skipping directory '%s' during scan: %s", path, e)
+        return None
+    return ScannedDirectory(path=path, stat=stat, files=files, directories=directories)
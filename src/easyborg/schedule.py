@@ -0,0 +1,114 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import socket
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+
+# cron entry used for catch-up: checks regularly whether a backup is due
+CATCH_UP_CRON_EXPRESSION = "*/5 * * * *"
+
+
+def host_offset(profile: str, interval: int, *, hostname: str | None = None) -> int:
+    """
+    Return a deterministic offset in minutes (0 <= offset < interval) for this host and profile.
+
+    Spreads the backups of many machines sharing one repository server evenly over the interval.
+    """
+    hostname = hostname or socket.gethostname()
+    digest = hashlib.sha256(f"{hostname}:{profile}".encode()).digest()
+    return int.from_bytes(digest[:8], "big") % interval
+
+
+def cron_expression(interval: int, offset: int) -> str:
+    """
+    Return a cron expression that fires every interval minutes, offset by offset minutes.
+    """
+    _assert_interval_valid(interval)
+    if interval <= 60:
+        minutes = ",".join(str(m) for m in range(offset % interval, 60, interval))
+        return f"{minutes} * * * *"
+    hours = ",".join(str(h) for h in range(offset // 60, 24, interval // 60))
+    return f"{offset % 60} {hours} * * *"
+
+
+def latest_slot(now: datetime, interval: int, offset: int) -> datetime:
+    """
+    Return the most recent scheduled time at or before now (local time, like cron).
+    """
+    _assert_interval_valid(interval)
+    now = now.astimezone()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    minutes = (now - midnight) // timedelta(minutes=1)
+    slot = (minutes - offset) // interval * interval + offset
+    return midnight + timedelta(minutes=slot)
+
+
+def next_slot(now: datetime, interval: int, offset: int) -> datetime:
+    """
+    Return the next scheduled time after now.
+    """
+    return latest_slot(now, interval, offset) + timedelta(minutes=interval)
+
+
+def is_due(last_run: datetime | None, now: datetime, interval: int, offset: int) -> bool:
+    """
+    Return True if a scheduled time passed since the last run.
+
+    Multiple missed times (e.g. while the machine was asleep) result in a single run.
+    """
+    return last_run is None or last_run < latest_slot(now, interval, offset)
+
+
+class ScheduleState:
+    """
+    Remember when the last scheduled backup was started.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def last_run(self) -> datetime | None:
+        try:
+            return datetime.fromisoformat(json.loads(self.path.read_text(encoding="utf-8"))["last_run"])
+        except (FileNotFoundError, KeyError, ValueError):
+            return None
+
+    def record_run(self, when: datetime) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps({"last_run": when.astimezone().isoformat()}), encoding="utf-8")
+        os.replace(temp_path, self.path)
+
+
+@contextmanager
+def exclusive_run(lock_file: Path) -> Iterator[bool]:
+    """
+    Try to acquire an exclusive lock for a scheduled run; yields False if another run holds it.
+    """
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    with lock_file.open("w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _assert_interval_valid(interval: int) -> None:
+    if interval <= 0 or (60 % interval and (interval % 60 or MINUTES_PER_DAY % interval)):
+        raise RuntimeError(
+            f"Unsupported schedule interval: {interval} minutes (must divide 60 or be whole hours dividing 24)"
+        )
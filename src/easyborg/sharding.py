@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import replace
+from pathlib import Path
+
+from easyborg.model import Repository
+from easyborg.scan import scan
+
+logger = logging.getLogger(__name__)
+
+
+def shard_repositories(repo: Repository) -> list[Repository]:
+    """
+    Return the repositories of the shards of a sharded repository: <url>/shard-<n>, named <name>-<n>.
+    """
+    return [
+        replace(repo, name=f"{repo.name}-{n}", url=f"{repo.url.rstrip('/')}/shard-{n}", shards=0)
+        for n in range(1, repo.shards + 1)
+    ]
+
+
+def with_shards(repos: Mapping[str, Repository]) -> dict[str, Repository]:
+    """
+    Return the repositories plus the shard repositories of the sharded ones.
+    """
+    result = dict(repos)
+    for repo in repos.values():
+        if repo.shards:
+            result.update((shard.name, shard) for shard in shard_repositories(repo))
+    return result
+
+
+def units(backup_paths: Iterable[Path]) -> list[Path]:
+    """
+    Split the backup paths into the units distributed over the shards: the entries directly below each backup path
+    (the path itself if it's a file or an empty directory).
+    """
+    result = []
+    for path in backup_paths:
+        try:
+            with os.scandir(path) as entries:
+                children = sorted(Path(entry.path) for entry in entries)
+        except NotADirectoryError:
+            children = []
+        result.extend(children or [path])
+    return result
+
+
+def unit_size(path: Path) -> int:
+    if not path.is_dir():
+        try:
+            return os.stat(path, follow_symlinks=False).st_size
+        except OSError:
+            return 0
+    return sum(stat.st_size for directory in scan([path]) for _, stat in directory.files if stat)
+
+
+def balance(
+        sizes: Mapping[str, int],
+        count: int,
+        *,
+        assignment: Mapping[str, int] | None = None,
+        loads: Sequence[int] | None = None,
+) -> dict[str, int]:
+    """
+    Assign units to shards so the shards are about the same size (largest unit first to the smallest shard).
+
+    Units of an existing assignment stay in their shard (moving a unit means uploading it again), loads are the
+    current sizes of the shards.
+    """
+    result = {unit: shard for unit, shard in (assignment or {}).items() if unit in sizes and shard < count}
+    current = list(loads or [])[:count]
+    current.extend([0] * (count - len(current)))
+    for unit in sorted((unit for unit in sizes if unit not in result), key=lambda unit: (-sizes[unit], unit)):
+        shard = min(range(count), key=lambda n: current[n])
+        result[unit] = shard
+        current[shard] += sizes[unit]
+    return result
+
+
+class ShardAssignments:
+    """
+    Remember which shard each unit of the backup paths belongs to, and the size of each shard.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def assign(self, repo: Repository, backup_paths: Iterable[Path], *, dry_run: bool = False) -> list[list[Path]]:
+        """
+        Return the paths to back up in each shard. Only units that aren't assigned yet are measured. Dry runs don't
+        remember the assignment of new units.
+        """
+        entry = self._load().get(repo.name, {})
+        assignment = {unit: shard for unit, shard in entry.get("units", {}).items() if shard < repo.shards}
+        loads = list(entry.get("loads", []))[: repo.shards]
+        loads.extend([0] * (repo.shards - len(loads)))
+
+        current = [str(path) for path in units(backup_paths)]
+        new = [unit for unit in current if unit not in assignment]
+        sizes = {unit: 0 for unit in current} | {unit: unit_size(Path(unit)) for unit in new}
+
+        assignment = balance(sizes, repo.shards, assignment=assignment, loads=loads)
+        for unit in new:
+            loads[assignment[unit]] += sizes[unit]
+        if not dry_run:
+            self._save(repo.name, {"units": assignment, "loads": loads})
+
+        shards: list[list[Path]] = [[] for _ in range(repo.shards)]
+        for unit in current:
+            shards[assignment[unit]].append(Path(unit))
+        return shards
+
+    def update_loads(self, repo_name: str, loads: Sequence[int | None]) -> None:
+        """
+        Record the sizes of the shards after a snapshot (None keeps the recorded size).
+        """
+        entry = self._load().get(repo_name, {})
+        recorded = entry.get("loads", [])
+        recorded = recorded + [0] * (len(loads) - len(recorded))
+        entry["loads"] = [recorded[n] if load is None else load for n, load in enumerate(loads)]
+        self._save(repo_name, entry)
+
+    def _save(self, repo_name: str, entry: dict) -> None:
+        entries = self._load()
+        entries[repo_name] = entry
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(entries, indent=2), encoding="utf-8")
+        os.replace(temp_path, self.path)
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            logger.warning("Ignoring corrupt shard assignment file '%s'", self.path)
+            return {}
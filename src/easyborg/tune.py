@@ -0,0 +1,128 @@
+import logging
+import random
+import shutil
+import stat
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from easyborg.model import Repository
+from easyborg.scan import scan
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNKER_PARAMS = "buzhash,19,23,21,4095"
+
+COMPRESSION_CANDIDATES = ["lz4", "zstd,1", "zstd,3", "zstd,6", "zstd,10", "auto,zstd,3", "auto,zstd,6"]
+
+# smaller chunks find more duplicates in large files that change in place (VM images, databases), at the cost of a
+# larger chunk index
+CHUNKER_CANDIDATES = [DEFAULT_CHUNKER_PARAMS, "buzhash,16,23,18,4095", "buzhash,14,20,16,4095"]
+
+LOCAL_SPEED = 200_000_000  # bytes per second assumed for local repositories
+REMOTE_SPEED = 10_000_000  # bytes per second assumed for remote repositories
+
+EDIT_SIZE = 64  # bytes inserted into each file of the changed version of the sample
+BLOCK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True, slots=True)
+class Measurement:
+    compression: str
+    chunker_params: str
+    seconds: float
+    original_size: int
+    deduplicated_size: int
+    update_size: int = 0  # bytes stored for the changed version of the sample
+
+    def ratio(self) -> float:
+        return self.original_size / self.deduplicated_size if self.deduplicated_size else 1.0
+
+    def throughput(self) -> float:
+        return self.original_size / self.seconds if self.seconds else float("inf")
+
+
+def sample_files(paths: Iterable[Path], *, max_bytes: int, seed: int | None = None) -> list[Path]:
+    """
+    Return a random sample of regular files below the paths, with a total size of about max_bytes.
+
+    Every file has the same chance to be picked, so the sample has a similar mix of file types as the backup. Files
+    are picked in random order until the size is reached, so one huge file doesn't make up the entire sample.
+    """
+    files = []
+    for directory in scan(paths):
+        for name, file_stat in directory.files:
+            if file_stat and stat.S_ISREG(file_stat.st_mode) and file_stat.st_size:
+                files.append((directory.path / name, file_stat.st_size))
+
+    random.Random(seed).shuffle(files)
+
+    sample, total = [], 0
+    for path, size in files:
+        if total + size > max_bytes and sample:
+            continue
+        sample.append(path)
+        total += size
+        if total >= max_bytes:
+            break
+    return sorted(sample)
+
+
+def change_files(sample: Iterable[Path], directory: Path, *, seed: int | None = None) -> list[Path]:
+    """
+    Copy the files to the directory as the next version of the sample: a few bytes are inserted at a random position
+    of each file, which shifts the rest of its content. How much of it a snapshot of the copies stores on top of the
+    sample shows how well the chunker parameters deduplicate between versions.
+    """
+    rng = random.Random(seed)
+    changed = []
+    for index, path in enumerate(sample):
+        target = directory / f"{index}-{path.name}"
+        try:
+            with open(path, "rb") as source, open(target, "wb") as copy:
+                remaining = rng.randrange(path.stat().st_size + 1)
+                while remaining and (block := source.read(min(remaining, BLOCK_SIZE))):
+                    copy.write(block)
+                    remaining -= len(block)
+                copy.write(rng.randbytes(EDIT_SIZE))
+                shutil.copyfileobj(source, copy, BLOCK_SIZE)
+        except OSError as e:
+            logger.debug("Could not copy '%s': %s", path, e)
+            continue
+        changed.append(target)
+    return changed
+
+
+def warm_up(paths: Iterable[Path]) -> None:
+    """
+    Read the files once, so they come from the page cache when a candidate is timed. Otherwise only the first
+    candidate would read from disk and look slower than it is.
+    """
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                while f.read(BLOCK_SIZE):
+                    pass
+        except OSError as e:
+            logger.debug("Could not read '%s': %s", path, e)
+
+
+def upload_speed(repo: Repository, remote_speed: float = REMOTE_SPEED) -> float:
+    """
+    Return the bytes per second that can be sent to the repository.
+    """
+    if repo.limits.upload_ratelimit is not None:
+        return repo.limits.upload_ratelimit * 1024
+    return remote_speed if is_remote(repo) else LOCAL_SPEED
+
+
+def is_remote(repo: Repository) -> bool:
+    return "://" in repo.url or ":" in repo.url.split("/", 1)[0]
+
+
+def best(measurements: Iterable[Measurement], speed: float) -> Measurement:
+    """
+    Return the measurement with the shortest estimated backup time: compressing the data plus sending it and the
+    changes of its next version (Borg is single-threaded, so both hardly overlap).
+    """
+    return min(measurements, key=lambda m: m.seconds + (m.deduplicated_size + m.update_size) / speed)
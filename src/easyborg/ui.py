@@ -2,7 +2,9 @@ from __future__ import annotations
 
 import logging
 import sys
+import time
 from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Any, TypeVar
 
@@ -15,8 +17,11 @@ from rich.padding import Padding
 from rich.progress import BarColumn, Progress, SpinnerColumn, TextColumn, TimeRemainingColumn
 from rich.style import Style, StyleType
 from rich.table import Table
+from rich.text import Text
 from rich.theme import Theme
 
+from easyborg import profiling
+from easyborg.events import EventStream
 from easyborg.model import ProgressEvent
 from easyborg.theme import StyleId, SymbolId, theme
 
@@ -41,6 +46,10 @@ console_theme = Theme(
 
 console = Console(highlight=False, theme=console_theme, soft_wrap=True)
 
+_events: EventStream | None = None
+_scope: dict[str, Any] = {}
+_started = time.monotonic()
+
 
 # CONSOLE PLUS LOGGING
 
@@ -52,6 +61,7 @@ def info(msg: str, danger: bool = False) -> None:
     else:
         console.print(msg)
     logger.info(msg)
+    event("message", level="info", message=str(msg))
 
 
 def success(msg: str, secondary: str = None) -> None:
@@ -62,6 +72,7 @@ def success(msg: str, secondary: str = None) -> None:
     else:
         console.print(msg, style=STYLES[StyleId.SUCCESS])
         logger.info(f"✅ {msg}")
+    event("message", level="success", message=msg, details=secondary)
 
 
 def warn(msg: str, secondary: str = None) -> None:
@@ -72,6 +83,7 @@ def warn(msg: str, secondary: str = None) -> None:
     else:
         console.print(msg, style=STYLES[StyleId.WARNING])
         logger.info(f"⚠️ {msg}")
+    event("message", level="warning", message=msg, details=secondary)
 
 
 def error(msg: str, secondary: str = None) -> None:
@@ -83,6 +95,7 @@ def error(msg: str, secondary: str = None) -> None:
     else:
         console.print(msg, style=STYLES[StyleId.ERROR])
         logger.info(f"❌ {msg}")
+    event("message", level="error", message=msg, details=secondary)
 
 
 def exception(e: Exception) -> None:
@@ -136,34 +149,50 @@ def progress(func: Callable[[], Iterator[ProgressEvent]], *, message: str = "Pro
     Display live Rich progress for a function that returns progress events.
     """
     if not is_tty():
-        list(func())
+        list(_observe(func, message))
         return
 
     with Progress(
             BarColumn(bar_width=10),
-            TimeRemainingColumn(),
+            _RemainingColumn(),
             TextColumn("{task.description}"),
             console=console,
             transient=True,
     ) as p:
-        task_id = p.add_task(message, start=True)
-        for event in func():
-            # print(f"EVENT: {event}")
+        task_id = p.add_task(message, start=True, remaining=None)
+        for e in _observe(func, message):
+            # print(f"EVENT: {e}")
             p.update(
                 task_id,
-                total=event.total or None,
-                completed=event.current or None,
-                description=trim(event.message, console.size.width - 20) if event.message else None,
+                total=e.total or None,
+                completed=e.current or None,
+                description=trim(e.message, console.size.width - 20) if e.message else None,
+                remaining=e.remaining,
             )
         # print("COMPLETED")
 
 
+class _RemainingColumn(TimeRemainingColumn):
+    """
+    Time remaining as given by the progress events, or as estimated by Rich from the progress so far.
+    """
+
+    def render(self, task) -> Text:
+        remaining = task.fields.get("remaining")
+        if remaining is None or task.finished:
+            return super().render(task)
+        minutes, seconds = divmod(int(remaining), 60)
+        hours, minutes = divmod(minutes, 60)
+        formatted = f"{hours:d}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+        return Text(formatted, style="progress.remaining")
+
+
 def spinner(func: Callable[[], Iterator[ProgressEvent]], *, message: str = "Processing") -> None:
     """
     Display Rich spinner (indeterminate) for any operation.
     """
     if not is_tty():
-        list(func())
+        list(_observe(func, message))
         return
 
     with Progress(
@@ -173,8 +202,35 @@ def spinner(func: Callable[[], Iterator[ProgressEvent]], *, message: str = "Proc
             transient=True,
     ) as p:
         task_id = p.add_task(message, total=None)
-        for event in func():
-            p.update(task_id, description=trim(event.message, console.size.width - 2))
+        for e in _observe(func, message):
+            p.update(task_id, description=trim(e.message, console.size.width - 2))
+
+
+def _observe(func: Callable[[], Iterator[ProgressEvent]], stage: str) -> Iterator[ProgressEvent]:
+    """
+    Pass the progress events through, and emit the stage and its coalesced progress as events.
+    """
+    with profiling.span(stage):
+        yield from _emit_stage(func, stage)
+
+
+def _emit_stage(func: Callable[[], Iterator[ProgressEvent]], stage: str) -> Iterator[ProgressEvent]:
+    if _events is None:
+        yield from func()
+        return
+
+    started = time.monotonic()
+    event("stage_start", stage=stage)
+    try:
+        for e in func():
+            _events.progress(stage, e, **_scope)
+            yield e
+    except Exception as e:
+        event("stage_end", stage=stage, duration=round(time.monotonic() - started, 3), error=str(e))
+        raise
+    finally:
+        _events.end_stage(stage)
+    event("stage_end", stage=stage, duration=round(time.monotonic() - started, 3))
 
 
 def is_tty() -> bool:
@@ -239,3 +295,60 @@ def trim(s: str, max_len: int) -> str:
 def disable() -> None:
     global console
     console.quiet = True
+
+
+# EVENTS ONLY
+
+
+def enable_events(stream: EventStream, **fields: Any) -> None:
+    """
+    Emit machine-readable events to the stream from now on, starting with a run_start event with the fields.
+    """
+    global _events, _started
+    _events = stream
+    _started = time.monotonic()
+    event("run_start", **fields)
+
+
+def disable_events(*, success: bool) -> None:
+    """
+    Emit a run_end event and close the event stream.
+    """
+    global _events
+    if _events is None:
+        return
+    event("run_end", success=success, duration=round(time.monotonic() - _started, 3))
+    _events.close()
+    _events = None
+
+
+def event(type: str, **fields: Any) -> None:
+    """
+    Emit a machine-readable event (if enabled), e.g. statistics that aren't displayed.
+    """
+    if _events is not None:
+        _events.emit(type, **(_scope | fields))
+
+
+def scoped(items: Iterable[T], **fields: Callable[[T], Any]) -> Iterator[T]:
+    """
+    Iterate over the items, adding the fields computed from the current item to the events emitted meanwhile, e.g.
+    scoped(repos, repository=lambda repo: repo.name).
+    """
+    for item in items:
+        with scope(**{key: field(item) for key, field in fields.items()}):
+            yield item
+
+
+@contextmanager
+def scope(**fields: Any) -> Iterator[None]:
+    """
+    Add the fields (e.g. the repository) to all events emitted in the block.
+    """
+    previous = dict(_scope)
+    _scope.update(fields)
+    try:
+        yield
+    finally:
+        _scope.clear()
+        _scope.update(previous)
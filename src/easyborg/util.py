@@ -103,3 +103,31 @@ def open_path(target: str | Path) -> None:
 
 def is_blank(value: str | None) -> bool:
     return not (value and value.strip())
+
+
+def format_size(size: float) -> str:
+    """
+    Format a number of bytes for humans, e.g. 1.5 GB.
+    """
+    for unit in ("B", "kB", "MB", "GB", "TB"):
+        if abs(size) < 1000 or unit == "TB":
+            break
+        size /= 1000
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+
+def format_duration(seconds: float) -> str:
+    """
+    Format a duration for humans, e.g. 2h 5m.
+    """
+    seconds = round(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds}s"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours}h {minutes}m"
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h"
@@ -0,0 +1,72 @@
+import json
+import logging
+import math
+import os
+import time
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class VerificationState:
+    """
+    Remember when the data of each snapshot was last verified, per repository.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def verified(self, repo_name: str) -> dict[str, float]:
+        """
+        Return the time of the last verification (seconds since the epoch) by snapshot name.
+        """
+        return dict(self._load().get(repo_name, {}))
+
+    def record(self, repo_name: str, snapshot_name: str, *, existing: Iterable[str] | None = None) -> None:
+        """
+        Record that the snapshot was verified just now. Entries of snapshots that no longer exist are dropped.
+        """
+        entries = self._load()
+        verified = entries.setdefault(repo_name, {})
+        if existing is not None:
+            names = set(existing)
+            for name in [name for name in verified if name not in names]:
+                del verified[name]
+        verified[snapshot_name] = time.time()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(entries, indent=2), encoding="utf-8")
+        os.replace(temp_path, self.path)
+
+    def _load(self) -> dict[str, dict[str, float]]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            logger.warning("Ignoring corrupt verification file '%s'", self.path)
+            return {}
+
+
+def rotation(names: Iterable[str], verified: Mapping[str, float]) -> list[str]:
+    """
+    Return the snapshots in the order they are due for verification: never verified first (oldest first), then the
+    ones verified longest ago.
+    """
+    return sorted(names, key=lambda name: (verified.get(name, float("-inf")), name))
+
+
+def quota(count: int, period: int) -> int:
+    """
+    Return how many snapshots a daily run verifies, so all of them are verified once within the period (days).
+    """
+    return math.ceil(count / max(period, 1))
+
+
+def overdue(names: Iterable[str], verified: Mapping[str, float], *, period: int, now: float | None = None) -> int:
+    """
+    Return the number of snapshots that weren't verified within the period (days).
+    """
+    cutoff = (now if now is not None else time.time()) - period * 24 * 60 * 60
+    return sum(1 for name in names if verified.get(name, float("-inf")) < cutoff)
@@ -2,6 +2,7 @@
 from unittest.mock import Mock
 
 from easyborg.command.backup import BackupCommand
+from easyborg.fingerprint import FingerprintStore
 from easyborg.model import Config, Repository, RepositoryType
 from easyborg.util import relativize
 
@@ -90,12 +91,41 @@ def test_backup_command_tenacious_mode(tmp_path, testdata_dir):
     # create_snapshot: fail first time, succeed second time
     borg.create_snapshot.side_effect = [
         Exception("boom"),
-        None,
+        [],
     ]
 
     borg.prune.return_value = []
     borg.compact.return_value = []
 
-    BackupCommand(config=config, borg=borg).run(tenacious=True)
+    failed = BackupCommand(config=config, borg=borg).run(tenacious=True)
 
     assert borg.create_snapshot.call_count == 2
+    assert failed == ["foo"]
+
+
+def test_backup_command_skips_unchanged_repository(tmp_path, testdata_dir):
+    """
+    Skip unchanged: second backup is skipped for repositories with skip_unchanged, but not for the others.
+    """
+
+    skipping_repo = Repository(url="foo", name="foo", type=RepositoryType.BACKUP, skip_unchanged=True)
+    regular_repo = Repository(url="bar", name="bar", type=RepositoryType.BACKUP)
+
+    config = Config(
+        backup_paths=[testdata_dir],
+        repos={"foo": skipping_repo, "bar": regular_repo},
+    )
+
+    borg = Mock()
+    borg.create_snapshot.return_value = []
+    borg.prune.return_value = []
+    borg.compact.return_value = []
+
+    fingerprints = FingerprintStore(tmp_path / "fingerprints.json")
+
+    BackupCommand(config=config, borg=borg, fingerprints=fingerprints).run()
+    assert borg.create_snapshot.call_count == 2
+
+    BackupCommand(config=config, borg=borg, fingerprints=fingerprints).run()
+    assert borg.create_snapshot.call_count == 3
+    assert borg.create_snapshot.call_args.args[0].repository is regular_repo
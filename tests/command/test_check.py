@@ -0,0 +1,48 @@
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from easyborg.command.check import CheckCommand
+from easyborg.model import CheckSettings, Config, Repository, RepositoryType, Snapshot
+from easyborg.verification import VerificationState
+
+
+@pytest.fixture
+def repo() -> Repository:
+    return Repository("repo", "/backup", RepositoryType.BACKUP)
+
+
+def create_borg(repo: Repository, names: list[str]) -> Mock:
+    borg = Mock()
+    borg.check.return_value = []
+    borg.verify.return_value = []
+    borg.list_snapshots.return_value = [Snapshot(repo, name) for name in names]
+    return borg
+
+
+def test_check_command_rotates_verification(tmp_path: Path, repo):
+    names = [f"2024-01-0{day}" for day in range(1, 7)]
+    config = Config(backup_paths=[], repos={"repo": repo}, check=CheckSettings(verify_period=3))
+    borg = create_borg(repo, names)
+    state = VerificationState(tmp_path / "verification.json")
+
+    for _ in range(3):
+        CheckCommand(config=config, borg=borg, state=state).run(time_budget=10)
+
+    assert borg.check.call_count == 3
+    assert borg.check.call_args.kwargs["max_duration"] == pytest.approx(300, abs=1)
+    assert sorted(call.args[0].name for call in borg.verify.call_args_list) == names
+    assert set(state.verified("repo")) == set(names)
+
+
+def test_check_command_shares_budget_between_repositories(tmp_path: Path, repo):
+    other = Repository("other", "/other", RepositoryType.ARCHIVE)
+    config = Config(backup_paths=[], repos={"repo": repo, "other": other}, check=CheckSettings(repository_share=1))
+    borg = create_borg(repo, [])
+
+    CheckCommand(config=config, borg=borg, state=VerificationState(tmp_path / "verification.json")).run(time_budget=10)
+
+    assert [call.args[0].name for call in borg.check.call_args_list] == ["repo", "other"]
+    assert borg.check.call_args_list[0].kwargs["max_duration"] == pytest.approx(300, abs=1)
+    assert borg.check.call_args_list[1].kwargs["max_duration"] == pytest.approx(600, abs=1)  # unused time goes on
@@ -0,0 +1,35 @@
+from easyborg.command.copy import CopyCommand
+from easyborg.model import Config, RepositoryType, Snapshot
+
+
+def test_copy_command(tmp_path, testdata_dir, borg):
+    """
+    End-to-end: snapshots are copied with name and comment, existing ones are skipped.
+    """
+
+    repo_parent = tmp_path / "repos"
+    repo_parent.mkdir()
+
+    source_repo = borg.create_repository(repo_parent, "source", RepositoryType.BACKUP)
+    target1_repo = borg.create_repository(repo_parent, "target1", RepositoryType.BACKUP)
+    target2_repo = borg.create_repository(repo_parent, "target2", RepositoryType.BACKUP)
+
+    config = Config(
+        backup_paths=[testdata_dir],
+        repos={"source": source_repo, "target1": target1_repo, "target2": target2_repo},
+    )
+
+    borg.create_snapshot(Snapshot(source_repo, "2025-01-01T00:00:00-a", "first"), [testdata_dir])
+    borg.create_snapshot(Snapshot(source_repo, "2025-01-02T00:00:00-b"), [testdata_dir])
+    borg.create_snapshot(Snapshot(target2_repo, "2025-01-01T00:00:00-a", "first"), [testdata_dir])
+
+    CopyCommand(config=config, borg=borg).run("source", ["target1", "target2"])
+
+    snapshots = borg.list_snapshots(target1_repo)
+    assert [(s.name, s.comment) for s in snapshots] == [
+        ("2025-01-01T00:00:00-a", "first"),
+        ("2025-01-02T00:00:00-b", None),
+    ]
+    assert len(borg.list_snapshots(target2_repo)) == 2
+
+    assert set(borg.list_contents(snapshots[0])) == set(borg.list_contents(Snapshot(source_repo, snapshots[0].name)))
@@ -0,0 +1,29 @@
+from pathlib import Path
+
+import pytest
+
+from easyborg.command.stats import StatsCommand
+from easyborg.history import Run, RunHistory
+from easyborg.model import Config, Repository, RepositoryType
+
+
+def test_stats_command_shows_recorded_operations(tmp_path: Path, capsys):
+    history = RunHistory(tmp_path / "history.sqlite")
+    history.record(Run("local", "create", 1, 10, True, 4000, 2000, 1000, 10))
+    history.record(Run("local", "scan", 1, 10, True, 4000))
+    history.record(Run("local", "prune", 11, 2, False, error="boom"))
+    config = Config(backup_paths=[], repos={"local": Repository("local", "/backup", RepositoryType.BACKUP)})
+
+    StatsCommand(config=config, history=history).run()
+
+    output = capsys.readouterr().out
+    assert "create" in output
+    assert "prune" in output  # failed runs only
+    assert "scan" not in output
+
+
+def test_stats_command_rejects_unknown_repository(tmp_path: Path):
+    config = Config(backup_paths=[], repos={})
+
+    with pytest.raises(RuntimeError, match="Unknown repository"):
+        StatsCommand(config=config, history=RunHistory(tmp_path / "history.sqlite")).run("remote")
@@ -0,0 +1,51 @@
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from easyborg import config
+from easyborg.command.tune import TuneCommand
+from easyborg.model import Repository
+from easyborg.tune import CHUNKER_CANDIDATES, COMPRESSION_CANDIDATES, DEFAULT_CHUNKER_PARAMS
+
+# the only candidate that deduplicates anything, so it always wins
+CHUNKER = next(params for params in CHUNKER_CANDIDATES if params != DEFAULT_CHUNKER_PARAMS)
+
+
+@pytest.fixture
+def config_file(tmp_path: Path) -> Path:
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "file").write_bytes(b"x" * 1000)
+    path = tmp_path / "easyborg.toml"
+    path.write_text(
+        f'backup_paths = ["{tmp_path / "data"}"]\n\n[repositories.LOCAL]\ntype = "backup"\nurl = "/backup"\n',
+        encoding="utf-8",
+    )
+    return path
+
+
+def _borg() -> Mock:
+    borg = Mock()
+    borg.create_repository.side_effect = lambda parent, name, type, env: Repository(name, str(parent), type)
+    borg.snapshot_stats.side_effect = lambda snapshot: {
+        "original_size": 1000,
+        "deduplicated_size": 1 if snapshot.repository.chunker_params == CHUNKER else 1000,
+    }
+    return borg
+
+
+def test_tune_command_keeps_chunker_params_by_default(config_file: Path, capsys):
+    borg = _borg()
+
+    TuneCommand(config=config.load(config_file), borg=borg, config_file=config_file).run()
+
+    assert borg.create_snapshot.call_count == 2 * len(COMPRESSION_CANDIDATES)
+    assert "chunker_params" not in config_file.read_text(encoding="utf-8")
+    assert "uploads all data again" not in capsys.readouterr().out
+
+
+def test_tune_command_changes_chunker_params_with_warning(config_file: Path, capsys):
+    TuneCommand(config=config.load(config_file), borg=_borg(), config_file=config_file).run(chunker=True)
+
+    assert config.load(config_file).repos["LOCAL"].chunker_params == CHUNKER
+    assert "uploads all data again" in capsys.readouterr().out
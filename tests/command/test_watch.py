@@ -0,0 +1,39 @@
+from easyborg.command.watch import MAX_RETRY_DELAY, RETRY_DELAY, ChangeCoalescer, retry_delay
+
+
+def test_coalescer_waits_for_quiet_period():
+    coalescer = ChangeCoalescer(debounce=10, max_latency=100)
+    assert not coalescer.due(0)
+
+    coalescer.record(0)
+    coalescer.record(5)
+
+    assert not coalescer.due(14)
+    assert coalescer.time_until_due(14) == 1
+    assert coalescer.due(15)
+
+
+def test_coalescer_triggers_after_max_latency():
+    coalescer = ChangeCoalescer(debounce=10, max_latency=30)
+
+    for now in range(0, 30, 5):  # steady stream of changes
+        coalescer.record(now)
+        assert not coalescer.due(now)
+
+    assert coalescer.due(30)
+
+
+def test_coalescer_reset():
+    coalescer = ChangeCoalescer(debounce=10, max_latency=30)
+    coalescer.record(0)
+    coalescer.reset()
+
+    assert not coalescer.due(100)
+    assert coalescer.time_until_due(100) is None
+
+
+def test_retry_delay_backs_off():
+    assert retry_delay(0) == 0
+    assert retry_delay(1) == RETRY_DELAY
+    assert retry_delay(2) == 2 * RETRY_DELAY
+    assert retry_delay(100) == MAX_RETRY_DELAY
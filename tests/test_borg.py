@@ -1,8 +1,11 @@
+import time
 from pathlib import Path
 
 import pytest
 
-from easyborg.model import Repository, RepositoryType, Snapshot
+from easyborg.borg import _utc_timestamp
+from easyborg.model import Repository, RepositoryType, Snapshot, StreamSource
+from easyborg.process import ProducerError
 from easyborg.util import compare_directories, relativize
 
 
@@ -74,6 +77,28 @@ def test_create_snapshot_with_comment(borg, repo, testdata_dir):
     assert matching[0].comment == comment
 
 
+def test_create_snapshot_with_stream(tmp_path, borg, repo, testdata_dir):
+    snap = Snapshot(repo, "snapshot")
+    stream = StreamSource(command=("printf", "dump"), name="db/dump.sql")
+    borg.create_snapshot(snap, [testdata_dir], stream=stream)
+
+    target_dir = tmp_path / "target"
+    target_dir.mkdir()
+    borg.restore(snap, target_dir, paths=[Path("db/dump.sql")])
+
+    assert (target_dir / "db" / "dump.sql").read_text() == "dump"
+
+
+def test_create_snapshot_with_failing_stream_leaves_no_snapshot(borg, repo, testdata_dir):
+    snap = Snapshot(repo, "snapshot")
+    stream = StreamSource(command=("sh", "-c", "printf partial; exit 1"), name="db/dump.sql")
+
+    with pytest.raises(ProducerError):
+        borg.create_snapshot(snap, [testdata_dir], stream=stream)
+
+    assert borg.list_snapshots(repo) == []
+
+
 def test_restore_fails_if_target_directory_not_found(borg, repo, testdata_dir):
     snap = Snapshot(repo, "snapshot")
     borg.create_snapshot(snap, [testdata_dir])
@@ -143,3 +168,13 @@ def test_delete_selected_snapshot_only(tmp_path, borg, repo, testdata_dir):
     snapshots = borg.list_snapshots(repo)
     assert len(snapshots) == 1
     assert snapshots[0].name == snap1.name
+
+
+def test_utc_timestamp_converts_local_time(monkeypatch):
+    monkeypatch.setenv("TZ", "Europe/Berlin")
+    time.tzset()
+    try:
+        assert _utc_timestamp("2024-07-01T14:30:05.123456") == "2024-07-01T12:30:05"
+    finally:
+        monkeypatch.undo()
+        time.tzset()
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import pytest
+
+from easyborg.cache import NETWORK_FILES_CACHE, files_cache_mode, list_caches, network_paths, read_mounts
+from easyborg.model import Repository, RepositoryType
+
+
+@pytest.fixture
+def mounts_file(tmp_path: Path) -> Path:
+    path = tmp_path / "mounts"
+    path.write_text(
+        "/dev/sda1 / ext4 rw,relatime 0 0\n"
+        "server:/export /mnt/nfs nfs4 rw,relatime 0 0\n"
+        "//server/share /mnt/my\\040share cifs rw 0 0\n"
+        "/dev/sdb1 /mnt/nfs/local ext4 rw 0 0\n"
+    )
+    return path
+
+
+def _repo(name: str = "repo", url: str = "/backup", **values) -> Repository:
+    return Repository(name=name, url=url, type=RepositoryType.BACKUP, **values)
+
+
+def _write_cache(path: Path, location: str | None, size: int = 100) -> None:
+    path.mkdir(parents=True)
+    config = "[cache]\nversion = 1\nrepository = 0123\n"
+    if location:
+        config += f"previous_location = {location}\n"
+    (path / "config").write_text(config)
+    (path / "chunks").write_bytes(b"x" * size)
+
+
+def test_read_mounts_unescapes_mount_points(mounts_file):
+    assert (Path("/mnt/my share"), "cifs") in read_mounts(mounts_file)
+
+
+def test_read_mounts_without_mounts_file(tmp_path):
+    assert read_mounts(tmp_path / "missing") == []
+
+
+def test_network_paths_uses_longest_mount_point(mounts_file):
+    paths = [Path("/home/user"), Path("/mnt/nfs/data"), Path("/mnt/nfs/local/data"), Path("/mnt/my share/x")]
+
+    assert network_paths(paths, mounts_file) == [Path("/mnt/nfs/data"), Path("/mnt/my share/x")]
+
+
+def test_files_cache_mode(mounts_file):
+    assert files_cache_mode(_repo(), [Path("/home/user")], mounts_file) is None
+    assert files_cache_mode(_repo(), [Path("/mnt/nfs/data")], mounts_file) == NETWORK_FILES_CACHE
+    assert files_cache_mode(_repo(files_cache="ctime,size"), [Path("/mnt/nfs/data")], mounts_file) == "ctime,size"
+
+
+def test_list_caches_finds_stale_caches(tmp_path):
+    managed_dir = tmp_path / "managed"
+    borg_dir = tmp_path / "borg"
+    _write_cache(managed_dir / "repo" / "0123", "/backup", size=100)
+    _write_cache(managed_dir / "removed" / "4567", "/old", size=200)
+    _write_cache(borg_dir / "89ab", "/backup/", size=300)
+    _write_cache(borg_dir / "cdef", "ssh://old.example.com/./backup", size=400)
+    (borg_dir / "security").mkdir()
+
+    caches = list_caches({"repo": _repo()}, managed_dir, borg_dir)
+
+    assert [(c.path.name, c.location, c.repository, c.managed) for c in caches] == [
+        ("removed", "/old", None, True),
+        ("repo", "/backup", "repo", True),
+        ("89ab", "/backup/", "repo", False),
+        ("cdef", "ssh://old.example.com/./backup", None, False),
+    ]
+    config_size = len((borg_dir / "89ab" / "config").read_bytes())
+    assert caches[2].size == 300 + config_size
@@ -0,0 +1,67 @@
+from easyborg.checkpoint import TimeBudget, interrupted_snapshot, is_checkpoint
+
+
+def test_is_checkpoint():
+    assert is_checkpoint("2024-01-01-120000.checkpoint")
+    assert is_checkpoint("2024-01-01-120000.checkpoint.2")
+    assert not is_checkpoint("2024-01-01-120000")
+    assert not is_checkpoint("2024-01-01-120000.checkpoint.partial")
+
+
+def test_interrupted_snapshot_without_checkpoints():
+    assert interrupted_snapshot([]) is None
+    assert interrupted_snapshot(["2024-01-01-120000", "2024-01-02-120000"]) is None
+
+
+def test_interrupted_snapshot_returns_latest_checkpoint():
+    names = ["2024-01-01-120000", "2024-01-02-120000.checkpoint", "2024-01-02-120000.checkpoint.1"]
+
+    assert interrupted_snapshot(names) == "2024-01-02-120000"
+
+
+def test_interrupted_snapshot_ignores_completed_and_outdated_checkpoints():
+    assert interrupted_snapshot(["2024-01-02-120000.checkpoint", "2024-01-02-120000"]) is None
+    assert interrupted_snapshot(["2024-01-01-120000.checkpoint", "2024-01-02-120000"]) is None
+
+
+def test_time_budget():
+    now = [100.0]
+    budget = TimeBudget(60, clock=lambda: now[0])
+
+    assert budget.remaining() == 60
+    assert not budget.exhausted()
+
+    now[0] = 200.0
+    assert budget.remaining() == 0
+    assert budget.exhausted()
+
+
+def test_time_budget_without_limit():
+    budget = TimeBudget(None)
+
+    assert budget.remaining() is None
+    assert not budget.exhausted()
+    with budget.enforce(lambda: None) as expired:
+        pass
+    assert not expired.is_set()
+
+
+def test_time_budget_enforce_interrupts_when_used_up():
+    calls = []
+    budget = TimeBudget(0)
+
+    with budget.enforce(lambda: calls.append(True)) as expired:
+        assert expired.wait(5)
+
+    assert calls == [True]
+
+
+def test_time_budget_enforce_does_not_interrupt_in_time():
+    calls = []
+    budget = TimeBudget(60)
+
+    with budget.enforce(lambda: calls.append(True)) as expired:
+        pass
+
+    assert not expired.is_set()
+    assert calls == []
@@ -0,0 +1,12 @@
+from easyborg.cli import _uses_console
+
+
+def test_headless_commands_do_not_use_console():
+    assert not _uses_console(True, "backup")
+    assert not _uses_console(True, "check")  # e.g. "check --if-due" from cron
+    assert _uses_console(False, "check")
+
+
+def test_interactive_commands_use_console_even_if_headless():
+    assert _uses_console(True, "restore")
+    assert _uses_console(True, None)
@@ -0,0 +1,109 @@
+from pathlib import Path
+
+import pytest
+
+from easyborg import config
+
+CONFIG = """backup_paths = ["/data"]
+
+[repositories.LOCAL]
+type = "backup"
+url = "/backup"
+compression = "lz4" # fast
+
+# remote repository
+[repositories."REMOTE-1"]
+type = "backup"
+url = "ssh://example.com/./backup"
+
+[repositories."REMOTE-1".environment]
+BORG_RSH = "ssh -i key"
+"""
+
+
+@pytest.fixture
+def config_file(tmp_path: Path) -> Path:
+    path = tmp_path / "easyborg.toml"
+    path.write_text(CONFIG, encoding="utf-8")
+    return path
+
+
+def test_update_repository_replaces_existing_value(config_file):
+    config.update_repository(config_file, "LOCAL", {"compression": "zstd,3"})
+
+    assert config.load(config_file).repos["LOCAL"].compression == "zstd,3"
+    assert config_file.read_text().count("compression") == 1
+
+
+def test_update_repository_inserts_value_into_table(config_file):
+    config.update_repository(config_file, "REMOTE-1", {"compression": "zstd,6", "chunker_params": "buzhash,1,2,3,4"})
+
+    loaded = config.load(config_file)
+    assert loaded.repos["REMOTE-1"].compression == "zstd,6"
+    assert loaded.repos["REMOTE-1"].chunker_params == "buzhash,1,2,3,4"
+    assert loaded.repos["REMOTE-1"].env == {"BORG_RSH": "ssh -i key"}
+    assert "# remote repository" in config_file.read_text()
+
+
+def test_update_repository_fails_for_unknown_repository(config_file):
+    with pytest.raises(RuntimeError, match="Repository not found"):
+        config.update_repository(config_file, "UNKNOWN", {"compression": "lz4"})
+
+
+def test_mirror_must_mirror_a_primary_backup_repository(tmp_path: Path):
+    path = tmp_path / "easyborg.toml"
+    path.write_text(CONFIG + '\n[repositories.MIRROR]\ntype = "backup"\nurl = "/mirror"\nmirror_of = "LOCAL"\n')
+    assert config.load(path).repos["MIRROR"].mirror_of == "LOCAL"
+
+    path.write_text(CONFIG + '\n[repositories.MIRROR]\ntype = "backup"\nurl = "/mirror"\nmirror_of = "UNKNOWN"\n')
+    with pytest.raises(RuntimeError, match="not a backup repository"):
+        config.load(path)
+
+
+def test_sharded_repository_cannot_be_mirrored(tmp_path: Path):
+    path = tmp_path / "easyborg.toml"
+    path.write_text(CONFIG.replace('compression = "lz4"', 'shards = 4\ncompression = "lz4"'))
+    assert config.load(path).repos["LOCAL"].shards == 4
+
+    mirror = '\n[repositories.MIRROR]\ntype = "backup"\nurl = "/mirror"\nmirror_of = "LOCAL"\n'
+    path.write_text(path.read_text() + mirror)
+    with pytest.raises(RuntimeError, match="can't use incremental mode or mirrors"):
+        config.load(path)
+
+
+def test_stream_command_can_be_a_string(tmp_path: Path):
+    path = tmp_path / "easyborg.toml"
+    path.write_text(CONFIG + '\n[stream]\ncommand = "pg_dump -Fc \'my db\'"\nname = "db.dump"\n')
+
+    stream = config.load(path).stream
+    assert stream.command == ("pg_dump", "-Fc", "my db")
+    assert stream.name == "db.dump"
+
+
+def test_repository_watchdog_overrides_global_settings(tmp_path: Path):
+    path = tmp_path / "easyborg.toml"
+    watchdog = '\n[watchdog]\nmax_duration = 480\ngrace = 30\n'
+    path.write_text(CONFIG + watchdog + '\n[repositories."REMOTE-1".watchdog]\nstall_timeout = 10\n')
+
+    configuration = config.load(path)
+    assert configuration.watchdog.max_duration == 480
+    assert configuration.repos["LOCAL"].watchdog is None
+    remote = configuration.repos["REMOTE-1"].watchdog
+    assert (remote.max_duration, remote.stall_timeout, remote.grace) == (480, 10, 30)
+
+
+def test_stale_locks_are_only_broken_if_enabled(tmp_path: Path):
+    path = tmp_path / "easyborg.toml"
+    path.write_text(CONFIG)
+    assert not config.load(path).locks.break_stale
+
+    path.write_text(CONFIG + "\n[locks]\nbreak_stale = true\n")
+    assert config.load(path).locks.break_stale
+
+
+def test_load_creates_configuration_from_template(tmp_path: Path):
+    path = tmp_path / "config" / "easyborg.toml"
+
+    config.load(path)
+
+    assert path.exists()
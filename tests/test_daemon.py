@@ -0,0 +1,154 @@
+import os
+import socket
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+from easyborg.command.daemon import DaemonCommand
+from easyborg.daemon import DaemonServer, is_running, request
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return tmp_path / "daemon.sock"
+
+
+def test_request_is_answered_by_server(socket_path):
+    server = DaemonServer(socket_path, lambda r: {"echo": r["command"], "value": r.get("value")})
+    server.start()
+    try:
+        assert request(socket_path, "foo", value=42) == {"echo": "foo", "value": 42}
+        assert is_running(socket_path)
+    finally:
+        server.stop()
+
+    assert not socket_path.exists()
+    assert not is_running(socket_path)
+
+
+def test_request_fails_if_handler_fails(socket_path):
+    def fail(_request):
+        raise RuntimeError("boom")
+
+    server = DaemonServer(socket_path, fail)
+    server.start()
+    try:
+        with pytest.raises(RuntimeError, match="boom"):
+            request(socket_path, "foo")
+    finally:
+        server.stop()
+
+
+def test_request_fails_if_daemon_not_running(socket_path):
+    with pytest.raises(RuntimeError, match="Daemon is not running"):
+        request(socket_path, "status")
+
+
+def test_request_fails_if_daemon_closes_connection(socket_path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(socket_path))
+        server.listen()
+        thread = threading.Thread(target=lambda: server.accept()[0].close())
+        thread.start()
+
+        with pytest.raises(RuntimeError, match="Daemon is not responding"):
+            request(socket_path, "status")
+        thread.join()
+
+
+def test_server_replaces_stale_socket(socket_path):
+    socket_path.touch()  # left over from a killed daemon
+
+    server = DaemonServer(socket_path, lambda r: {})
+    server.start()
+    try:
+        assert is_running(socket_path)
+    finally:
+        server.stop()
+
+
+def test_daemon_handles_status_and_backup_requests(tmp_path, socket_path):
+    command = DaemonCommand(
+        profile="default",
+        config_file=tmp_path / "easyborg.toml",
+        socket_path=socket_path,
+        create_backup=None,
+    )
+
+    assert command.handle({"command": "status"})["status"]["running"] is False
+    assert command.handle({"command": "backup", "time_budget": 30}) == {"queued": True}
+    assert command._trigger.is_set()
+    assert command._requested_budget == 30
+
+    with pytest.raises(RuntimeError, match="Unknown command"):
+        command.handle({"command": "foo"})
+
+
+def test_daemon_reloads_changed_configuration(tmp_path, socket_path):
+    config_file = tmp_path / "easyborg.toml"
+    config_file.write_text('backup_paths = ["/foo"]\n')
+
+    command = DaemonCommand(profile="default", config_file=config_file, socket_path=socket_path, create_backup=None)
+    command._reload_if_changed()
+    assert [str(p) for p in command.config.backup_paths] == ["/foo"]
+
+    config_file.write_text('backup_paths = ["/bar"]\n')
+    command._config_mtime = -1  # mtime resolution may be too coarse for the test
+    command._reload_if_changed()
+    assert [str(p) for p in command.config.backup_paths] == ["/bar"]
+
+
+def test_daemon_keeps_configuration_if_reload_fails(tmp_path, socket_path):
+    config_file = tmp_path / "easyborg.toml"
+    config_file.write_text('backup_paths = ["/foo"]\n')
+
+    command = DaemonCommand(profile="default", config_file=config_file, socket_path=socket_path, create_backup=None)
+    command._reload_if_changed()
+
+    config_file.write_text("backup_paths = [")
+    command._config_mtime = -1
+    command._reload_if_changed()
+    assert [str(p) for p in command.config.backup_paths] == ["/foo"]
+
+
+def test_daemon_reports_failed_repositories(tmp_path, socket_path):
+    backup = Mock()
+    backup.run.return_value = ["REMOTE"]
+    command = DaemonCommand(
+        profile="default",
+        config_file=tmp_path / "easyborg.toml",
+        socket_path=socket_path,
+        create_backup=lambda configuration: backup,
+    )
+
+    command._backup()
+
+    status = command.handle({"command": "status"})["status"]
+    assert status["last_backup_result"] == "failed"
+    assert status["last_backup_failed"] == ["REMOTE"]
+
+
+def test_daemon_applies_environment_and_rebuilds_on_reload(tmp_path, socket_path, monkeypatch):
+    monkeypatch.setenv("BORG_RSH", "ssh")  # keep the daemon from setting up master connections
+    monkeypatch.delenv("EASYBORG_TEST_VAR", raising=False)
+    config_file = tmp_path / "easyborg.toml"
+    config_file.write_text('backup_paths = ["/foo"]\n[environment]\nEASYBORG_TEST_VAR = "1"\n')
+    reloaded = []
+
+    command = DaemonCommand(
+        profile="default",
+        config_file=config_file,
+        socket_path=socket_path,
+        create_backup=None,
+        on_reload=reloaded.append,
+    )
+    command._reload_if_changed()
+    assert os.environ["EASYBORG_TEST_VAR"] == "1"
+    assert reloaded == []
+
+    config_file.write_text('backup_paths = ["/foo"]\n')
+    command._config_mtime = -1
+    command._reload_if_changed()
+    assert "EASYBORG_TEST_VAR" not in os.environ
+    assert reloaded == [command.config]
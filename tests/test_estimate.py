@@ -0,0 +1,91 @@
+import logging
+import os
+import time
+from pathlib import Path
+
+from easyborg.estimate import DEFAULT_FILE_RATE, Expectation, Totals, count, estimate, expect, track
+from easyborg.exclusions import Excluder
+from easyborg.history import Run, RunHistory, Throughput
+from easyborg.model import ExclusionSettings, ProgressEvent, Repository, RepositoryType
+from easyborg.tune import LOCAL_SPEED
+
+
+def test_count_respects_exclusions_and_thresholds(tmp_path: Path):
+    (tmp_path / "old").write_bytes(b"x" * 100)
+    (tmp_path / "new").write_bytes(b"x" * 10)
+    (tmp_path / "skip.tmp").write_bytes(b"x" * 1000)
+    os.utime(tmp_path / "old", (1000, 1000))
+    excluder = Excluder(ExclusionSettings(patterns=("*.tmp",)), ["! fm:*.tmp"], [tmp_path])
+
+    totals = count(excluder, [tmp_path], [None, 2000, time.time() + 3600])
+
+    assert totals[0] == Totals(files=2, bytes=110, changed_files=2, changed_bytes=110)
+    assert totals[1] == Totals(files=2, bytes=110, changed_files=2, changed_bytes=110)  # ctime counts as well
+    assert totals[2] == Totals(files=2, bytes=110, changed_files=0, changed_bytes=0)
+
+
+def test_estimate_without_history_uses_assumptions():
+    repo = Repository("local", "/backup", RepositoryType.BACKUP)
+    totals = Totals(files=2000, bytes=LOCAL_SPEED * 10, changed_files=2000, changed_bytes=LOCAL_SPEED * 10)
+
+    result = estimate(repo, totals, None)
+
+    assert result.upload_bytes == LOCAL_SPEED * 10
+    assert result.seconds == max(10, 2000 / DEFAULT_FILE_RATE)
+    assert not result.from_history
+
+
+def test_estimate_with_history():
+    repo = Repository("local", "/backup", RepositoryType.BACKUP)
+    totals = Totals(files=1000, bytes=10_000, changed_files=10, changed_bytes=2000)
+    throughput = Throughput(deduplicated_rate=100, file_rate=200, compression_ratio=0.5, runs=3)
+
+    result = estimate(repo, totals, throughput)
+
+    assert result.upload_bytes == 1000
+    assert result.seconds == 1000 / 100  # uploading takes longer than checking the files
+    assert result.from_history
+
+
+def test_estimate_reproduces_recorded_run(tmp_path: Path):
+    repo = Repository("local", "/backup", RepositoryType.BACKUP)
+    history = RunHistory(tmp_path / "history.sqlite")
+    history.record(
+        Run(
+            "local", "create", 1, 600, True,
+            original_size=200_000_000, compressed_size=100_000_000, deduplicated_size=50_000_000, nfiles=100_000,
+        )
+    )
+    totals = Totals(files=100_000, bytes=200_000_000, changed_files=5000, changed_bytes=100_000_000)
+
+    result = estimate(repo, totals, history.throughput("local"))
+
+    assert result.upload_bytes == 50_000_000
+    assert result.seconds == 600
+
+
+def test_expect_uses_most_recent_size(tmp_path: Path):
+    repo = Repository("local", "/backup", RepositoryType.BACKUP)
+    history = RunHistory(tmp_path / "history.sqlite")
+    assert expect(history, repo) is None
+
+    history.record(Run("local", "scan", 1, 5, True, original_size=500, nfiles=10))
+    assert expect(history, repo) == Expectation(500, None)
+
+    history.record(Run("local", "create", 2, 10, True, original_size=1000, nfiles=10))
+    assert expect(history, repo) == Expectation(1000, 100)
+
+
+def test_track_adds_total_and_remaining_time(caplog):
+    events = iter([ProgressEvent(message="Starting"), ProgressEvent(current=200), ProgressEvent(current=1200)])
+    ticks = iter([0, 10, 70, 70, 80])
+
+    with caplog.at_level(logging.INFO, logger="easyborg.estimate"):
+        result = list(track(events, Expectation(1000, 100), name="snap", clock=lambda: next(ticks)))
+
+    assert result == [
+        ProgressEvent(message="Starting"),
+        ProgressEvent(total=1000, current=200, remaining=8),
+        ProgressEvent(total=1200, current=1200, remaining=0),
+    ]
+    assert caplog.messages == ["snap: 100% (1.2 kB of about 1.2 kB), about 0s remaining"]
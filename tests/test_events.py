@@ -0,0 +1,113 @@
+import io
+import json
+import os
+import socket
+from pathlib import Path
+
+import pytest
+
+from easyborg import ui
+from easyborg.events import EventStream, open_events
+from easyborg.model import ProgressEvent
+
+
+def _events(stream: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_emit_writes_one_json_object_per_line():
+    stream = io.StringIO()
+
+    EventStream(stream).emit("message", level="info", message="Creating snapshot", details=None)
+
+    [event] = _events(stream)
+    assert event["type"] == "message"
+    assert event["message"] == "Creating snapshot"
+    assert "details" not in event
+    assert event["time"] > 0
+
+
+def test_progress_is_coalesced():
+    stream = io.StringIO()
+    now = [0.0]
+    events = EventStream(stream, interval=1.0, clock=lambda: now[0])
+
+    for current in range(5):
+        events.progress("Creating snapshot", ProgressEvent(total=10, current=current))
+        now[0] += 0.4
+    events.progress("Creating snapshot", ProgressEvent(total=10, current=10))  # completion is never dropped
+
+    assert [event["current"] for event in _events(stream)] == [0, 3, 10]
+
+
+def test_open_events_writes_to_file(tmp_path: Path):
+    path = tmp_path / "events.ndjson"
+
+    events = open_events(f"ndjson={path}")
+    events.emit("run_start")
+    events.close()
+
+    assert json.loads(path.read_text())["type"] == "run_start"
+
+
+def test_open_events_writes_to_file_descriptor():
+    read_fd, write_fd = os.pipe()
+
+    events = open_events(f"ndjson={write_fd}")
+    events.emit("run_start")
+    events.close()
+
+    with os.fdopen(read_fd) as f:
+        assert json.loads(f.readline())["type"] == "run_start"
+
+
+def test_open_events_connects_to_socket(tmp_path: Path):
+    path = tmp_path / "events.sock"
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen(1)
+
+    events = open_events(f"ndjson={path}")
+    connection, _ = server.accept()
+    events.emit("run_start")
+    events.close()
+
+    with connection, server:
+        assert json.loads(connection.makefile().readline())["type"] == "run_start"
+
+
+def test_open_events_rejects_unknown_format():
+    with pytest.raises(ValueError, match="Unsupported event format"):
+        open_events("xml")
+
+
+def test_open_events_rejects_stdout_shared_with_console():
+    with pytest.raises(ValueError, match="--headless"):
+        open_events("ndjson", stdout=False)
+
+
+def test_ui_emits_stages_and_messages_in_scope():
+    stream = io.StringIO()
+    stream.close = lambda: None  # read after the run ended
+    ui.enable_events(EventStream(stream), command="backup")
+    try:
+        for repo in ui.scoped(["local"], repository=lambda name: name):
+            ui.info(f"Creating snapshot in repository {repo}")
+            ui.spinner(lambda: iter([ProgressEvent(message="file")]), message="Creating snapshot")
+        ui.warn("Done")
+    finally:
+        ui.disable_events(success=True)
+
+    events = _events(stream)
+    assert [event["type"] for event in events] == [
+        "run_start",
+        "message",
+        "stage_start",
+        "progress",
+        "stage_end",
+        "message",
+        "run_end",
+    ]
+    assert all(event["repository"] == "local" for event in events[1:5])
+    assert "repository" not in events[5]
+    assert events[6]["success"] is True
@@ -0,0 +1,121 @@
+from pathlib import Path
+
+import pytest
+
+from easyborg.exclusions import (
+    CACHEDIR_SIGNATURE,
+    Excluder,
+    Rule,
+    borg_options,
+    compile_patterns,
+    gitignore_patterns,
+    patterns_file,
+)
+from easyborg.model import ExclusionSettings
+
+
+@pytest.mark.parametrize(
+    "line, path, expected",
+    [
+        ("! fm:home/*/.cache", "home/me/.cache", True),
+        ("! fm:home/*/.cache", "home/me/.cache/x/y", True),
+        ("! fm:*.tmp", "home/me/a/b.tmp", True),
+        ("! sh:home/*/.cache", "home/me/x/.cache", False),
+        ("! sh:home/**/node_modules", "home/me/x/node_modules/a.js", True),
+        ("! sh:home/**/node_modules", "home/node_modules", True),
+        ("! sh:/home/*.iso", "home/a.iso", True),
+        ("! pp:home/me", "home/me/a", True),
+        ("! pp:home/me", "home/meme", False),
+        ("! pf:home/me/a", "home/me/a", True),
+        ("! re:\\.pyc$", "home/me/a.pyc", True),
+        ("! home/[!a]*", "home/b", True),
+        ("! home/[!a]*", "home/a", False),
+    ],
+)
+def test_rule_matches_like_borg(line: str, path: str, expected: bool):
+    assert Rule.parse(line).matches(path) is expected
+
+
+def test_compile_patterns_defaults_to_exclude_with_fnmatch():
+    settings = ExclusionSettings(patterns=("*/.cache", "sh:**/build", "+ pp:/home/me/keep"))
+
+    assert compile_patterns(settings, []) == ["! fm:*/.cache", "! sh:**/build", "+ pp:/home/me/keep"]
+
+
+def test_borg_options():
+    settings = ExclusionSettings(exclude_caches=True, exclude_if_present=(".nobackup",), one_file_system=True)
+
+    assert borg_options(settings) == ["--exclude-caches", "--exclude-if-present", ".nobackup", "--one-file-system"]
+
+
+def test_patterns_file_is_removed_afterwards():
+    with patterns_file(["! fm:*.tmp"]) as path:
+        assert path.read_text() == "! fm:*.tmp\n"
+    assert not path.exists()
+
+    with patterns_file([]) as path:
+        assert path is None
+
+
+def test_gitignore_patterns(tmp_path: Path):
+    project = tmp_path / "project"
+    (project / "sub").mkdir(parents=True)
+    (project / ".gitignore").write_text("# comment\n\nbuild/\n/dist\n*.log\n!keep.log\n")
+    (project / "sub" / ".gitignore").write_text("cache\n")
+
+    base = str(project).lstrip("/")
+    assert gitignore_patterns([tmp_path]) == [
+        f"! sh:{base}/sub/**/cache",
+        f"+ sh:{base}/**/keep.log",
+        f"! sh:{base}/**/*.log",
+        f"! sh:{base}/dist",
+        f"! sh:{base}/**/build",
+    ]
+
+
+@pytest.fixture
+def tree(tmp_path: Path) -> Path:
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "main.py").write_bytes(b"x" * 10)
+    (tmp_path / "node_modules" / "lib").mkdir(parents=True)
+    (tmp_path / "node_modules" / "lib" / "a.js").write_bytes(b"x" * 100)
+    (tmp_path / "node_modules" / "keep.js").write_bytes(b"x" * 100)
+    (tmp_path / "cache").mkdir()
+    (tmp_path / "cache" / "CACHEDIR.TAG").write_bytes(CACHEDIR_SIGNATURE + b"\n")
+    (tmp_path / "cache" / "blob").write_bytes(b"x" * 1000)
+    (tmp_path / "private").mkdir()
+    (tmp_path / "private" / ".nobackup").touch()
+    (tmp_path / "private" / "secret").write_bytes(b"x" * 5)
+    (tmp_path / "debug.log").write_bytes(b"x" * 50)
+    return tmp_path
+
+
+def _excluder(tree: Path, *patterns: str) -> Excluder:
+    settings = ExclusionSettings(patterns=patterns, exclude_caches=True, exclude_if_present=(".nobackup",))
+    return Excluder(settings, compile_patterns(settings, [tree]), [tree])
+
+
+def test_excluder_filters_paths(tree: Path):
+    excluder = _excluder(tree, "sh:**/node_modules", "*.log")
+    paths = [str(p) for p in [tree, *sorted(tree.rglob("*"))]]
+
+    included = excluder.filter(paths)
+
+    expected = [tree, tree / "cache", tree / "private", tree / "src", tree / "src" / "main.py"]
+    assert included == [str(p) for p in expected]
+
+
+def test_excluder_report(tree: Path):
+    excluder = _excluder(tree, "sh:**/node_modules", "*.log")
+
+    report = excluder.report()
+
+    assert report.files == {
+        "! sh:**/node_modules": 2,
+        "! fm:*.log": 1,
+        "exclude_caches": 2,
+        "exclude_if_present .nobackup": 2,
+    }
+    assert report.bytes["! sh:**/node_modules"] == 200
+    assert report.bytes["exclude_caches"] == 1000 + len(CACHEDIR_SIGNATURE) + 1
+    assert (report.included_files, report.included_bytes) == (1, 10)
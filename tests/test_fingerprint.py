@@ -0,0 +1,73 @@
+import os
+from datetime import timedelta
+
+from easyborg.fingerprint import FingerprintStore, compute_fingerprint
+
+
+def _create_tree(root):
+    (root / "folder" / "nested").mkdir(parents=True)
+    (root / "file.txt").write_text("foo")
+    (root / "folder" / "nested" / "deep.txt").write_text("bar")
+    return root
+
+
+def test_fingerprint_is_stable(tmp_path):
+    root = _create_tree(tmp_path / "root")
+
+    assert compute_fingerprint([root]) == compute_fingerprint([root], workers=1)
+
+
+def test_fingerprint_changes_if_file_is_modified_in_place(tmp_path):
+    root = _create_tree(tmp_path / "root")
+    before = compute_fingerprint([root])
+
+    deep = root / "folder" / "nested" / "deep.txt"
+    stat = deep.stat()
+    deep.write_text("baz")
+    os.utime(deep, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert compute_fingerprint([root]) != before
+
+
+def test_fingerprint_changes_if_file_is_added(tmp_path):
+    root = _create_tree(tmp_path / "root")
+    before = compute_fingerprint([root])
+
+    (root / "folder" / "new.txt").write_text("new")
+
+    assert compute_fingerprint([root]) != before
+
+
+def test_fingerprint_changes_if_paths_change(tmp_path):
+    root = _create_tree(tmp_path / "root")
+
+    assert compute_fingerprint([root]) != compute_fingerprint([root / "folder"])
+
+
+def test_fingerprint_covers_file_paths(tmp_path):
+    root = _create_tree(tmp_path / "root")
+    file = root / "file.txt"
+    before = compute_fingerprint([file])
+
+    file.unlink()
+
+    assert compute_fingerprint([file]) != before
+
+
+def test_store_detects_unchanged_fingerprint(tmp_path):
+    store = FingerprintStore(tmp_path / "state" / "fingerprints.json")
+
+    assert not store.is_unchanged("repo", "abc", max_age=timedelta(hours=1))
+
+    store.update("repo", "abc")
+
+    assert store.is_unchanged("repo", "abc", max_age=timedelta(hours=1))
+    assert not store.is_unchanged("repo", "def", max_age=timedelta(hours=1))
+    assert not store.is_unchanged("other", "abc", max_age=timedelta(hours=1))
+
+
+def test_store_expires_fingerprint_after_max_age(tmp_path):
+    store = FingerprintStore(tmp_path / "fingerprints.json")
+    store.update("repo", "abc")
+
+    assert not store.is_unchanged("repo", "abc", max_age=timedelta(0))
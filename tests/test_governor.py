@@ -0,0 +1,163 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from easyborg.governor import Governor
+from easyborg.model import GovernorSettings, WatchdogSettings
+from easyborg.process import run_sync, running_processes
+
+
+@pytest.fixture
+def roots(tmp_path: Path) -> tuple[Path, Path]:
+    proc_root = tmp_path / "proc"
+    (proc_root / "pressure").mkdir(parents=True)
+    (proc_root / "loadavg").write_text("0.50 0.40 0.30 1/100 12345\n")
+    _write_pressure(proc_root, "cpu", 1.0)
+    _write_pressure(proc_root, "io", 2.0)
+
+    sys_root = tmp_path / "sys"
+    _write_supply(sys_root, "AC", type="Mains", online="1")
+    _write_supply(sys_root, "BAT0", type="Battery", status="Charging", capacity="80")
+    return proc_root, sys_root
+
+
+def _write_pressure(proc_root: Path, resource: str, avg10: float) -> None:
+    (proc_root / "pressure" / resource).write_text(
+        f"some avg10={avg10:.2f} avg60=0.00 avg300=0.00 total=1000\nfull avg10=0.00 avg60=0.00 avg300=0.00 total=0\n"
+    )
+
+
+def _write_supply(sys_root: Path, name: str, **values: str) -> None:
+    supply = sys_root / "class" / "power_supply" / name
+    supply.mkdir(parents=True, exist_ok=True)
+    for key, value in values.items():
+        (supply / key).write_text(value + "\n")
+
+
+def _governor(roots: tuple[Path, Path], clock=lambda: 0.0, lock_wait=None, **settings) -> Governor:
+    proc_root, sys_root = roots
+    return Governor(
+        GovernorSettings(**settings), lock_wait=lock_wait, proc_root=proc_root, sys_root=sys_root, clock=clock
+    )
+
+
+def _reason(roots: tuple[Path, Path], **settings) -> str | None:
+    return _governor(roots, **settings).check()
+
+
+def test_check_passes_below_thresholds(roots):
+    governor = _governor(roots, max_load=1.0, max_cpu_pressure=10, max_io_pressure=10, min_battery=20)
+
+    assert governor.check() is None
+
+
+def test_check_reports_high_load(roots):
+    (roots[0] / "loadavg").write_text("8.00 4.00 2.00 1/100 12345\n")
+
+    assert _reason(roots, max_load=4.0) == "load average 8.00 > 4.0"
+
+
+def test_check_reports_io_pressure(roots):
+    _write_pressure(roots[0], "io", 42.5)
+
+    assert _reason(roots, max_io_pressure=20) == "IO pressure 42.5% > 20%"
+
+
+def test_check_ignores_missing_pressure(roots):
+    (roots[0] / "pressure" / "cpu").unlink()
+
+    assert _reason(roots, max_cpu_pressure=0) is None
+
+
+def test_check_reports_low_battery_when_discharging(roots):
+    _write_supply(roots[1], "BAT0", status="Discharging", capacity="15")
+
+    assert _reason(roots, min_battery=20) == "battery 15% < 20%"
+
+
+def test_check_ignores_battery_when_charging(roots):
+    _write_supply(roots[1], "BAT0", capacity="15")
+
+    assert _reason(roots, min_battery=20) is None
+
+
+def test_defer_waits_until_load_drops(roots):
+    (roots[0] / "loadavg").write_text("8.00 4.00 2.00 1/100 12345\n")
+    waits = []
+
+    def wait(seconds: float) -> None:
+        waits.append(seconds)
+        if len(waits) == 3:
+            (roots[0] / "loadavg").write_text("1.00 4.00 2.00 1/100 12345\n")
+
+    _governor(roots, max_load=4.0, poll_interval=10).defer(wait)
+
+    assert waits == [10, 10, 10]
+
+
+def test_defer_stops_waiting_at_deadline(roots):
+    (roots[0] / "loadavg").write_text("8.00 4.00 2.00 1/100 12345\n")
+    now = [0.0]
+
+    def wait(seconds: float) -> None:
+        now[0] += seconds
+
+    _governor(roots, clock=lambda: now[0], max_load=4.0, deadline=1, poll_interval=10).defer(wait)
+
+    assert now[0] == 60
+
+
+def test_supervise_pauses_and_resumes_processes(roots, monkeypatch):
+    (roots[0] / "loadavg").write_text("8.00 4.00 2.00 1/100 12345\n")
+    calls = []
+    monkeypatch.setattr("easyborg.governor.pause_processes", lambda: calls.append("pause"))
+    monkeypatch.setattr("easyborg.governor.resume_processes", lambda: calls.append("resume"))
+    governor = _governor(roots, mode="pause", max_load=4.0, poll_interval=0.01)
+
+    with governor.supervise():
+        while "pause" not in calls:
+            pass
+
+    assert calls[0] == "pause"
+    assert calls[-1] == "resume"
+
+
+def test_pause_is_interrupted_before_lock_wait(roots, monkeypatch):
+    (roots[0] / "loadavg").write_text("8.00 4.00 2.00 1/100 12345\n")
+    calls = []
+    monkeypatch.setattr("easyborg.governor.pause_processes", lambda: calls.append(("pause", time.monotonic())))
+    monkeypatch.setattr("easyborg.governor.resume_processes", lambda: calls.append(("resume", time.monotonic())))
+    governor = _governor(roots, clock=time.monotonic, lock_wait=0.2, mode="pause", max_load=4.0, poll_interval=0.05)
+
+    timeout = time.monotonic() + 5
+    with governor.supervise():
+        while [call for call, _ in calls].count("pause") < 2 and time.monotonic() < timeout:
+            time.sleep(0.01)
+
+    (_, paused), (resume, resumed), *_ = calls
+    assert resume == "resume"  # still loaded, but other clients must get the lock
+    assert resumed - paused < 0.2
+
+
+def test_paused_process_is_not_stopped_by_watchdog(roots):
+    governor = _governor(roots, mode="pause", max_load=4.0, poll_interval=0.01)
+
+    def busy_then_idle() -> None:
+        while not running_processes():
+            time.sleep(0.01)
+        time.sleep(0.1)
+        (roots[0] / "loadavg").write_text("8.00 4.00 2.00 1/100 12345\n")
+        time.sleep(1.5)  # far longer than the stall timeout of 0.6s
+        (roots[0] / "loadavg").write_text("0.50 0.40 0.30 1/100 12345\n")
+
+    load = threading.Thread(target=busy_then_idle)
+    load.start()
+    with governor.supervise():
+        script = "import time; time.sleep(0.3); print('done')"
+        output = run_sync([sys.executable, "-c", script], watchdog=WatchdogSettings(stall_timeout=0.01))
+    load.join()
+
+    assert output == ["done"]
@@ -0,0 +1,127 @@
+from pathlib import Path
+
+import pytest
+
+from easyborg.history import Run, RunHistory, percentile, recorded, run_from_error, run_from_stats
+from easyborg.process import ProcessError
+
+
+def _create(started: float, duration: float, deduplicated_size: int, success: bool = True) -> Run:
+    return Run(
+        repository="repo",
+        operation="create",
+        started=started,
+        duration=duration,
+        success=success,
+        original_size=deduplicated_size * 4,
+        compressed_size=deduplicated_size * 2,
+        deduplicated_size=deduplicated_size,
+        nfiles=1000,
+    )
+
+
+def test_runs_are_returned_oldest_first(tmp_path: Path):
+    history = RunHistory(tmp_path / "history.sqlite")
+    history.record(_create(2, 10, 0))
+    history.record(_create(1, 10, 0))
+    history.record(Run("other", "prune", 3, 1, True))
+
+    assert [run.started for run in history.runs("repo")] == [1, 2]
+    assert [run.operation for run in history.runs()] == ["create", "create", "prune"]
+
+
+def test_runs_without_database(tmp_path: Path):
+    history = RunHistory(tmp_path / "history.sqlite")
+
+    assert history.runs() == []
+    assert history.throughput("repo") is None
+    assert not (tmp_path / "history.sqlite").exists()
+
+
+def test_last_success_skips_failed_runs(tmp_path: Path):
+    history = RunHistory(tmp_path / "history.sqlite")
+    history.record(_create(1, 10, 0))
+    history.record(_create(2, 10, 0, success=False))
+
+    assert history.last_success("repo").started == 1
+
+
+def test_throughput_ignores_small_runs_for_data_rate(tmp_path: Path):
+    history = RunHistory(tmp_path / "history.sqlite")
+    history.record(_create(1, 10, 100_000_000))  # 10 MB/s
+    history.record(_create(2, 10, 300_000_000))  # 30 MB/s
+    history.record(_create(3, 1, 1000))  # too small
+
+    throughput = history.throughput("repo")
+
+    assert throughput.deduplicated_rate == 20_000_000
+    assert throughput.original_rate == 40_000_000  # median of all runs
+    assert throughput.compression_ratio == 0.5
+    assert throughput.runs == 3
+
+
+def test_run_from_stats_prefers_borg_duration():
+    run = run_from_stats("repo", "create", 1, 12.5, {"duration": 10.0, "original_size": 5, "nfiles": 2})
+
+    assert (run.duration, run.original_size, run.nfiles, run.deduplicated_size) == (10.0, 5, 2, None)
+
+
+def test_recorded_records_success_and_failure(tmp_path: Path):
+    history = RunHistory(tmp_path / "history.sqlite")
+    stats = {}
+
+    with recorded(history, "repo", "create", stats=stats):
+        stats["original_size"] = 1000
+    with pytest.raises(RuntimeError), recorded(history, "repo", "prune"):
+        raise RuntimeError("lock timeout")
+
+    create, prune = history.runs("repo")
+    assert create.success and create.original_size == 1000
+    assert not prune.success and prune.error == "lock timeout"
+    assert history.count("repo", "prune", success=False) == 1
+    assert history.count("repo", "create", success=False) == 0
+    assert history.count("repo", "create") == 1
+
+
+def test_run_from_error_keeps_exit_code():
+    run = run_from_error("repo", "create", 1, 2, ProcessError(2, "Failed to create/acquire the lock"))
+
+    assert not run.success
+    assert run.return_code == 2
+    assert "lock" in run.error
+
+
+def test_percentile():
+    assert percentile([5, 1, 3, 2, 4], 50) == 3
+    assert percentile([5, 1, 3, 2, 4], 90) == 5
+    assert percentile([7], 90) == 7
+
+
+def test_trend(tmp_path: Path):
+    history = RunHistory(tmp_path / "history.sqlite")
+    for started in range(6):
+        history.record(_create(started, 10, 1000))  # 400 bytes/s
+    history.record(_create(6, 10, 0, success=False))
+    history.record(_create(7, 40, 1000))  # 100 bytes/s
+
+    trend = history.trend("repo")
+
+    assert trend.runs == 8
+    assert trend.failures == 1
+    assert trend.durations == (10, 40, 40)
+    assert trend.rate == 400  # median of the recent half
+    assert trend.previous_rate == 400
+    assert trend.deduplication_ratio == 0.25
+    assert trend.regression
+    assert history.trend("repo", "prune") is None
+    history.record(Run("repo", "prune", 8, 1, False))
+    assert history.trend("repo", "prune").durations is None
+    assert history.repositories() == [("repo", "create"), ("repo", "prune")]
+
+
+def test_trend_needs_enough_runs_for_regression(tmp_path: Path):
+    history = RunHistory(tmp_path / "history.sqlite")
+    history.record(_create(1, 10, 1000))
+    history.record(_create(2, 40, 1000))
+
+    assert not history.trend("repo").regression
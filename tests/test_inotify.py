@@ -0,0 +1,64 @@
+import sys
+
+import pytest
+
+from easyborg.inotify import TreeWatcher
+
+pytestmark = pytest.mark.skipif(sys.platform != "linux", reason="inotify is Linux only")
+
+
+def test_reports_changed_file(tmp_path):
+    (tmp_path / "folder").mkdir()
+
+    with TreeWatcher([tmp_path]) as watcher:
+        (tmp_path / "folder" / "file.txt").write_text("foo")
+
+        changes = watcher.read(timeout=1)
+
+    assert tmp_path / "folder" / "file.txt" in changes
+
+
+def test_watches_directories_created_later(tmp_path):
+    with TreeWatcher([tmp_path]) as watcher:
+        (tmp_path / "new").mkdir()
+        assert tmp_path / "new" in watcher.read(timeout=1)
+
+        (tmp_path / "new" / "file.txt").write_text("foo")
+        assert tmp_path / "new" / "file.txt" in watcher.read(timeout=1)
+
+
+def test_returns_nothing_without_changes(tmp_path):
+    with TreeWatcher([tmp_path]) as watcher:
+        assert watcher.read(timeout=0) == []
+
+
+def test_reports_file_root_replaced_by_atomic_save(tmp_path):
+    root = tmp_path / "notes.txt"
+    root.write_text("foo")
+    (tmp_path / "other.txt").write_text("foo")
+
+    with TreeWatcher([root]) as watcher:
+        temp = tmp_path / "notes.txt.tmp"
+        temp.write_text("bar")
+        temp.replace(root)
+        assert root in watcher.read(timeout=1)
+
+        root.write_text("baz")  # still watched after the replacement
+        (tmp_path / "other.txt").write_text("bar")
+        changes = watcher.read(timeout=1)
+
+    assert root in changes
+    assert tmp_path / "other.txt" not in changes
+
+
+def test_watches_recreated_root(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+
+    with TreeWatcher([root]) as watcher:
+        root.rmdir()
+        root.mkdir()
+        assert root in watcher.read(timeout=1)
+
+        (root / "file.txt").write_text("foo")
+        assert root / "file.txt" in watcher.read(timeout=1)
@@ -0,0 +1,113 @@
+import os
+
+import pytest
+
+from easyborg.journal import ChangeJournal
+
+
+@pytest.fixture(autouse=True)
+def trust_recent_changes(monkeypatch):
+    monkeypatch.setattr("easyborg.journal.RACY_NS", 0)  # test directories are always modified recently
+
+
+def _create_tree(root):
+    (root / "folder" / "nested").mkdir(parents=True)
+    (root / "file.txt").write_text("foo")
+    (root / "folder" / "nested" / "deep.txt").write_text("bar")
+    return root
+
+
+def test_collects_all_paths(tmp_path):
+    root = _create_tree(tmp_path / "root")
+    journal = ChangeJournal(tmp_path / "journal.json")
+
+    assert sorted(journal.collect([root])) == sorted(
+        str(p)
+        for p in [
+            root,
+            root / "file.txt",
+            root / "folder",
+            root / "folder" / "nested",
+            root / "folder" / "nested" / "deep.txt",
+        ]
+    )
+
+
+def test_paths_are_sorted_parent_first_and_depth_first(tmp_path):
+    root = tmp_path / "root"
+    for name in ("a", "a-b", "b"):
+        for child in ("x", "y"):
+            (root / name / child).mkdir(parents=True)
+            (root / name / child / "file").write_text("foo")
+    journal = ChangeJournal(tmp_path / "journal.json", workers=4)
+
+    expected = [str(root)]
+    for name in ("a", "a-b", "b"):
+        expected.append(str(root / name))
+        for child in ("x", "y"):
+            expected.extend([str(root / name / child), str(root / name / child / "file")])
+    assert journal.collect([root]) == expected
+
+
+def test_collects_file_roots(tmp_path):
+    root = _create_tree(tmp_path / "root")
+    journal = ChangeJournal(tmp_path / "journal.json")
+
+    assert journal.collect([root / "file.txt", root / "missing.txt"]) == [str(root / "file.txt")]
+
+
+def test_picks_up_changes(tmp_path):
+    root = _create_tree(tmp_path / "root")
+    journal = ChangeJournal(tmp_path / "journal.json")
+    journal.collect([root])
+
+    (root / "folder" / "nested" / "deep.txt").rename(root / "folder" / "nested" / "renamed.txt")
+    (root / "folder" / "new").mkdir()
+    (root / "folder" / "new" / "new.txt").write_text("new")
+    (root / "file.txt").unlink()
+
+    paths = journal.collect([root])
+
+    assert str(root / "folder" / "nested" / "renamed.txt") in paths
+    assert str(root / "folder" / "new" / "new.txt") in paths
+    assert str(root / "folder" / "nested" / "deep.txt") not in paths
+    assert str(root / "file.txt") not in paths
+
+
+def test_lists_only_changed_directories(tmp_path, monkeypatch):
+    root = _create_tree(tmp_path / "root")
+    journal = ChangeJournal(tmp_path / "journal.json")
+    journal.collect([root])
+
+    (root / "folder" / "nested" / "new.txt").write_text("new")
+
+    listed = []
+    scandir = os.scandir
+
+    def recording_scandir(path):
+        listed.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", recording_scandir)
+
+    assert str(root / "folder" / "nested" / "new.txt") in journal.collect([root])
+    assert listed == [str(root / "folder" / "nested")]
+
+
+def test_does_not_trust_recently_modified_directories(tmp_path, monkeypatch):
+    monkeypatch.setattr("easyborg.journal.RACY_NS", 60_000_000_000)
+    root = _create_tree(tmp_path / "root")
+    journal = ChangeJournal(tmp_path / "journal.json")
+    journal.collect([root])
+
+    listed = []
+    scandir = os.scandir
+
+    def recording_scandir(path):
+        listed.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", recording_scandir)
+    journal.collect([root])
+
+    assert len(listed) == 3
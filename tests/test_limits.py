@@ -0,0 +1,92 @@
+import os
+import resource
+
+import pytest
+
+from easyborg.limits import command_prefix, describe, validate
+from easyborg.model import ResourceLimits
+from easyborg.process import run_sync
+
+
+def test_run_sync_applies_nice_level():
+    current = os.getpriority(os.PRIO_PROCESS, 0)
+
+    lines = run_sync(["sh", "-c", "nice"], limits=ResourceLimits(nice=current + 5))
+
+    assert lines == [str(current + 5)]
+
+
+def test_run_sync_ignores_lower_nice_level_without_privileges():
+    if os.geteuid() == 0:
+        pytest.skip("root may lower the nice level")
+    current = os.getpriority(os.PRIO_PROCESS, 0)
+
+    lines = run_sync(["sh", "-c", "nice"], limits=ResourceLimits(nice=current - 1))
+
+    assert lines == [str(current)]
+
+
+def test_run_sync_applies_rlimit():
+    lines = run_sync(["sh", "-c", "ulimit -n"], limits=ResourceLimits(rlimits={"nofile": 64}))
+
+    assert lines == ["64"]
+
+
+def test_run_sync_does_not_change_parent_limits():
+    before = resource.getrlimit(resource.RLIMIT_NOFILE)
+
+    run_sync(["true"], limits=ResourceLimits(rlimits={"nofile": 64}))
+
+    assert resource.getrlimit(resource.RLIMIT_NOFILE) == before
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_getaffinity"), reason="CPU affinity not supported")
+def test_run_sync_applies_cpu_affinity():
+    cpu = min(os.sched_getaffinity(0))
+
+    lines = run_sync(
+        ["python3", "-c", "import os; print(sorted(os.sched_getaffinity(0)))"],
+        limits=ResourceLimits(cpu_affinity=(cpu,)),
+    )
+
+    assert lines == [f"[{cpu}]"]
+
+
+def test_command_prefix_for_idle_class_has_no_level(monkeypatch):
+    monkeypatch.setattr("shutil.which", lambda name: "/usr/bin/ionice")
+
+    assert command_prefix(ResourceLimits(ionice_class="idle", ionice_level=3)) == ["/usr/bin/ionice", "-c", "3"]
+    assert command_prefix(ResourceLimits(ionice_class="best-effort", ionice_level=7)) == [
+        "/usr/bin/ionice",
+        "-c",
+        "2",
+        "-n",
+        "7",
+    ]
+
+
+def test_command_prefix_without_ionice(monkeypatch):
+    monkeypatch.setattr("shutil.which", lambda name: None)
+
+    assert command_prefix(ResourceLimits(ionice_class="idle")) == []
+
+
+def test_validate_rejects_unknown_values():
+    with pytest.raises(RuntimeError, match="I/O scheduling class"):
+        validate(ResourceLimits(ionice_class="lazy"))
+    with pytest.raises(RuntimeError, match="resource limit"):
+        validate(ResourceLimits(rlimits={"bananas": 1}))
+
+
+def test_describe_lists_configured_limits_only():
+    assert describe(ResourceLimits()) == []
+    assert describe(ResourceLimits(upload_ratelimit=1000)) == [("Upload rate limit", "1000 KiB/s")]
+
+
+def test_command_prefix_chains_limit_commands(monkeypatch):
+    monkeypatch.setattr("shutil.which", lambda name: f"/usr/bin/{name}")
+    current = os.getpriority(os.PRIO_PROCESS, 0)
+
+    prefix = command_prefix(ResourceLimits(nice=current + 2, rlimits={"nofile": 64}, ionice_class="idle"))
+
+    assert prefix == ["/usr/bin/prlimit", "--nofile=64:", "/usr/bin/nice", "-n", "2", "/usr/bin/ionice", "-c", "3"]
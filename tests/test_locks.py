@@ -0,0 +1,99 @@
+import json
+import os
+import subprocess
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from easyborg.locks import LockHolder, break_stale_lock, host_id, local_path, lock_holders, wait
+from easyborg.model import Repository, RepositoryType
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Repository:
+    return Repository("repo", str(tmp_path), RepositoryType.BACKUP)
+
+
+def write_roster(repo: Repository, *, exclusive=(), shared=()) -> None:
+    roster = {"exclusive": [list(holder) for holder in exclusive], "shared": [list(holder) for holder in shared]}
+    (Path(repo.url) / "lock.roster").write_text(json.dumps(roster))
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return process.pid
+
+
+def test_local_path():
+    def path(url: str) -> Path | None:
+        return local_path(Repository("repo", url, RepositoryType.BACKUP))
+
+    assert path("/backup") == Path("/backup")
+    assert path("file:///backup") == Path("/backup")
+    assert path("ssh://user@example.com/./backup") is None
+    assert path("user@example.com:backup") is None
+
+
+def test_lock_holders(repo):
+    assert lock_holders(repo) == []
+
+    write_roster(repo, exclusive=[("other.example.com@1234", 42, 0)])
+
+    holders = lock_holders(repo)
+    assert holders == [LockHolder("other.example.com@1234", 42, True)]
+    assert str(holders[0]) == "other.example.com/42"
+    assert not holders[0].is_local()
+
+
+def test_lock_holders_of_remote_repository_are_unknown():
+    assert lock_holders(Repository("repo", "ssh://example.com/./backup", RepositoryType.BACKUP)) is None
+
+
+def test_stale_lock_is_broken(repo):
+    write_roster(repo, exclusive=[(host_id(), dead_pid(), 0)])
+    borg = Mock()
+
+    assert break_stale_lock(borg, repo)
+    borg.break_lock.assert_called_once_with(repo)
+
+
+def test_lock_of_running_or_remote_process_is_kept(repo):
+    borg = Mock()
+
+    write_roster(repo, shared=[(host_id(), os.getpid(), 0)])
+    assert not break_stale_lock(borg, repo)
+
+    write_roster(repo, exclusive=[("other.example.com@1234", dead_pid(), 0)])
+    assert not break_stale_lock(borg, repo)
+
+    borg.break_lock.assert_not_called()
+
+
+def test_wait_reports_holder_until_released(repo):
+    write_roster(repo, exclusive=[("other.example.com@1234", 42, 0)])
+    now = [0.0]
+
+    def sleep(seconds: float) -> None:
+        now[0] += seconds
+        if now[0] >= 3:
+            (Path(repo.url) / "lock.roster").unlink()
+
+    events = list(wait(repo, clock=lambda: now[0], sleep=sleep))
+
+    assert [event.message for event in events] == [
+        "Waiting for lock held by other.example.com/42 (0s)",
+        "Waiting for lock held by other.example.com/42 (1s)",
+        "Waiting for lock held by other.example.com/42 (2s)",
+    ]
+
+
+def test_wait_gives_up_after_timeout(repo):
+    write_roster(repo, exclusive=[("other.example.com@1234", 42, 0)])
+    now = [0.0]
+
+    def sleep(seconds: float) -> None:
+        now[0] += seconds
+
+    assert len(list(wait(repo, timeout=5, clock=lambda: now[0], sleep=sleep))) == 5
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from easyborg.history import Run, RunHistory
+from easyborg.metrics import TextfileExporter, render
+from easyborg.model import Repository, RepositoryType
+
+REPO = Repository("local", "/backup", RepositoryType.BACKUP)
+
+
+def test_render_reports_last_snapshot_and_failures(tmp_path: Path):
+    history = RunHistory(tmp_path / "history.sqlite")
+    history.record(Run("local", "create", 1000, 60, True, 4000, 2000, 1000, 10))
+    history.record(Run("local", "create", 2000, 30, False, error="boom"))
+    history.record(Run("local", "prune", 1060, 5, True))
+
+    text = render(history, [REPO], profile="default")
+
+    assert '# TYPE easyborg_last_success_timestamp_seconds gauge\n' in text
+    assert 'easyborg_last_success_timestamp_seconds{profile="default",repository="local"} 1060.0\n' in text
+    assert 'easyborg_last_duration_seconds{profile="default",repository="local",operation="create"} 60.0\n' in text
+    assert 'easyborg_last_duration_seconds{profile="default",repository="local",operation="prune"} 5.0\n' in text
+    assert 'easyborg_last_deduplicated_bytes{profile="default",repository="local"} 1000\n' in text
+    assert 'easyborg_last_files{profile="default",repository="local"} 10\n' in text
+    assert 'easyborg_failures_total{profile="default",repository="local",operation="create"} 1\n' in text
+    assert 'easyborg_failures_total{profile="default",repository="local",operation="prune"} 0\n' in text
+
+
+def test_render_without_history(tmp_path: Path):
+    text = render(RunHistory(tmp_path / "history.sqlite"), [REPO], profile='say "hi"')
+
+    assert "easyborg_last_success_timestamp_seconds" not in text
+    assert 'easyborg_failures_total{profile="say \\"hi\\"",repository="local",operation="create"} 0\n' in text
+
+
+def test_export_replaces_file(tmp_path: Path):
+    path = tmp_path / "textfile" / "easyborg.prom"
+    exporter = TextfileExporter(path, RunHistory(tmp_path / "history.sqlite"), profile="default")
+
+    exporter.export([REPO])
+    exporter.export([REPO])
+
+    assert "easyborg_failures_total" in path.read_text()
+    assert [p.name for p in path.parent.iterdir()] == ["easyborg.prom"]
@@ -4,6 +4,7 @@ from typing import Any
 
 import pytest
 
+from easyborg.model import ProgressEvent
 from easyborg.progress_parser import parse_progress
 
 
@@ -31,6 +32,24 @@ def test_parses_events():
     assert event.current == 50
 
 
+def test_parses_create_progress():
+    lines = _to_iterator(
+        {
+            "type": "archive_progress",
+            "original_size": 4096,
+            "compressed_size": 1024,
+            "deduplicated_size": 512,
+            "nfiles": 3,
+            "path": "home/user/file.txt",
+            "time": 1700000000.0,
+            "finished": False,
+        }
+    )
+
+    result = list(parse_progress(lines))
+    assert result == [ProgressEvent(total=None, current=4096, message="home/user/file.txt")]
+
+
 def test_skips_events_without_information():
     # this occurs at the start of extract
     lines = _to_iterator(
@@ -0,0 +1,209 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from easyborg.model import WatchdogSettings
+from easyborg.process import (
+    ProcessError,
+    ProcessUsage,
+    ProducerError,
+    WatchdogError,
+    _Accounting,
+    _read_io,
+    add_usage_handler,
+    pause_processes,
+    remove_usage_handler,
+    resume_processes,
+    run_async,
+    run_pipeline,
+    run_sync,
+    running_processes,
+    set_default_tags,
+)
+
+
+@pytest.fixture
+def usages():
+    records: list[ProcessUsage] = []
+    add_usage_handler(records.append)
+    yield records
+    remove_usage_handler(records.append)
+    set_default_tags({})
+
+
+def test_run_sync_writes_input_lines():
+    assert run_sync(["cat"], input_lines=["foo", "bar"]) == ["foo", "bar"]
+
+
+def test_run_sync_writes_large_input_without_deadlock():
+    lines = [f"line {i}" for i in range(100_000)]
+
+    assert run_sync(["cat"], input_lines=lines) == lines
+
+
+def test_run_sync_writes_input_with_custom_delimiter():
+    assert run_sync(["tr", "\\0", "\\n"], input_lines=["foo", "bar"], input_delimiter="\0") == ["foo", "bar"]
+
+
+def test_run_async_tracks_running_processes():
+    lines = run_async(["echo", "foo"])
+
+    assert next(lines) == "foo"
+    assert len(running_processes()) == 1
+    assert list(lines) == []
+    assert running_processes() == []
+
+
+def test_run_pipeline_connects_processes(tmp_path):
+    target = tmp_path / "out"
+
+    run_pipeline(["printf", "foo\nbar\n"], ["sh", "-c", f"cat > {target}"])
+
+    assert target.read_text() == "foo\nbar\n"
+    assert running_processes() == []
+
+
+def test_run_pipeline_reports_failing_producer():
+    with pytest.raises(ProcessError, match="broken"):
+        run_pipeline(["sh", "-c", "echo broken >&2; exit 3"], ["cat"])
+
+
+def test_run_pipeline_reports_failing_consumer():
+    with pytest.raises(ProcessError, match="full") as e:
+        run_pipeline(["yes"], ["sh", "-c", "head -c 10 > /dev/null; echo full >&2; exit 2"])
+
+    assert e.value.return_code == 2
+
+
+def test_run_sync_reads_input_from_command():
+    assert run_sync(["tr", "a-z", "A-Z"], stdin_command=["printf", "foo\nbar\n"]) == ["FOO", "BAR"]
+    assert running_processes() == []
+
+
+def test_run_sync_reports_failing_input_command():
+    with pytest.raises(ProducerError, match="dump failed") as e:
+        run_sync(["cat"], stdin_command=["sh", "-c", "echo partial; echo dump failed >&2; exit 4"])
+
+    assert e.value.return_code == 4
+
+
+def test_run_sync_reports_resource_usage(usages, tmp_path):
+    set_default_tags({"profile": "default", "repository": "other"})
+    command = ["sh", "-c", f"head -c 100000 /dev/zero > {tmp_path / 'out'}"]
+
+    run_sync(command, tags={"repository": "local"})
+
+    [usage] = usages
+    assert usage.command == tuple(command)
+    assert usage.tags == {"profile": "default", "repository": "local"}
+    assert usage.return_code == 0
+    assert usage.wall_time > 0
+    assert usage.max_rss > 0
+    if sys.platform == "linux":
+        assert usage.write_chars >= 100000
+
+
+def test_run_sync_reports_resource_usage_of_failed_process(usages):
+    with pytest.raises(ProcessError):
+        run_sync(["sh", "-c", "exit 3"])
+
+    assert [usage.return_code for usage in usages] == [3]
+
+
+def test_run_pipeline_reports_resource_usage_of_both_processes(usages):
+    run_pipeline(["echo", "foo"], ["cat"], tags={"repository": "local"})
+
+    assert sorted(usage.command[0] for usage in usages) == ["cat", "echo"]
+    assert all(usage.tags == {"repository": "local"} for usage in usages)
+
+
+def test_return_code_is_kept_if_process_is_reaped_by_poll(usages, monkeypatch):
+    process = subprocess.Popen(["false"])
+
+    def poll_then_read_io(pid: int) -> dict[str, int]:
+        assert process.poll() == 1  # e.g. the watchdog reaps the process first
+        return _read_io(pid)
+
+    monkeypatch.setattr("easyborg.process._read_io", poll_then_read_io)
+
+    assert _Accounting(["false"], time.monotonic(), None).wait(process) == 1
+    assert usages == []
+
+
+def test_waited_process_is_not_reaped_again(usages):
+    process = subprocess.Popen(["false"])
+    process.wait()
+
+    assert _Accounting(["false"], time.monotonic(), None).wait(process) == 1
+    assert process.returncode == 1
+    assert usages == []
+
+
+def test_watchdog_interrupts_stalled_process():
+    started = time.monotonic()
+
+    with pytest.raises(WatchdogError, match="no progress") as e:
+        run_sync(["sh", "-c", "echo start; exec sleep 10"], watchdog=WatchdogSettings(stall_timeout=0.005, grace=5))
+
+    assert e.value.return_code != 0
+    assert time.monotonic() - started < 5  # SIGINT was enough
+    assert running_processes() == []
+
+
+def test_watchdog_escalates_to_sigkill():
+    script = "trap '' INT TERM; echo start; while true; do sleep 0.1; done"
+    watchdog = WatchdogSettings(max_duration=0.005, grace=0.2)
+
+    with pytest.raises(WatchdogError, match="more than 0.005 minutes") as e:
+        run_sync(["sh", "-c", script], watchdog=watchdog)
+
+    assert e.value.return_code == -9
+
+
+def test_watchdog_does_not_count_paused_time():
+    results = []
+
+    def backup() -> None:
+        script = "import time; time.sleep(0.3); print('done')"
+        results.append(run_sync([sys.executable, "-c", script], watchdog=WatchdogSettings(stall_timeout=0.01)))
+
+    thread = threading.Thread(target=backup)
+    thread.start()
+    while not running_processes():
+        time.sleep(0.01)
+    time.sleep(0.1)  # the watchdog starts right after the process
+    pause_processes()
+    time.sleep(1.5)  # far longer than the stall timeout of 0.6s
+    resume_processes()
+    thread.join()
+
+    assert results == [["done"]]
+
+
+def test_watchdog_keeps_process_making_progress():
+    script = "for i in 1 2 3 4 5 6; do echo $i; sleep 0.1; done"
+
+    assert len(run_sync(["sh", "-c", script], watchdog=WatchdogSettings(stall_timeout=0.005))) == 6
+
+
+def test_watchdog_stops_both_processes_of_stalled_pipeline():
+    watchdog = WatchdogSettings(stall_timeout=0.005, grace=5)
+
+    with pytest.raises(WatchdogError, match="no progress") as e:
+        run_pipeline(["sleep", "10"], ["sh", "-c", "echo start >&2; cat > /dev/null"], watchdog=watchdog)
+
+    assert e.value.return_code != 0
+    assert not running_processes()
+
+
+def test_run_pipeline_keeps_only_log_messages_of_json_output():
+    script = (
+        """echo '{"type": "archive_progress"}' >&2; """
+        """echo '{"type": "log_message", "message": "full"}' >&2; exit 2"""
+    )
+
+    with pytest.raises(ProcessError, match="exit code 2: full$"):
+        run_pipeline(["true"], ["sh", "-c", script], log_json=True)
@@ -0,0 +1,35 @@
+import pstats
+from pathlib import Path
+
+from easyborg import profiling
+from easyborg.process import run_sync
+
+
+def test_span_and_mark_do_nothing_without_profiling():
+    items = ["a", "b"]
+
+    with profiling.span("phase"):
+        profiling.mark("point")
+
+    assert profiling.traced(items, "input") is items
+    assert profiling.finish(Path("/nonexistent")) is None
+
+
+def test_profiler_writes_report_and_statistics(tmp_path: Path):
+    profiling.start("extract")
+    try:
+        with profiling.span("load configuration"):
+            sum(range(1000))
+        assert list(profiling.traced(iter(["a", "b"]), "fzf input")) == ["a", "b"]
+        run_sync(["echo", "foo"])
+    finally:
+        report_path, stats_path = profiling.finish(tmp_path)
+
+    report = report_path.read_text()
+    assert report.startswith("easyborg extract: ")
+    assert "load configuration" in report
+    assert "fzf input: first item" in report
+    assert "fzf input: last item (2 items)" in report
+    assert "echo foo" in report
+    assert "Python memory: peak" in report
+    assert pstats.Stats(str(stats_path)).total_calls > 0
@@ -0,0 +1,36 @@
+from easyborg.model import Repository, RepositoryType, Snapshot
+from easyborg.replication import missing, pending
+
+PRIMARY = Repository("primary", "/primary", RepositoryType.BACKUP)
+MIRROR = Repository("mirror", "/mirror", RepositoryType.BACKUP)
+
+
+def _snapshots(repo: Repository, *names: str) -> list[Snapshot]:
+    return [Snapshot(repo, name) for name in names]
+
+
+def test_pending_returns_snapshots_newer_than_the_mirror():
+    source = _snapshots(PRIMARY, "2025-01-03T00:00:00-c", "2025-01-01T00:00:00-a", "2025-01-02T00:00:00-b")
+    target = _snapshots(MIRROR, "2025-01-01T00:00:00-a")
+
+    assert [snap.name for snap in pending(source, target)] == ["2025-01-02T00:00:00-b", "2025-01-03T00:00:00-c"]
+
+
+def test_pending_copies_everything_to_an_empty_mirror():
+    source = _snapshots(PRIMARY, "2025-01-01T00:00:00-a")
+
+    assert pending(source, []) == source
+
+
+def test_pending_ignores_partial_snapshots():
+    source = _snapshots(PRIMARY, "2025-01-01T00:00:00-a", "2025-01-02T00:00:00-b")
+    target = _snapshots(MIRROR, "2025-01-01T00:00:00-a", "2025-01-02T00:00:00-b.partial")
+
+    assert [snap.name for snap in pending(source, target)] == ["2025-01-02T00:00:00-b"]
+
+
+def test_missing_returns_all_snapshots_not_in_target():
+    source = _snapshots(PRIMARY, "2025-01-02T00:00:00-b", "2025-01-01T00:00:00-a", "2025-01-03T00:00:00-c")
+    target = _snapshots(MIRROR, "2025-01-02T00:00:00-b")
+
+    assert [snap.name for snap in missing(source, target)] == ["2025-01-01T00:00:00-a", "2025-01-03T00:00:00-c"]
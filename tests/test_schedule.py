@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from easyborg.schedule import (
+    ScheduleState,
+    cron_expression,
+    exclusive_run,
+    host_offset,
+    is_due,
+    latest_slot,
+    next_slot,
+)
+
+
+def _at(hour: int, minute: int, day: int = 2) -> datetime:
+    return datetime(2026, 1, day, hour, minute).astimezone()
+
+
+def test_host_offset_is_deterministic():
+    assert host_offset("default", 60, hostname="a") == host_offset("default", 60, hostname="a")
+    assert 0 <= host_offset("default", 60, hostname="a") < 60
+
+
+def test_host_offset_spreads_hosts():
+    offsets = {host_offset("default", 60, hostname=f"host-{i}") for i in range(40)}
+    assert len(offsets) > 10
+
+
+def test_cron_expression():
+    assert cron_expression(60, 0) == "0 * * * *"
+    assert cron_expression(60, 17) == "17 * * * *"
+    assert cron_expression(15, 7) == "7,22,37,52 * * * *"
+    assert cron_expression(360, 125) == "5 2,8,14,20 * * *"
+
+
+def test_cron_expression_rejects_unsupported_interval():
+    with pytest.raises(RuntimeError, match="Unsupported schedule interval"):
+        cron_expression(7, 0)
+    with pytest.raises(RuntimeError, match="Unsupported schedule interval"):
+        cron_expression(420, 0)
+
+
+def test_latest_and_next_slot():
+    assert latest_slot(_at(13, 20), 60, 17) == _at(13, 17)
+    assert latest_slot(_at(13, 10), 60, 17) == _at(12, 17)
+    assert latest_slot(_at(0, 10), 120, 37) == _at(22, 37, day=1)
+    assert next_slot(_at(13, 20), 60, 17) == _at(14, 17)
+
+
+def test_is_due_coalesces_missed_runs():
+    assert is_due(None, _at(13, 20), 60, 17)
+    assert not is_due(_at(13, 18), _at(13, 40), 60, 17)
+
+    # asleep from 13:18 to 17:40 -> due once
+    assert is_due(_at(13, 18), _at(17, 40), 60, 17)
+    assert not is_due(_at(17, 40), _at(17, 45), 60, 17)
+
+
+def test_schedule_state(tmp_path):
+    state = ScheduleState(tmp_path / "schedule.json")
+    assert state.last_run() is None
+
+    when = _at(13, 18)
+    state.record_run(when)
+
+    assert state.last_run() == when
+
+
+def test_exclusive_run(tmp_path):
+    lock_file = tmp_path / "schedule.lock"
+
+    with exclusive_run(lock_file) as first:
+        assert first
+        with exclusive_run(lock_file) as second:
+            assert not second
+
+    with exclusive_run(lock_file) as third:
+        assert third
+
+
+def test_is_due_uses_offset_minutes():
+    last = _at(13, 17) - timedelta(seconds=1)
+    assert is_due(last, _at(13, 17), 60, 17)
@@ -0,0 +1,65 @@
+from pathlib import Path
+
+from easyborg.model import Repository, RepositoryType
+from easyborg.sharding import ShardAssignments, balance, shard_repositories, units, with_shards
+
+REPO = Repository("share", "ssh://host/./share/", RepositoryType.BACKUP, shards=2)
+
+
+def test_shard_repositories():
+    shards = shard_repositories(REPO)
+
+    assert [(shard.name, shard.url, shard.shards) for shard in shards] == [
+        ("share-1", "ssh://host/./share/shard-1", 0),
+        ("share-2", "ssh://host/./share/shard-2", 0),
+    ]
+    assert set(with_shards({"share": REPO})) == {"share", "share-1", "share-2"}
+
+
+def test_units_are_the_entries_below_the_backup_paths(tmp_path: Path):
+    (tmp_path / "share" / "a").mkdir(parents=True)
+    (tmp_path / "share" / "b.txt").write_text("b")
+    (tmp_path / "empty").mkdir()
+    (tmp_path / "file.txt").write_text("file")
+
+    result = units([tmp_path / "share", tmp_path / "empty", tmp_path / "file.txt"])
+
+    assert result == [tmp_path / "share" / "a", tmp_path / "share" / "b.txt", tmp_path / "empty", tmp_path / "file.txt"]
+
+
+def test_balance_distributes_largest_units_first():
+    assignment = balance({"a": 10, "b": 6, "c": 5, "d": 1}, 2)
+
+    assert assignment == {"a": 0, "b": 1, "c": 1, "d": 0}
+
+
+def test_balance_keeps_existing_assignment():
+    assignment = balance({"a": 10, "b": 6, "new": 3}, 2, assignment={"a": 1, "b": 0, "gone": 0}, loads=[6, 10])
+
+    assert assignment == {"a": 1, "b": 0, "new": 0}
+
+
+def test_dry_run_does_not_save_assignments(tmp_path: Path):
+    share = tmp_path / "share"
+    (share / "a").mkdir(parents=True)
+    assignments = ShardAssignments(tmp_path / "shards.json")
+
+    assert assignments.assign(REPO, [share], dry_run=True) == [[share / "a"], []]
+    assert not (tmp_path / "shards.json").exists()
+
+
+def test_assignments_are_stable(tmp_path: Path):
+    share = tmp_path / "share"
+    for name, size in (("a", 300), ("b", 200), ("c", 100)):
+        (share / name).mkdir(parents=True)
+        (share / name / "data").write_bytes(b"x" * size)
+    assignments = ShardAssignments(tmp_path / "shards.json")
+
+    assert assignments.assign(REPO, [share]) == [[share / "a"], [share / "b", share / "c"]]
+
+    (share / "d").mkdir()
+    (share / "d" / "data").write_bytes(b"x" * 1000)
+    (share / "a" / "data").write_bytes(b"x")  # sizes of assigned units aren't measured again
+    assignments.update_loads(REPO.name, [5000, None])  # e.g. shard 1 grew
+
+    assert assignments.assign(REPO, [share]) == [[share / "a"], [share / "b", share / "c", share / "d"]]
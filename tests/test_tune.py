@@ -0,0 +1,68 @@
+from pathlib import Path
+
+from easyborg.model import Repository, RepositoryType, ResourceLimits
+from easyborg.tune import EDIT_SIZE, Measurement, best, change_files, is_remote, sample_files, upload_speed
+
+
+def _measurement(compression: str, seconds: float, deduplicated_size: int) -> Measurement:
+    return Measurement(compression, "buzhash,19,23,21,4095", seconds, 100_000_000, deduplicated_size)
+
+
+def test_sample_files_limits_total_size(tmp_path: Path):
+    for i in range(20):
+        (tmp_path / f"file-{i}").write_bytes(b"x" * 1000)
+    (tmp_path / "empty").touch()
+
+    sample = sample_files([tmp_path], max_bytes=5000, seed=1)
+
+    assert len(sample) == 5
+    assert tmp_path / "empty" not in sample
+
+
+def test_sample_files_includes_oversized_file_if_nothing_else(tmp_path: Path):
+    (tmp_path / "huge").write_bytes(b"x" * 10_000)
+
+    assert sample_files([tmp_path], max_bytes=5000) == [tmp_path / "huge"]
+
+
+def test_change_files_inserts_bytes(tmp_path: Path):
+    (tmp_path / "sample").mkdir()
+    (tmp_path / "changed").mkdir()
+    original = tmp_path / "sample" / "file"
+    original.write_bytes(bytes(range(256)) * 10)
+
+    [changed] = change_files([original], tmp_path / "changed", seed=1)
+
+    data, content = original.read_bytes(), changed.read_bytes()
+    assert len(content) == len(data) + EDIT_SIZE
+    offset = next((i for i, (a, b) in enumerate(zip(data, content, strict=False)) if a != b), len(data))
+    assert content[:offset] == data[:offset]
+    assert content[offset + EDIT_SIZE :] == data[offset:]
+
+
+def test_is_remote():
+    assert not is_remote(Repository("local", "/backup", RepositoryType.BACKUP))
+    assert is_remote(Repository("ssh", "ssh://user@example.com/./backup", RepositoryType.BACKUP))
+    assert is_remote(Repository("scp", "user@example.com:backup", RepositoryType.BACKUP))
+
+
+def test_upload_speed_prefers_rate_limit():
+    limits = ResourceLimits(upload_ratelimit=100)
+    repo = Repository("ssh", "ssh://example.com/backup", RepositoryType.BACKUP, limits=limits)
+
+    assert upload_speed(repo) == 102_400
+
+
+def test_best_prefers_fast_compression_for_fast_repositories():
+    fast = _measurement("lz4", seconds=1, deduplicated_size=60_000_000)
+    strong = _measurement("zstd,10", seconds=10, deduplicated_size=40_000_000)
+
+    assert best([fast, strong], speed=200_000_000) is fast
+    assert best([fast, strong], speed=1_000_000) is strong
+
+
+def test_best_counts_changes_of_next_version():
+    large_chunks = Measurement("lz4", "buzhash,19,23,21,4095", 1, 100_000_000, 60_000_000, update_size=20_000_000)
+    small_chunks = Measurement("lz4", "buzhash,14,20,16,4095", 2, 100_000_000, 60_000_000, update_size=1_000_000)
+
+    assert best([large_chunks, small_chunks], speed=1_000_000) is small_chunks
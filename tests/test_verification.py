@@ -0,0 +1,35 @@
+from pathlib import Path
+
+from easyborg.verification import VerificationState, overdue, quota, rotation
+
+
+def test_rotation_starts_with_snapshots_never_verified():
+    names = ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"]
+    verified = {"2024-01-01": 300.0, "2024-01-02": 100.0}
+
+    assert rotation(names, verified) == ["2024-01-03", "2024-01-04", "2024-01-02", "2024-01-01"]
+
+
+def test_quota_covers_all_snapshots_within_period():
+    assert quota(0, 30) == 0
+    assert quota(10, 30) == 1
+    assert quota(90, 30) == 3
+    assert quota(91, 30) == 4
+
+
+def test_overdue():
+    day = 24 * 60 * 60
+    verified = {"a": 100 * day, "b": 80 * day}
+
+    assert overdue(["a", "b", "c"], verified, period=10, now=100 * day) == 2
+
+
+def test_verification_state_drops_deleted_snapshots(tmp_path: Path):
+    state = VerificationState(tmp_path / "verification.json")
+    assert state.verified("repo") == {}
+
+    state.record("repo", "a")
+    state.record("repo", "b", existing=["b", "c"])
+
+    assert set(state.verified("repo")) == {"b"}
+    assert VerificationState(tmp_path / "verification.json").verified("other") == {}